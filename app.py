@@ -1,9 +1,33 @@
+import os
+
 import aws_cdk as cdk
 
+from backend import context
 from backend.backend_stack import BackendStack
+from backend.redirect_stack import RedirectStack
 
 app = cdk.App()
 
-BackendStack(app, "backend-stack")
+# a global table needs explicit regions, see README.md "Global Table"
+global_table = context.get(app, "globalTable")
+replica_regions = global_table.get("replicaRegions", [])
+
+env = None
+if replica_regions:
+    env = cdk.Environment(
+        account=os.getenv("CDK_DEFAULT_ACCOUNT"),
+        region=global_table.get("homeRegion", os.getenv("CDK_DEFAULT_REGION"))
+    )
+
+backend_stack = BackendStack(app, "backend-stack", env=env)
+
+# redirect api per replica region
+for region in replica_regions:
+    redirect_stack = RedirectStack(
+        app,
+        f"redirect-stack-{region}",
+        env=cdk.Environment(account=env.account, region=region)
+    )
+    redirect_stack.add_dependency(backend_stack)
 
 app.synth()
@@ -1,7 +1,10 @@
+import aws_cdk as cdk
 from aws_cdk import Stack
 from constructs import Construct
 
+from backend import context
 from resources import services
+from resources.monitoring import profiles
 
 
 class BackendStack(Stack):
@@ -11,5 +14,73 @@ class BackendStack(Stack):
 
         # The code that defines your stack goes here
 
+        # stage cache for the redirects, e.g. -c redirectCache='{"enabled": true}'
+        redirect_cache = context.get(self, "redirectCache")
+        # read consistency of the redirects, e.g.
+        # -c redirectLookup='{"consistentRead": true}'
+        redirect_lookup = context.get(self, "redirectLookup")
+        # cloudfront in front of the redirects, e.g. -c edgeCache='{"enabled": true}'
+        edge_cache = context.get(self, "edgeCache")
+        # usage plan tiers with per method throttles, e.g.
+        # -c usagePlans='{"default": {"rateLimit": 10, "burstLimit": 2}}'
+        usage_plan_tiers = context.get(self, "usagePlans")
+        # stage throttle of the redirects, which have no api key, e.g.
+        # -c redirectThrottle='{"rateLimit": 200, "burstLimit": 100}'
+        redirect_throttle = context.get(self, "redirectThrottle")
+        # replicas of the table and redirect domain with latency routing,
+        # the replica regions are served by a RedirectStack each
+        global_table = context.get(self, "globalTable")
+        redirect_domain = global_table.get("redirectDomain", {})
+        # provisioned capacity of the table, on-demand if not set, e.g.
+        # -c tableCapacity='{"mode": "provisioned", "read": {"max": 500}}'
+        table_capacity = context.get(self, "tableCapacity")
+        # write sharded owner index for api keys with very many short urls,
+        # e.g. -c ownerIndex='{"shards": 8}', tables of the first version
+        # keep their owner-index with -c ownerIndex='{"legacyIndex": true}'
+        # until createdAt is backfilled
+        owner_index = context.get(self, "ownerIndex")
+        # gzip compression of the responses from a size in bytes, e.g.
+        # -c compression='{"minimumSize": 4096}' or '{"enabled": false}'
+        compression = context.get(self, "compression")
+        # stage logging/tracing profile, dashboard and alarms, e.g.
+        # -c observability='{"profile": "metrics"}'
+        observability = context.get(self, "observability")
+        alarm_settings = observability.get("alarms", {})
+
         # add backend service
-        services.BackendService(self, "BackendService")
+        services.BackendService(
+            self,
+            "BackendService",
+            cache_enabled=redirect_cache.get("enabled", False),
+            cache_cluster_size=redirect_cache.get("size", "0.5"),
+            cache_ttl=cdk.Duration.seconds(
+                redirect_cache.get("ttlSeconds", 300)
+            ),
+            consistent_reads=redirect_lookup.get("consistentRead", False),
+            edge_cache_enabled=edge_cache.get("enabled", False),
+            edge_cache_max_ttl=cdk.Duration.seconds(
+                edge_cache.get("maxTtlSeconds", 86400)
+            ),
+            usage_plan_tiers=usage_plan_tiers or None,
+            redirect_throttle=redirect_throttle or None,
+            replica_regions=global_table.get("replicaRegions"),
+            table_capacity=table_capacity
+            if table_capacity.get("mode") == "provisioned" else None,
+            owner_shards=owner_index.get("shards"),
+            legacy_owner_index=owner_index.get("legacyIndex", False),
+            min_compression_size=compression.get("minimumSize", 1024)
+            if compression.get("enabled", True) else None,
+            domain_name=redirect_domain.get("domainName"),
+            hosted_zone_id=redirect_domain.get("hostedZoneId"),
+            certificate_arn=redirect_domain.get("certificateArns", {}).get(
+                self.region
+            ),
+            observability_profile=observability.get(
+                "profile", profiles.DEFAULT_PROFILE
+            ),
+            sampling_rate=observability.get("samplingRate"),
+            alarm_latency_p99=cdk.Duration.millis(
+                alarm_settings.get("latencyP99Ms", 1000)
+            ),
+            alarm_email=alarm_settings.get("email")
+        )
@@ -0,0 +1,17 @@
+import json
+
+from constructs import Construct
+
+
+def get(scope: Construct, key: str) -> dict:
+    """Read a context value which is either set in cdk.json or passed as
+    JSON string on the command line (cdk deploy -c key='{...}')
+
+    :param scope: construct to read the context from
+    :param key: context key
+    :return: context value, empty if not set
+    """
+    value = scope.node.try_get_context(key)
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value or {}
@@ -0,0 +1,38 @@
+from aws_cdk import Stack
+from constructs import Construct
+
+from backend import context
+from resources import services
+from resources.dyndb import shortened_urls
+from resources.monitoring import profiles
+
+
+class RedirectStack(Stack):
+
+    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+        """Redirect API of a replica region of the global table, deployed
+        after the BackendStack of the home region created the replica"""
+        super().__init__(scope, construct_id, **kwargs)
+
+        global_table = context.get(self, "globalTable")
+        redirect_domain = global_table.get("redirectDomain", {})
+        redirect_lookup = context.get(self, "redirectLookup")
+        redirect_throttle = context.get(self, "redirectThrottle")
+        observability = context.get(self, "observability")
+
+        # add redirect service
+        services.RedirectService(
+            self,
+            "RedirectService",
+            table_name=shortened_urls.TABLE_NAME,
+            consistent_reads=redirect_lookup.get("consistentRead", False),
+            domain_name=redirect_domain.get("domainName"),
+            hosted_zone_id=redirect_domain.get("hostedZoneId"),
+            certificate_arn=redirect_domain.get("certificateArns", {}).get(
+                self.region
+            ),
+            observability_profile=observability.get(
+                "profile", profiles.DEFAULT_PROFILE
+            ),
+            redirect_throttle=redirect_throttle or None
+        )
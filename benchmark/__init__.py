@@ -0,0 +1 @@
+"""Concurrent load generator and latency benchmark of the backend API"""
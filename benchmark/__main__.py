@@ -0,0 +1,86 @@
+"""Benchmark the backend API with concurrent requests
+
+    python -m benchmark --url https://...amazonaws.com/prod --api-key KEY
+    python -m benchmark --local --rate 200 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import threading
+
+from loguru import logger
+
+from benchmark import load
+from benchmark.report import summarize
+
+LOCAL_API_KEY = "benchmark"
+
+
+def start_local(throttling: bool = False) -> str:
+    """Start the emulated API on a free port
+
+    :param throttling: enforce the throttle of the default usage plan
+    :return: stage URL
+    """
+    from emulator import server
+    from emulator.__main__ import synthesize
+    from emulator.api import Api
+
+    api = Api(synthesize({}), api_keys={LOCAL_API_KEY: LOCAL_API_KEY},
+              throttling=throttling)
+    httpd = server.create(api, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_port}/prod"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description=__doc__.split("\n")[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="stage URL of the API")
+    target.add_argument("--local", action="store_true",
+                        help="benchmark the emulated API")
+    parser.add_argument("--api-key", default=LOCAL_API_KEY)
+    parser.add_argument("--rate", type=float, default=50,
+                        help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="seconds to send requests")
+    parser.add_argument("--concurrency", type=int, default=64,
+                        help="maximum requests in flight")
+    parser.add_argument("--mix", default="redirect=80,list=5,create=10,delete=5",
+                        help="weights of the operations")
+    parser.add_argument("--seed-urls", type=int, default=20,
+                        help="short URLs created before the run")
+    parser.add_argument("--seed", type=int, help="seed of the random generator")
+    parser.add_argument("--output", help="file for the JSON report")
+    args = parser.parse_args()
+
+    url = start_local() if args.local else args.url
+    config = {
+        "url": url,
+        "rate": args.rate,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "mix": load.parse_mix(args.mix)
+    }
+    client = load.Client(url, args.api_key, args.concurrency)
+    workload = load.Workload(client, config["mix"], args.seed)
+
+    logger.info(f"Creating {args.seed_urls} short URLs")
+    workload.seed(args.seed_urls)
+    logger.info(f"Sending {args.rate} requests/s for {args.duration}s to {url}")
+    samples, elapsed = asyncio.run(load.run(
+        workload, args.rate, args.duration, args.concurrency
+    ))
+    client.close()
+
+    report = json.dumps(summarize(samples, elapsed, config), indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report)
+        logger.info(f"Report written to {args.output}")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Open loop load generation: requests are started at the target rate,
+independent of the response times, so a slow API shows up as latency instead
+of a lower request rate"""
+import asyncio
+import random
+import string
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmark.report import Sample
+
+OPERATIONS = ("redirect", "list", "create", "delete")
+
+
+def parse_mix(mix: str) -> dict:
+    """Parse a read/write mix like "redirect=80,list=5,create=10,delete=5"
+
+    :return: {operation: weight}
+    """
+    weights = {}
+    for part in mix.split(","):
+        operation, _, weight = part.partition("=")
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation {operation}, "
+                             f"expected one of {', '.join(OPERATIONS)}")
+        weights[operation] = float(weight or 1)
+    if not any(weights.values()):
+        raise ValueError("Mix has no operation with a weight above 0")
+    return weights
+
+
+class Client:
+    def __init__(self, base_url: str, api_key: str, pool_size: int):
+        """API client on a shared connection pool
+
+        :param base_url: stage URL, e.g. https://...amazonaws.com/prod
+        :param api_key: value of the x-api-key header
+        :param pool_size: connections kept open to the API
+        """
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["x-api-key"] = api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def redirect(self, short_id: str) -> requests.Response:
+        return self.session.get(f"{self.base_url}/{short_id}",
+                                allow_redirects=False)
+
+    def list(self) -> requests.Response:
+        return self.session.get(f"{self.base_url}/shortened-urls")
+
+    def create(self, short_id: str, url: str) -> requests.Response:
+        return self.session.post(f"{self.base_url}/shortened-urls",
+                                 json={"shortId": short_id, "url": url})
+
+    def delete(self, short_id: str) -> requests.Response:
+        return self.session.delete(f"{self.base_url}/{short_id}")
+
+    def close(self):
+        self.session.close()
+
+
+class Workload:
+    def __init__(self, client: Client, weights: dict, seed: int = None):
+        """Random operations with the weights of the mix, on short URLs
+        created by the workload
+
+        :param client: API client
+        :param weights: {operation: weight}
+        :param seed: seed of the random generator for repeatable runs
+        """
+        self.client = client
+        self.operations = list(weights)
+        self.weights = list(weights.values())
+        self.random = random.Random(seed)
+        self.prefix = "bench-" + "".join(
+            self.random.choices(string.ascii_lowercase + string.digits, k=6)
+        )
+        self.counter = 0
+        self.short_ids = []
+        # creates without a response, these may exist as well
+        self.unknown = []
+        # redirects in flight per short id, these are not deleted
+        self.reading = Counter()
+        self.lock = threading.Lock()
+
+    def _new_id(self) -> str:
+        self.counter += 1
+        return f"{self.prefix}-{self.counter}"
+
+    def seed(self, count: int):
+        """Create short URLs read by the redirects"""
+        for _ in range(count):
+            short_id = self._new_id()
+            if self.client.create(short_id, "https://example.org").ok:
+                self.short_ids.append(short_id)
+
+    def next(self) -> tuple:
+        """Pick the next operation, called from the event loop only
+
+        :return: operation name and a function sending the request
+        """
+        operation = self.random.choices(self.operations, self.weights)[0]
+        # keep at least one short URL for the redirects
+        if operation == "redirect" and not self.short_ids or \
+                operation == "delete" and len(self.short_ids) < 2:
+            operation = "create"
+        if operation == "redirect":
+            short_id = self.random.choice(self.short_ids)
+            with self.lock:
+                self.reading[short_id] += 1
+
+            def redirect():
+                try:
+                    return self.client.redirect(short_id)
+                finally:
+                    with self.lock:
+                        self.reading[short_id] -= 1
+
+            return operation, redirect
+        if operation == "delete":
+            with self.lock:
+                idle = [index for index, short_id in enumerate(self.short_ids)
+                        if not self.reading[short_id]]
+                short_id = self.short_ids.pop(self.random.choice(idle)) \
+                    if idle else None
+            if short_id:
+                return operation, lambda: self.client.delete(short_id)
+            operation = "create"
+        if operation == "list":
+            return operation, self.client.list
+        short_id = self._new_id()
+
+        def create():
+            # redirected only once it exists, not while the create is in flight
+            try:
+                response = self.client.create(
+                    short_id, f"https://example.org/{short_id}"
+                )
+            except requests.RequestException:
+                with self.lock:
+                    self.unknown.append(short_id)
+                raise
+            if response.ok:
+                with self.lock:
+                    self.short_ids.append(short_id)
+            return response
+
+        return operation, create
+
+    def cleanup(self) -> list:
+        """Requests deleting the short URLs left by the seed and the creates
+        of the run, called once no request is in flight
+
+        :return: functions sending the deletes
+        """
+        with self.lock:
+            short_ids = self.short_ids + self.unknown
+            self.short_ids, self.unknown = [], []
+        return [
+            lambda short_id=short_id: self.client.delete(short_id)
+            for short_id in short_ids
+        ]
+
+
+async def run(workload: Workload, rate: float, duration: float,
+              concurrency: int) -> tuple:
+    """Send requests at the target rate for the given duration, the short
+    URLs of the workload are deleted afterwards
+
+    :param workload: operations to send
+    :param rate: requests per second
+    :param duration: seconds to send requests
+    :param concurrency: maximum requests in flight, further requests wait
+    :return: samples and the duration of the run including the last responses
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    in_flight = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def send(operation: str, call, scheduled: float):
+        async with in_flight:
+            sent = time.perf_counter()
+            try:
+                response = await loop.run_in_executor(executor, call)
+                status = response.status_code
+            except requests.RequestException:
+                status = 0
+            done = time.perf_counter()
+        samples.append(Sample(operation, status, done - scheduled, done - sent))
+
+    start = time.perf_counter()
+    tasks = []
+    count = int(rate * duration)
+    for index in range(count):
+        scheduled = start + index / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        operation, call = workload.next()
+        tasks.append(asyncio.create_task(send(operation, call, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    # delete the short URLs of the workload, not part of the samples
+    async def delete(call):
+        try:
+            await loop.run_in_executor(executor, call)
+        except requests.RequestException:
+            pass
+
+    await asyncio.gather(*(delete(call) for call in workload.cleanup()))
+    executor.shutdown()
+    return samples, elapsed
@@ -0,0 +1,79 @@
+"""Latency and throughput summary of a benchmark run"""
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+@dataclass
+class Sample:
+    operation: str
+    status: int
+    # seconds from the scheduled start, includes queueing in the client
+    latency: float
+    # seconds from sending the request to the response
+    service_time: float
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile
+
+    :param values: sorted values
+    :param p: percentile between 0 and 100
+    :return: percentile or 0.0 for no values
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def _stats(samples: list, duration: float) -> dict:
+    latencies = sorted(sample.latency * 1000 for sample in samples)
+    service_times = sorted(sample.service_time * 1000 for sample in samples)
+    count = len(samples)
+    errors = sum(1 for sample in samples
+                 if sample.status >= 500 or sample.status == 0)
+    throttled = sum(1 for sample in samples if sample.status == 429)
+    return {
+        "requests": count,
+        "throughput": round(count / duration, 2) if duration else 0.0,
+        "errorRate": round(errors / count, 4) if count else 0.0,
+        "throttledRate": round(throttled / count, 4) if count else 0.0,
+        "statusCodes": {
+            str(status): sum(1 for sample in samples if sample.status == status)
+            for status in sorted({sample.status for sample in samples})
+        },
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0
+        },
+        "serviceTimeMs": {
+            "p50": round(percentile(service_times, 50), 2),
+            "p95": round(percentile(service_times, 95), 2),
+            "p99": round(percentile(service_times, 99), 2)
+        }
+    }
+
+
+def summarize(samples: list, duration: float, config: dict) -> dict:
+    """Summary of a run as JSON serializable dict
+
+    :param samples: samples of all requests
+    :param duration: duration of the run in seconds
+    :param config: configuration of the run, included for comparisons
+    :return: {"config", "total", "operations": {operation: stats}}
+    """
+    operations = defaultdict(list)
+    for sample in samples:
+        operations[sample.operation].append(sample)
+    return {
+        "config": config,
+        "durationSeconds": round(duration, 3),
+        "total": _stats(samples, duration),
+        "operations": {
+            operation: _stats(operation_samples, duration)
+            for operation, operation_samples in sorted(operations.items())
+        }
+    }
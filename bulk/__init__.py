@@ -0,0 +1,2 @@
+"""Bulk import and export of the shortened_urls table, bypassing the
+throttled API"""
@@ -0,0 +1,119 @@
+"""Import and export short URLs directly from and to the table
+
+    python -m bulk import links.jsonl --rate 500
+    python -m bulk export backup.jsonl --segments 8
+    python -m bulk backfill --rate 200
+    python -m bulk recount
+    python -m bulk --endpoint-url http://127.0.0.1:8001 import links.jsonl
+"""
+import argparse
+import sys
+
+import boto3
+from botocore.config import Config
+from loguru import logger
+
+from bulk import transfer
+from resources.dyndb.counters import TABLE_NAME as COUNTERS_TABLE_NAME
+from resources.dyndb.shortened_urls import TABLE_NAME
+
+
+def client(region: str = None, endpoint_url: str = None, workers: int = 8):
+    """DynamoDB client with a connection per worker, the SDK retries are
+    left to the standard mode, unprocessed items are retried by transfer
+
+    :param endpoint_url: local DynamoDB, e.g. python -m emulator --dynamodb-port
+    """
+    return boto3.client(
+        "dynamodb",
+        region_name=region,
+        endpoint_url=endpoint_url,
+        config=Config(max_pool_connections=workers,
+                      retries={"mode": "standard"})
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bulk",
+                                     description=__doc__.split("\n")[0])
+    parser.add_argument("--table", default=TABLE_NAME)
+    parser.add_argument("--region", help="region of the table")
+    parser.add_argument("--endpoint-url",
+                        help="local DynamoDB, e.g. the emulator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="write JSONL records")
+    importer.add_argument("file", help="JSONL file, - for stdin")
+    importer.add_argument("--workers", type=int, default=8,
+                          help="concurrent BatchWriteItem requests")
+    importer.add_argument("--rate", type=float,
+                          help="maximum items written per second")
+    importer.add_argument("--max-attempts", type=int, default=8,
+                          help="attempts of a batch with unprocessed items")
+    importer.add_argument("--owner-shards", type=int,
+                          help="shards of the owner index (ownerIndex context)")
+
+    exporter = commands.add_parser("export", help="scan to JSONL records")
+    exporter.add_argument("file", help="JSONL file, - for stdout")
+    exporter.add_argument("--segments", type=int, default=4,
+                          help="segments of the parallel scan")
+    exporter.add_argument("--page-size", type=int,
+                          help="items per Scan request")
+
+    backfiller = commands.add_parser(
+        "backfill", help="set createdAt of short URLs created without it"
+    )
+    backfiller.add_argument("--segments", type=int, default=4,
+                            help="segments of the parallel scan")
+    backfiller.add_argument("--rate", type=float,
+                            help="maximum items updated per second")
+    backfiller.add_argument("--owner-shards", type=int,
+                            help="shards of the owner index (ownerIndex context)")
+
+    recounter = commands.add_parser(
+        "recount", help="set the link counters of the owner stats"
+    )
+    recounter.add_argument("--counters-table", default=COUNTERS_TABLE_NAME)
+    recounter.add_argument("--segments", type=int, default=4,
+                           help="segments of the parallel scans")
+    recounter.add_argument("--rate", type=float,
+                           help="maximum counters written per second")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        dynamodb = client(args.region, args.endpoint_url, args.workers)
+        file = sys.stdin if args.file == "-" else open(args.file)
+        with file:
+            stats = transfer.import_records(
+                dynamodb, args.table, transfer.read_records(file),
+                workers=args.workers, rate=args.rate,
+                max_attempts=args.max_attempts,
+                owner_shards=args.owner_shards
+            )
+        logger.info(f"Imported {stats['written']} short URLs into "
+                    f"{args.table}, {stats['failed']} failed")
+        if stats["failed"]:
+            sys.exit(1)
+    elif args.command == "backfill":
+        dynamodb = client(args.region, args.endpoint_url, args.segments)
+        stats = transfer.backfill(dynamodb, args.table, args.segments,
+                                  args.rate, args.owner_shards)
+        logger.info(f"Backfilled {stats['updated']} short URLs of "
+                    f"{args.table}, {stats['skipped']} deleted in the meantime")
+    elif args.command == "recount":
+        dynamodb = client(args.region, args.endpoint_url, args.segments)
+        stats = transfer.recount(dynamodb, args.table, args.counters_table,
+                                 args.segments, args.rate)
+        logger.info(f"Counted {stats['links']} short URLs of "
+                    f"{stats['owners']} owners into {args.counters_table}")
+    else:
+        dynamodb = client(args.region, args.endpoint_url, args.segments)
+        file = sys.stdout if args.file == "-" else open(args.file, "w")
+        with file:
+            count = transfer.export_records(dynamodb, args.table, file,
+                                            args.segments, args.page_size)
+        logger.info(f"Exported {count} short URLs from {args.table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""Parallel BatchWriteItem import and segmented Scan export of short URLs
+as JSONL records like {"shortId": "gg", "url": "https://...", "owner": "..."}"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from typing import IO, Callable, Iterable, Iterator
+
+from ratelimit.token_bucket import RateLimiter
+from resources.dyndb.counters import OWNER_COUNTER_PREFIX, OWNER_LINKS
+from resources.dyndb.shortened_urls import OWNER_SHARD, owner_shard
+
+# maximum items of a BatchWriteItem request
+BATCH_SIZE = 25
+
+# optional number attributes of a short URL
+_NUMBERS = ["createdAt", "cacheTtl", "redirectType", "expiresAt", "clicks"]
+
+
+class RecordError(ValueError):
+    """Invalid line of the import file"""
+
+
+def read_records(lines: Iterable[str]) -> Iterator[dict]:
+    """Parse the JSONL records, blank lines are skipped
+
+    :raise RecordError: line which is not a record with shortId, url and owner
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise RecordError(f"line {number}: {error}") from error
+        if not isinstance(record, dict) or not all(
+                isinstance(record.get(name), str) and record[name]
+                for name in ("shortId", "url", "owner")):
+            raise RecordError(f"line {number}: shortId, url and owner are required")
+        yield record
+
+
+def to_item(record: dict, now: datetime = None,
+            owner_shards: int = None) -> dict:
+    """DynamoDB item of a record, like the items created by the API
+
+    :param record: {"shortId", "url", "owner"} and optionally createdAt
+        (epoch milliseconds), timestamp, cacheTtl, redirectType, expiresAt
+    :param now: creation time if the record has neither createdAt nor a
+        valid timestamp
+    :param owner_shards: shards of the sharded owner index, if deployed
+    """
+    now = now or datetime.now(timezone.utc)
+    item = {
+        "id": {"S": record["shortId"]},
+        "url": {"S": record["url"]},
+        "owner": {"S": record["owner"]},
+        "timestamp": {"S": record.get("timestamp")
+                      or now.strftime("%d/%b/%Y:%H:%M:%S +0000")},
+        # like backfill, so imported short urls keep their place in the list
+        "createdAt": {"N": str(created_at(record.get("timestamp"), now))}
+    }
+    for name in _NUMBERS:
+        if record.get(name) is not None:
+            item[name] = {"N": str(record[name])}
+    if owner_shards:
+        item[OWNER_SHARD] = {"S": owner_shard(record["owner"], record["shortId"],
+                                              owner_shards)}
+    return item
+
+
+def to_record(item: dict) -> dict:
+    """Record of a DynamoDB item, the inverse of to_item"""
+    record = {
+        "shortId": item["id"]["S"],
+        "url": item["url"]["S"],
+        "owner": item.get("owner", {}).get("S", "")
+    }
+    if "timestamp" in item:
+        record["timestamp"] = item["timestamp"]["S"]
+    for name in _NUMBERS:
+        if name in item:
+            record[name] = int(item[name]["N"])
+    return record
+
+
+def _batches(items: Iterable[dict]) -> Iterator[list]:
+    # a batch must not contain the same key twice, the later item is
+    # written by the next batch
+    batch, ids = [], set()
+    for item in items:
+        if len(batch) == BATCH_SIZE or item["id"]["S"] in ids:
+            yield batch
+            batch, ids = [], set()
+        batch.append(item)
+        ids.add(item["id"]["S"])
+    if batch:
+        yield batch
+
+
+def write_batch(client, table_name: str, items: list, limiter: RateLimiter,
+                max_attempts: int = 8, base_delay: float = 0.05) -> int:
+    """Write up to 25 items, retrying UnprocessedItems with exponential
+    backoff and full jitter
+
+    :param client: boto3 DynamoDB client
+    :return: number of items which could not be written
+    """
+    requests = [{"PutRequest": {"Item": item}} for item in items]
+    for attempt in range(max_attempts):
+        limiter.acquire(len(requests))
+        response = client.batch_write_item(
+            RequestItems={table_name: requests}
+        )
+        requests = response.get("UnprocessedItems", {}).get(table_name, [])
+        if not requests:
+            return 0
+        time.sleep(random.uniform(0, base_delay * 2 ** attempt))
+    return len(requests)
+
+
+def import_records(client, table_name: str, records: Iterable[dict],
+                   workers: int = 8, rate: float = None,
+                   max_attempts: int = 8, owner_shards: int = None) -> dict:
+    """Write the records with concurrent BatchWriteItem workers, existing
+    short URLs are overwritten
+
+    :param client: boto3 DynamoDB client, thread safe
+    :param table_name: name of the shortened urls table
+    :param records: records, e.g. read_records(file)
+    :param workers: concurrent BatchWriteItem requests
+    :param rate: maximum items written per second, unlimited if not given
+    :param max_attempts: attempts of a batch with unprocessed items
+    :param owner_shards: shards of the sharded owner index, if deployed
+    :return: {"written": int, "failed": int}
+    """
+    limiter = RateLimiter(rate)
+    now = datetime.now(timezone.utc)
+    stats = {"written": 0, "failed": 0}
+    pending = set()
+
+    def done(futures):
+        for future in futures:
+            items, failed = future.result()
+            stats["written"] += items - failed
+            stats["failed"] += failed
+
+    def write(batch: list) -> tuple:
+        return len(batch), write_batch(client, table_name, batch, limiter,
+                                       max_attempts)
+
+    # short ids of the batches in flight
+    batch_ids = {}
+
+    def finish(futures):
+        done(futures)
+        for future in futures:
+            del batch_ids[future]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in _batches(to_item(record, now, owner_shards)
+                              for record in records):
+            ids = {item["id"]["S"] for item in batch}
+            # a later record of a short id waits for the earlier one, so it
+            # is written last even if the earlier batch is retried
+            earlier = {future for future in pending if batch_ids[future] & ids}
+            if earlier:
+                wait(earlier)
+                pending -= earlier
+                finish(earlier)
+            # bounded number of batches in flight, the file is streamed
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                finish(finished)
+            future = executor.submit(write, batch)
+            batch_ids[future] = ids
+            pending.add(future)
+        finish(wait(pending).done)
+    return stats
+
+
+def _parallel_scan(client, request: dict, segments: int,
+                   process: Callable[[list], int]) -> int:
+    """Scan the segments concurrently and process every page
+
+    :param client: boto3 DynamoDB client, thread safe
+    :param request: Scan parameters without the segment
+    :param segments: TotalSegments, scanned concurrently
+    :param process: function of the items of a page, called by the workers
+    :return: sum of the results of process
+    """
+    def scan(segment: int) -> int:
+        count, page = 0, {**request, "Segment": segment,
+                          "TotalSegments": segments}
+        while True:
+            response = client.scan(**page)
+            count += process(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return count
+            page["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        return sum(executor.map(scan, range(segments)))
+
+
+def export_records(client, table_name: str, output: IO[str],
+                   segments: int = 4, page_size: int = None) -> int:
+    """Write all items of the table as JSONL records with a parallel Scan,
+    the order of the records is not defined
+
+    :param client: boto3 DynamoDB client, thread safe
+    :param table_name: name of the shortened urls table
+    :param output: text file for the records
+    :param segments: TotalSegments, scanned concurrently
+    :param page_size: Limit of each Scan request
+    :return: number of exported records
+    """
+    lock = threading.Lock()
+
+    def write(items: list) -> int:
+        lines = "".join(json.dumps(to_record(item)) + "\n" for item in items)
+        with lock:
+            output.write(lines)
+        return len(items)
+
+    request = {"TableName": table_name, "ConsistentRead": True}
+    if page_size:
+        request["Limit"] = page_size
+    return _parallel_scan(client, request, segments, write)
+
+
+def created_at(timestamp: str, now: datetime = None) -> int:
+    """Creation time in epoch milliseconds of the timestamp attribute
+
+    :param timestamp: $context.requestTime, e.g. 01/Jan/2024:12:00:00 +0000
+    :param now: time of a missing or invalid timestamp
+    """
+    try:
+        created = datetime.strptime(timestamp, "%d/%b/%Y:%H:%M:%S %z")
+    except (TypeError, ValueError):
+        created = now or datetime.now(timezone.utc)
+    return int(created.timestamp() * 1000)
+
+
+def backfill(client, table_name: str, segments: int = 4, rate: float = None,
+             owner_shards: int = None) -> dict:
+    """Set createdAt (and ownerShard) of short URLs written before the
+    owner index was sorted by creation time, these are not listed otherwise.
+    createdAt is taken from the timestamp of the item, items with a
+    createdAt are left alone, so it can be run again.
+
+    :param client: boto3 DynamoDB client, thread safe
+    :param table_name: name of the shortened urls table
+    :param segments: TotalSegments, scanned and updated concurrently
+    :param rate: maximum items updated per second, unlimited if not given
+    :param owner_shards: shards of the sharded owner index, if deployed
+    :return: {"updated": int, "skipped": int} skipped items were deleted or
+        updated in the meantime
+    """
+    limiter = RateLimiter(rate)
+    now = datetime.now(timezone.utc)
+    missing = "attribute_not_exists(createdAt)"
+    if owner_shards:
+        missing += f" OR attribute_not_exists({OWNER_SHARD})"
+    skipped = []
+
+    def update(items: list) -> int:
+        updated = 0
+        for item in items:
+            values = {":c": {"N": str(created_at(
+                item.get("timestamp", {}).get("S"), now
+            ))}}
+            expression = "SET createdAt = if_not_exists(createdAt, :c)"
+            if owner_shards:
+                values[":s"] = {"S": owner_shard(
+                    item["owner"]["S"], item["id"]["S"], owner_shards
+                )}
+                expression += f", {OWNER_SHARD} = :s"
+            limiter.acquire()
+            try:
+                client.update_item(
+                    TableName=table_name,
+                    Key={"id": item["id"]},
+                    UpdateExpression=expression,
+                    # a short url deleted after the scan is not recreated
+                    ConditionExpression="attribute_exists(id)",
+                    ExpressionAttributeValues=values
+                )
+                updated += 1
+            except client.exceptions.ConditionalCheckFailedException:
+                skipped.append(item["id"]["S"])
+        return updated
+
+    updated = _parallel_scan(client, {
+        "TableName": table_name,
+        "FilterExpression": missing,
+        "ProjectionExpression": "id, #o, #ts",
+        "ExpressionAttributeNames": {"#o": "owner", "#ts": "timestamp"}
+    }, segments, update)
+    return {"updated": updated, "skipped": len(skipped)}
+
+
+def recount(client, table_name: str, counters_table: str, segments: int = 4,
+            rate: float = None) -> dict:
+    """Set the link counters of all owners to the number of their short
+    URLs, e.g. after the first deployment of the owner stats: the stream
+    only delivers the writes of the last 24 hours. Writes during the
+    recount may be counted twice or not at all, run it again if the API was
+    used in the meantime.
+
+    :param client: boto3 DynamoDB client, thread safe
+    :param table_name: name of the shortened urls table
+    :param counters_table: name of the counters table
+    :param segments: TotalSegments, scanned concurrently
+    :param rate: maximum counters written per second, unlimited if not given
+    :return: {"owners": int, "links": int} counters written and short URLs
+    """
+    lock = threading.Lock()
+    links = Counter()
+
+    def count(items: list) -> int:
+        owners = Counter(item["owner"]["S"] for item in items
+                         if "owner" in item)
+        with lock:
+            links.update(owners)
+        return len(items)
+
+    def reset(items: list) -> int:
+        owners = [item["id"]["S"][len(OWNER_COUNTER_PREFIX):]
+                  for item in items]
+        with lock:
+            for owner in owners:
+                links.setdefault(owner, 0)
+        return len(items)
+
+    total = _parallel_scan(client, {
+        "TableName": table_name,
+        "ConsistentRead": True,
+        "ProjectionExpression": "#o",
+        "ExpressionAttributeNames": {"#o": "owner"}
+    }, segments, count)
+    # owners without short URLs left are set to 0
+    _parallel_scan(client, {
+        "TableName": counters_table,
+        "ConsistentRead": True,
+        "FilterExpression": "begins_with(id, :p)",
+        "ProjectionExpression": "id",
+        "ExpressionAttributeValues": {":p": {"S": OWNER_COUNTER_PREFIX}}
+    }, segments, reset)
+
+    limiter = RateLimiter(rate)
+    for owner, number in links.items():
+        limiter.acquire()
+        client.update_item(
+            TableName=counters_table,
+            Key={"id": {"S": f"{OWNER_COUNTER_PREFIX}{owner}"}},
+            UpdateExpression="SET #l = :n",
+            ExpressionAttributeNames={"#l": OWNER_LINKS},
+            ExpressionAttributeValues={":n": {"N": str(number)}}
+        )
+    return {"owners": len(links), "links": total}
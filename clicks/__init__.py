@@ -0,0 +1,2 @@
+"""Click counts of the short URLs, aggregated from the access logs of the
+stage off the redirect path"""
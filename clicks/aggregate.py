@@ -0,0 +1,108 @@
+"""Lambda handler of the access log subscription, adds the redirects of a
+batch of access log events to the clicks of the short URLs
+
+The module is deployed on its own, so it only depends on the standard library
+and boto3 of the Lambda runtime.
+"""
+import base64
+import gzip
+import json
+import os
+from collections import Counter
+from typing import Iterable
+from urllib.parse import unquote
+
+# resource and status codes of a served redirect
+REDIRECT_RESOURCE = "/{shortId}"
+REDIRECT_STATUS = {"301", "302", "307", "308"}
+
+# attribute of the short url with the number of redirects
+CLICKS = "clicks"
+
+
+def decode(event: dict) -> list:
+    """Access log lines of a CloudWatch Logs subscription event
+
+    :param event: {"awslogs": {"data": base64 encoded, gzipped JSON}}
+    :return: messages of the log events
+    """
+    data = json.loads(gzip.decompress(base64.b64decode(event["awslogs"]["data"])))
+    if data.get("messageType") != "DATA_MESSAGE":
+        # CONTROL_MESSAGE when the subscription is checked
+        return []
+    return [log_event["message"] for log_event in data["logEvents"]]
+
+
+def encode(messages: Iterable[str]) -> dict:
+    """CloudWatch Logs subscription event of access log lines, the inverse of
+    decode, e.g. for a local stand-in of the log group"""
+    data = {
+        "messageType": "DATA_MESSAGE",
+        "logEvents": [
+            {"id": str(index), "message": message}
+            for index, message in enumerate(messages)
+        ]
+    }
+    return {"awslogs": {
+        "data": base64.b64encode(gzip.compress(json.dumps(data).encode())).decode()
+    }}
+
+
+def count_clicks(messages: Iterable[str]) -> Counter:
+    """Redirects per short id of access log lines in the format of
+    access_logs.log_format, other requests are ignored
+
+    :return: number of redirects by short id
+    """
+    clicks = Counter()
+    for message in messages:
+        try:
+            entry = json.loads(message)
+        except ValueError:
+            continue
+        if entry.get("resourcePath") != REDIRECT_RESOURCE or \
+                entry.get("httpMethod") != "GET" or \
+                str(entry.get("status")) not in REDIRECT_STATUS:
+            continue
+        # /prod/{shortId} or /{shortId} behind a custom domain
+        short_id = unquote(entry.get("path", "").rsplit("/", 1)[-1])
+        if short_id:
+            clicks[short_id] += 1
+    return clicks
+
+
+def write_clicks(client, table_name: str, clicks: Counter) -> int:
+    """Add the clicks to the short URLs with one UpdateItem per short id,
+    short URLs deleted in the meantime are skipped
+
+    :param client: boto3 DynamoDB client
+    :param table_name: name of the shortened urls table
+    :param clicks: number of redirects by short id
+    :return: number of updated short URLs
+    """
+    updated = 0
+    for short_id, count in clicks.items():
+        try:
+            client.update_item(
+                TableName=table_name,
+                Key={"id": {"S": short_id}},
+                UpdateExpression="ADD #cl :n",
+                ConditionExpression="attribute_exists(id)",
+                ExpressionAttributeNames={"#cl": CLICKS},
+                ExpressionAttributeValues={":n": {"N": str(count)}}
+            )
+            updated += 1
+        except client.exceptions.ConditionalCheckFailedException:
+            pass
+    return updated
+
+
+def handler(event: dict, context) -> dict:
+    """Entry point of the Lambda function, a failed batch is retried by
+    CloudWatch Logs so a click may be counted twice"""
+    import boto3
+
+    clicks = count_clicks(decode(event))
+    updated = write_clicks(boto3.client("dynamodb"), os.environ["TABLE_NAME"],
+                           clicks)
+    return {"clicks": sum(clicks.values()), "updated": updated}
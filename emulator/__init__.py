@@ -0,0 +1,3 @@
+"""Local emulator of the backend API, runs the API Gateway mapping templates
+of the synthesized stack against an in-memory DynamoDB and Step Functions"""
+from emulator.api import Api
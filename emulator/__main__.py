@@ -0,0 +1,86 @@
+"""Run the emulated API
+
+    python -m emulator --api-key local-key
+    python -m emulator --template cdk.out/backend-stack.template.json
+    python -m emulator --dynamodb-port 8001
+"""
+import argparse
+import json
+import threading
+
+from loguru import logger
+
+from emulator import server
+from emulator.api import Api
+from emulator.dynamodb import Database
+
+
+def synthesize(context: dict) -> dict:
+    """Synthesize the backend stack in-process
+
+    :param context: CDK context, e.g. {"redirectCache": {"enabled": true}}
+    :return: CloudFormation template
+    """
+    import aws_cdk as cdk
+
+    from backend.backend_stack import BackendStack
+
+    app = cdk.App(context=context)
+    stack = BackendStack(app, "backend-stack")
+    return app.synth().get_stack_artifact(stack.artifact_id).template
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m emulator",
+                                     description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--template",
+                        help="synthesized template, synthesizes the stack "
+                             "if not given")
+    parser.add_argument("-c", "--context", action="append", default=[],
+                        metavar="KEY=VALUE",
+                        help="CDK context used to synthesize the stack")
+    parser.add_argument("--api-key", action="append", default=[],
+                        metavar="KEY[=ID]",
+                        help="accepted x-api-key, the id is the owner of "
+                             "the short URLs (default: the key)")
+    parser.add_argument("--throttling", action="store_true",
+                        help="enforce the throttle of the usage plan")
+    parser.add_argument("--unprocessed-rate", type=float, default=0.0,
+                        help="share of batch keys returned as unprocessed")
+    parser.add_argument("--dynamodb-port", type=int,
+                        help="also serve the in-memory tables as DynamoDB "
+                             "endpoint, e.g. for python -m bulk")
+    args = parser.parse_args()
+
+    if args.template:
+        with open(args.template) as file:
+            template = json.load(file)
+    else:
+        context = dict(pair.split("=", 1) for pair in args.context)
+        template = synthesize(context)
+
+    api_keys = dict(
+        (key.split("=", 1) * 2)[:2] for key in args.api_key or ["local"]
+    )
+    api = Api(template, api_keys=api_keys,
+              database=Database(unprocessed_rate=args.unprocessed_rate),
+              throttling=args.throttling)
+    httpd = server.create(api, args.host, args.port)
+    logger.info(f"Emulated API on http://{args.host}:{httpd.server_port}/prod "
+                f"with api keys {', '.join(api_keys)}")
+    if args.dynamodb_port is not None:
+        dynamodb = server.create_dynamodb(api.database, args.host,
+                                          args.dynamodb_port)
+        threading.Thread(target=dynamodb.serve_forever, daemon=True).start()
+        logger.info(f"Emulated DynamoDB on "
+                    f"http://{args.host}:{dynamodb.server_port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
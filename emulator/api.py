@@ -0,0 +1,626 @@
+"""Local stand-in for the API Gateway RestApi of a synthesized stack"""
+import gzip
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from emulator import vtl
+from emulator.dynamodb import Database, Table
+from emulator.states import StateMachines
+
+ACCOUNT = "000000000000"
+REGION = "local"
+
+# arn:aws:dynamodb:region:account:table/name/stream/label
+_STREAM_ARN = re.compile(r"arn:[^:]+:dynamodb:[^:]*:[^:]*:table/(?P<table>[^/]+)/stream/")
+
+# arn:aws:apigateway:region:service:action/Action
+_INTEGRATION_URI = re.compile(
+    r"arn:[^:]+:apigateway:[^:]+:(?:(?P<subdomain>[\w-]+)\.)?(?P<service>[\w-]+):"
+    r"action/(?P<action>\w+)"
+)
+
+
+def resolve(value, resources: dict):
+    """Resolve the intrinsic functions of a CloudFormation template with the
+    values of the local stand-ins (table names, state machine ARNs, ...)
+
+    :param value: template value
+    :param resources: template resources
+    :return: resolved value
+    """
+    if isinstance(value, list):
+        return [resolve(element, resources) for element in value]
+    if not isinstance(value, dict):
+        return value
+    if "Ref" in value:
+        return _ref(value["Ref"], resources)
+    if "Fn::GetAtt" in value:
+        logical_id, attribute = value["Fn::GetAtt"]
+        if attribute == "RootResourceId":
+            return f"{logical_id}/"
+        if attribute == "Arn" and logical_id in resources:
+            return _arn(logical_id, resources[logical_id])
+        if attribute == "StreamArn" and logical_id in resources:
+            return f"{_arn(logical_id, resources[logical_id])}/stream/local"
+        return f"{logical_id}.{attribute}"
+    if "Fn::Join" in value:
+        separator, parts = value["Fn::Join"]
+        return separator.join(str(resolve(part, resources)) for part in parts)
+    if "Fn::Select" in value:
+        index, values = value["Fn::Select"]
+        return resolve(values, resources)[int(index)]
+    if "Fn::Split" in value:
+        separator, source = value["Fn::Split"]
+        return resolve(source, resources).split(separator)
+    return {key: resolve(element, resources) for key, element in value.items()}
+
+
+def _ref(logical_id: str, resources: dict):
+    pseudo = {
+        "AWS::Partition": "aws",
+        "AWS::Region": REGION,
+        "AWS::AccountId": ACCOUNT,
+        "AWS::URLSuffix": "amazonaws.com",
+        "AWS::StackName": "local"
+    }
+    if logical_id in pseudo:
+        return pseudo[logical_id]
+    resource = resources.get(logical_id, {})
+    if resource.get("Type") == "AWS::DynamoDB::Table":
+        return resource["Properties"].get("TableName", logical_id)
+    if resource.get("Type") == "AWS::StepFunctions::StateMachine":
+        return _arn(logical_id, resource)
+    return logical_id
+
+
+def _arn(logical_id: str, resource: dict) -> str:
+    if resource.get("Type") == "AWS::StepFunctions::StateMachine":
+        return f"arn:aws:states:{REGION}:{ACCOUNT}:stateMachine:{logical_id}"
+    if resource.get("Type") == "AWS::DynamoDB::Table":
+        name = resource["Properties"].get("TableName", logical_id)
+        return f"arn:aws:dynamodb:{REGION}:{ACCOUNT}:table/{name}"
+    return f"arn:aws:local:{REGION}:{ACCOUNT}:{logical_id}"
+
+
+class Api:
+    def __init__(self, template: dict, api_keys: dict = None,
+                 database: Database = None, throttling: bool = False):
+        """Local stand-in for the RestApi of a synthesized stack
+
+        :param template: CloudFormation template of the stack
+        :param api_keys: {api key: api key id} accepted in x-api-key
+        :param database: in-memory DynamoDB, created from the tables of the
+            template if not given
+        :param throttling: enforce the throttles of the usage plans per api
+            key, keys which are not assigned to a usage plan of the template
+            use the first usage plan without keys, and the method throttles
+            of the stage for all callers
+        """
+        self.resources = template.get("Resources", {})
+        self.api_keys = api_keys or {}
+        self.database = database or Database()
+        self.state_machines = StateMachines(self.database)
+        self.throttling = throttling
+        self.methods = {}
+        self.models = {}
+        self.validators = {}
+        self.usage_plans = {}
+        self.usage_plan_keys = {}
+        self.stage_throttles = {}
+        self.minimum_compression_size = None
+        self.access_log_format = None
+        self._access_log_listeners = []
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # template
+
+    def _load(self):
+        paths = {}
+        for logical_id, resource in self.resources.items():
+            kind = resource["Type"]
+            properties = resolve(resource.get("Properties", {}),
+                                 self.resources)
+            if kind == "AWS::DynamoDB::Table" and \
+                    properties.get("TableName") not in self.database.tables:
+                self.database.create_table(_table(properties))
+            elif kind == "AWS::StepFunctions::StateMachine":
+                self.state_machines.register(
+                    _arn(logical_id, resource),
+                    json.loads(properties["DefinitionString"])
+                )
+            elif kind == "AWS::Pipes::Pipe":
+                self._pipe(properties)
+            elif kind == "AWS::ApiGateway::RestApi":
+                paths[f"{logical_id}/"] = ""
+                self.minimum_compression_size = \
+                    properties.get("MinimumCompressionSize")
+            elif kind == "AWS::ApiGateway::Stage":
+                self.access_log_format = \
+                    properties.get("AccessLogSetting", {}).get("Format")
+                for setting in properties.get("MethodSettings", []):
+                    if "ThrottlingRateLimit" in setting:
+                        # "/~1{shortId}" and "GET"
+                        resource_path = setting["ResourcePath"][1:]
+                        self.stage_throttles[
+                            f"{resource_path.replace('~1', '/')}/"
+                            f"{setting['HttpMethod']}"
+                        ] = {"RateLimit": setting["ThrottlingRateLimit"],
+                             "BurstLimit": setting.get("ThrottlingBurstLimit", 1)}
+            elif kind == "AWS::ApiGateway::Model":
+                self.models[logical_id] = properties.get("Schema", {})
+            elif kind == "AWS::ApiGateway::RequestValidator":
+                self.validators[logical_id] = properties
+            elif kind == "AWS::ApiGateway::UsagePlan":
+                methods = {}
+                for stage in properties.get("ApiStages", []):
+                    methods.update(stage.get("Throttle", {}))
+                self.usage_plans[logical_id] = {
+                    "throttle": properties.get("Throttle") or {},
+                    # "/~1{shortId}/GET"
+                    "methods": {
+                        path.replace("~1", "/"): throttle
+                        for path, throttle in methods.items()
+                    }
+                }
+            elif kind == "AWS::ApiGateway::UsagePlanKey":
+                self.usage_plan_keys[properties["KeyId"]] = \
+                    properties["UsagePlanId"]
+
+        # resource paths from the parent ids
+        pending = {
+            logical_id: resource["Properties"]
+            for logical_id, resource in self.resources.items()
+            if resource["Type"] == "AWS::ApiGateway::Resource"
+        }
+        while pending:
+            for logical_id, properties in list(pending.items()):
+                parent = resolve(properties["ParentId"], self.resources)
+                if parent in paths:
+                    paths[logical_id] = \
+                        f"{paths[parent]}/{properties['PathPart']}"
+                    del pending[logical_id]
+
+        for logical_id, resource in self.resources.items():
+            if resource["Type"] != "AWS::ApiGateway::Method":
+                continue
+            properties = resolve(resource["Properties"], self.resources)
+            path = paths[properties["ResourceId"]] or "/"
+            self.methods[(path, properties["HttpMethod"])] = properties
+
+    def _pipe(self, properties: dict):
+        """EventBridge Pipe from a table stream to a state machine, every
+        write is delivered synchronously as a batch of stream records"""
+        source = _STREAM_ARN.match(properties["Source"])
+        target = properties["Target"]
+        if source is None or ":states:" not in target:
+            return
+
+        patterns = [
+            json.loads(event_filter["Pattern"]) for event_filter in
+            properties.get("SourceParameters", {})
+            .get("FilterCriteria", {}).get("Filters", [])
+        ]
+
+        def deliver(records: list):
+            records = [record for record in records if not patterns or any(
+                _matches_pattern(pattern, record) for pattern in patterns
+            )]
+            if not records:
+                return
+            self.state_machines.dispatch("StartSyncExecution", {
+                "stateMachineArn": target,
+                "input": json.dumps(records)
+            })
+
+        self.database.subscribe(source.group("table"), deliver)
+
+    # requests
+
+    def handle(self, method: str, path: str, headers: dict = None,
+               query: dict = None, body: str = "") -> tuple:
+        """Handle a request like the deployed stage
+
+        :param method: HTTP method
+        :param path: request path, with or without the stage name
+        :param headers: request headers
+        :param query: query string parameters
+        :param body: raw request body
+        :return: status code, response headers and response body (bytes)
+        """
+        start = time.monotonic()
+        path = re.sub(r"^/prod(?=/|$)", "", path) or "/"
+        context = {"httpMethod": method, "path": f"/prod{path}"}
+        response = self._handle(method, path, headers, query, body, context)
+        if self.access_log_format and self._access_log_listeners:
+            latency = int((time.monotonic() - start) * 1000)
+            line = self._access_log(context, response[0], latency)
+            for listener in self._access_log_listeners:
+                listener(line)
+        return response
+
+    def subscribe_access_logs(self, listener):
+        """Stand-in for a subscription of the access log group, the
+        listener is called with every access log line of the stage
+
+        :param listener: function of the formatted line
+        """
+        self._access_log_listeners.append(listener)
+
+    def _access_log(self, context: dict, status: int, latency: int) -> str:
+        """Access log line of a request in the format of the stage, missing
+        values are logged as - like API Gateway"""
+        values = {**context, "status": status, "responseLatency": latency,
+                  "integrationLatency": latency}
+
+        def value(match) -> str:
+            current = values
+            for name in match.group(1).split("."):
+                current = current.get(name) if isinstance(current, dict) else None
+            return "-" if current in (None, "") else str(current)
+
+        return re.sub(r"\$context\.([\w.]+)", value, self.access_log_format)
+
+    def _handle(self, method: str, path: str, headers: dict, query: dict,
+                body: str, log_context: dict) -> tuple:
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        query = query or {}
+
+        match = self._route(method, path)
+        if match is None:
+            return _error(403, "Missing Authentication Token")
+        resource_path, path_params = match
+        log_context["resourcePath"] = resource_path
+        definition = self.methods[(resource_path, method)]
+
+        stage_throttle = self.stage_throttles.get(f"{resource_path}/{method}")
+        if self.throttling and stage_throttle and not self._take(
+                (None, f"{resource_path}/{method}"), stage_throttle):
+            return _error(429, "Too Many Requests")
+
+        api_key_id = ""
+        if definition.get("ApiKeyRequired"):
+            api_key_id = self.api_keys.get(headers.get("x-api-key"))
+            if api_key_id is None:
+                return _error(403, "Forbidden")
+            if self.throttling and not self._acquire(
+                    api_key_id, f"{resource_path}/{method}"):
+                return _error(429, "Too Many Requests")
+
+        invalid = self._validate(definition, body, headers, query)
+        if invalid:
+            return _error(400, invalid)
+
+        request_time = datetime.now(timezone.utc)
+        context = {
+            "requestId": str(uuid.uuid4()),
+            "extendedRequestId": uuid.uuid4().hex[:16],
+            "httpMethod": method,
+            "resourcePath": resource_path,
+            "path": f"/prod{path}",
+            "stage": "prod",
+            "requestTime": request_time.strftime("%d/%b/%Y:%H:%M:%S +0000"),
+            "requestTimeEpoch": int(request_time.timestamp() * 1000),
+            "identity": {
+                "apiKeyId": api_key_id,
+                "apiKey": headers.get("x-api-key", "") if api_key_id else "",
+                "sourceIp": headers.get("x-forwarded-for", "127.0.0.1"),
+                "userAgent": headers.get("user-agent", "")
+            },
+            "responseOverride": {"status": None, "header": {}}
+        }
+        log_context.update(context)
+        params = {"path": path_params, "querystring": query, "header": headers}
+
+        integration = definition["Integration"]
+        if integration["Type"] == "MOCK":
+            status, response_body = 200, ""
+        else:
+            status, response_body = self._integrate(
+                integration, body, params, context, headers
+            )
+
+        return self._respond(definition, integration, status, response_body,
+                             params, context, headers)
+
+    def _route(self, method: str, path: str):
+        """Find the resource of a path, literal path parts win over
+        path parameters like API Gateway
+
+        :return: resource path and path parameters or None
+        """
+        parts = [part for part in path.split("/") if part]
+        candidates = []
+        for resource_path, resource_method in self.methods:
+            if resource_method != method:
+                continue
+            resource_parts = [p for p in resource_path.split("/") if p]
+            if len(resource_parts) != len(parts):
+                continue
+            params, score = {}, 0
+            for expected, actual in zip(resource_parts, parts):
+                if expected.startswith("{") and expected.endswith("}"):
+                    params[expected[1:-1]] = actual
+                elif expected == actual:
+                    score += 1
+                else:
+                    break
+            else:
+                candidates.append((score, resource_path, params))
+        if not candidates:
+            return None
+        score, resource_path, params = max(candidates, key=lambda c: c[0])
+        return resource_path, params
+
+    def _acquire(self, api_key_id: str, method: str) -> bool:
+        """Token bucket per api key and method with the throttle of the
+        usage plan of the key, a method throttle replaces the plan throttle
+
+        :param api_key_id: id of the api key
+        :param method: method like /{shortId}/GET
+        """
+        plan_id = self.usage_plan_keys.get(api_key_id) or next(
+            (plan_id for plan_id in self.usage_plans
+             if plan_id not in self.usage_plan_keys.values()), None
+        )
+        if plan_id is None:
+            return True
+        plan = self.usage_plans[plan_id]
+        throttle = plan["methods"].get(method)
+        bucket = (api_key_id, method)
+        if throttle is None:
+            throttle, bucket = plan["throttle"], (api_key_id, None)
+        return self._take(bucket, throttle)
+
+    def _take(self, bucket: tuple, throttle: dict) -> bool:
+        """Take a token of a bucket, refilled at the rate of the throttle
+
+        :param bucket: (api key id or None for the stage, method or None)
+        :param throttle: {"RateLimit", "BurstLimit"}
+        """
+        rate = throttle.get("RateLimit")
+        if not rate:
+            return True
+        burst = max(throttle.get("BurstLimit", 1), 1)
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(bucket, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens < 1:
+                self._buckets[bucket] = (tokens, now)
+                return False
+            self._buckets[bucket] = (tokens - 1, now)
+            return True
+
+    def _validate(self, definition: dict, body: str, headers: dict,
+                  query: dict):
+        """Request validation of the method
+
+        :return: error message or None
+        """
+        validator = self.validators.get(definition.get("RequestValidatorId"))
+        if not validator:
+            return None
+        if validator.get("ValidateRequestParameters"):
+            for name, required in definition.get(
+                    "RequestParameters", {}).items():
+                # method.request.querystring.name
+                location, key = name.split(".")[2:4]
+                source = query if location == "querystring" else headers
+                if required and key.lower() not in {
+                        k.lower() for k in source}:
+                    return f"Missing required request parameters: [{key}]"
+        if validator.get("ValidateRequestBody"):
+            content_type = headers.get("content-type", "application/json")
+            model = definition.get("RequestModels", {}).get(
+                content_type.split(";")[0]
+            )
+            if model in self.models:
+                try:
+                    document = json.loads(body or "null")
+                except ValueError:
+                    return "Invalid request body"
+                if not _valid(document, self.models[model]):
+                    return "Invalid request body"
+        return None
+
+    def _integrate(self, integration: dict, body: str, params: dict,
+                   context: dict, headers: dict) -> tuple:
+        match = _INTEGRATION_URI.match(integration.get("Uri", ""))
+        if not match:
+            return 500, json.dumps({"message": "Unsupported integration"})
+
+        content_type = headers.get("content-type", "application/json")
+        templates = integration.get("RequestTemplates", {})
+        template = templates.get(content_type.split(";")[0])
+        if template is None and "application/json" in templates \
+                and integration.get("PassthroughBehavior") != "NEVER":
+            template = templates["application/json"]
+        request = vtl.render(template, body, params, context) \
+            if template is not None else body
+
+        try:
+            request = json.loads(request) if request.strip() else {}
+        except ValueError as error:
+            return 400, json.dumps({
+                "__type": "SerializationException",
+                "message": f"Invalid request template output: {error}"
+            })
+
+        service = match.group("service")
+        if service == "dynamodb":
+            status, response = self.database.dispatch(
+                match.group("action"), request
+            )
+        elif service == "states":
+            status, response = self.state_machines.dispatch(
+                match.group("action"), request
+            )
+        else:
+            return 500, json.dumps({"message": f"Unsupported service {service}"})
+        return status, json.dumps(response)
+
+    def _respond(self, definition: dict, integration: dict, status: int,
+                 body: str, params: dict, context: dict,
+                 headers: dict) -> tuple:
+        response = _select(integration.get("IntegrationResponses", []),
+                           status)
+        if response is None:
+            return _error(500, "Internal server error")
+
+        accept = headers.get("accept", "application/json")
+        templates = response.get("ResponseTemplates", {})
+        content_type = next(
+            (t for t in (a.split(";")[0].strip() for a in accept.split(","))
+             if t in templates),
+            "application/json"
+        )
+        template = templates.get(content_type)
+        output = vtl.render(template, body, params, context) \
+            if template is not None else body
+
+        response_headers = {"Content-Type": content_type}
+        for name, value in response.get("ResponseParameters", {}).items():
+            header = name.replace("method.response.header.", "")
+            if value.startswith("'") and value.endswith("'"):
+                response_headers[header] = value[1:-1]
+        override = context["responseOverride"]
+        response_headers.update(
+            {name.replace(vtl.HYPHEN, "-"): str(value)
+             for name, value in override["header"].items()}
+        )
+        status = int(override["status"] or response["StatusCode"])
+
+        content = output.encode()
+        if self.minimum_compression_size is not None \
+                and len(content) >= self.minimum_compression_size \
+                and "gzip" in headers.get("accept-encoding", ""):
+            content = gzip.compress(content)
+            response_headers["Content-Encoding"] = "gzip"
+        return status, response_headers, content
+
+
+def _matches_pattern(pattern, value) -> bool:
+    """Event filter pattern of a pipe: nested fields with a list of values
+    or {"exists": bool} of which one has to match"""
+    if isinstance(pattern, dict):
+        return all(
+            _matches_pattern(inner, value.get(name, _MISSING)
+                             if isinstance(value, dict) else _MISSING)
+            for name, inner in pattern.items()
+        )
+    for rule in pattern:
+        if isinstance(rule, dict) and "exists" in rule:
+            if (value is not _MISSING) == rule["exists"]:
+                return True
+        elif value == rule:
+            return True
+    return False
+
+
+_MISSING = object()
+
+
+def _select(responses: list, status: int):
+    """Select the integration response for the status code of the
+    integration: a matching selection pattern, then an integration response
+    with the same status code, then the default"""
+    for response in responses:
+        pattern = response.get("SelectionPattern")
+        if pattern and re.fullmatch(pattern, str(status)):
+            return response
+    for response in responses:
+        if not response.get("SelectionPattern") \
+                and response["StatusCode"] == str(status):
+            return response
+    for response in responses:
+        if not response.get("SelectionPattern"):
+            return response
+    return None
+
+
+def _error(status: int, message: str) -> tuple:
+    return status, {"Content-Type": "application/json"}, \
+        json.dumps({"message": message}).encode()
+
+
+def _table(properties: dict) -> Table:
+    def keys(schema: list) -> list:
+        names = {key["KeyType"]: key["AttributeName"] for key in schema}
+        return [names["HASH"], names.get("RANGE")]
+
+    indexes = {}
+    for index in properties.get("GlobalSecondaryIndexes", []) + \
+            properties.get("LocalSecondaryIndexes", []):
+        projection = index["Projection"]
+        kind = projection.get("ProjectionType", "ALL")
+        indexes[index["IndexName"]] = {
+            "keys": keys(index["KeySchema"]),
+            "projection": projection.get("NonKeyAttributes", [])
+            if kind == "INCLUDE" else kind
+        }
+    return Table(properties["TableName"], keys(properties["KeySchema"]),
+                 indexes)
+
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None)
+}
+
+
+def _valid(document, schema: dict) -> bool:
+    """JSON schema (draft 4) validation for the keywords of the models"""
+    kind = schema.get("type")
+    if kind in ("integer", "number"):
+        if isinstance(document, bool) or not isinstance(
+                document, int if kind == "integer" else (int, float)):
+            return False
+    elif kind and not isinstance(document, _JSON_TYPES[kind]):
+        return False
+    if "enum" in schema and document not in schema["enum"]:
+        return False
+    if isinstance(document, (int, float)) and not isinstance(document, bool):
+        if "minimum" in schema and document < schema["minimum"]:
+            return False
+        if "maximum" in schema and document > schema["maximum"]:
+            return False
+    if isinstance(document, str):
+        if len(document) < schema.get("minLength", 0):
+            return False
+        if "maxLength" in schema and len(document) > schema["maxLength"]:
+            return False
+        if "pattern" in schema and not re.search(schema["pattern"], document):
+            return False
+    if isinstance(document, list):
+        if len(document) < schema.get("minItems", 0):
+            return False
+        if "maxItems" in schema and len(document) > schema["maxItems"]:
+            return False
+        if schema.get("uniqueItems") and len(
+                {json.dumps(item, sort_keys=True) for item in document}
+        ) != len(document):
+            return False
+        if "items" in schema and not all(
+                _valid(item, schema["items"]) for item in document):
+            return False
+    if isinstance(document, dict):
+        if any(name not in document for name in schema.get("required", [])):
+            return False
+        for name, property_schema in schema.get("properties", {}).items():
+            if name in document and not _valid(document[name], property_schema):
+                return False
+    if "not" in schema and _valid(document, schema["not"]):
+        return False
+    if "anyOf" in schema and not any(
+            _valid(document, option) for option in schema["anyOf"]):
+        return False
+    return True
@@ -0,0 +1,413 @@
+"""In-memory stand-in for the DynamoDB actions used by the backend"""
+import copy
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from functools import cmp_to_key
+
+from emulator import expressions
+
+ERROR_PREFIX = "com.amazonaws.dynamodb.v20120810#"
+
+
+class DynamoDBError(Exception):
+    """Error returned by DynamoDB with status code 400"""
+
+    def __init__(self, type: str, message: str, **details):
+        super().__init__(message)
+        self.type = type
+        self.message = message
+        self.details = details
+
+    def to_json(self) -> dict:
+        return {"__type": ERROR_PREFIX + self.type, "message": self.message,
+                **self.details}
+
+
+class Table:
+    def __init__(self, name: str, key_schema: list, indexes: dict = None):
+        """In-memory table
+
+        :param name: table name
+        :param key_schema: [partition key name, sort key name or None]
+        :param indexes: {index name: {"keys": [...], "projection": "ALL" |
+            "KEYS_ONLY" | [non key attributes]}}
+        """
+        self.name = name
+        self.key_schema = key_schema
+        self.indexes = indexes or {}
+        self.items = {}
+
+    def key(self, item: dict) -> str:
+        """Storage key of an item, raises if key attributes are missing"""
+        values = []
+        for name in filter(None, self.key_schema):
+            if name not in item:
+                raise DynamoDBError(
+                    "ValidationException",
+                    "The provided key element does not match the schema"
+                )
+            values.append(item[name])
+        return json.dumps(values, sort_keys=True)
+
+    def key_attributes(self, item: dict, index: str = None) -> dict:
+        names = list(filter(None, self.key_schema))
+        if index:
+            names += list(filter(None, self.indexes[index]["keys"]))
+        return {name: item[name] for name in names if name in item}
+
+    def project_index(self, item: dict, index: str) -> dict:
+        projection = self.indexes[index]["projection"]
+        if projection == "ALL":
+            return item
+        attributes = list(self.key_attributes(item, index))
+        if projection != "KEYS_ONLY":
+            attributes += projection
+        return expressions.project(item, attributes)
+
+
+class Database:
+    def __init__(self, unprocessed_rate: float = 0.0):
+        """In-memory DynamoDB
+
+        :param unprocessed_rate: share of the keys and items of batch requests
+            which are returned as unprocessed, to exercise client retries
+        """
+        self.tables = {}
+        self.unprocessed_rate = unprocessed_rate
+        self.lock = threading.RLock()
+        self.streams = {}
+        self._changes = threading.local()
+
+    def create_table(self, table: Table):
+        self.tables[table.name] = table
+
+    def subscribe(self, table_name: str, listener):
+        """Deliver the stream records (NEW_AND_OLD_IMAGES) of the writes to
+        a table to listener(records) after every successful action
+
+        :param table_name: table name
+        :param listener: called with the records of an action
+        """
+        self.streams.setdefault(table_name, []).append(listener)
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise DynamoDBError(
+                "ResourceNotFoundException",
+                f"Requested resource not found: Table: {name} not found"
+            )
+        return self.tables[name]
+
+    def dispatch(self, action: str, request: dict) -> tuple:
+        """Run an action
+
+        :param action: action name, e.g. GetItem
+        :param request: request in DynamoDB JSON
+        :return: status code and response
+        """
+        handler = getattr(self, f"_{action}", None)
+        if handler is None:
+            return 400, DynamoDBError(
+                "UnknownOperationException", f"Unknown operation {action}"
+            ).to_json()
+        self._changes.records = {}
+        try:
+            with self.lock:
+                response = handler(copy.deepcopy(request))
+        except DynamoDBError as error:
+            return 400, error.to_json()
+        except (expressions.ValidationError, KeyError, TypeError,
+                ValueError) as error:
+            return 400, DynamoDBError(
+                "ValidationException", str(error)
+            ).to_json()
+        # outside of the lock, the listeners write to the database
+        for name, records in self._changes.records.items():
+            for listener in self.streams[name]:
+                listener(records)
+        return 200, response
+
+    # helpers
+
+    def _store(self, table: Table, key: str, item: dict = None):
+        """Write or (without item) delete an item and record the change for
+        the stream of the table"""
+        old = table.items.get(key)
+        if item is None:
+            table.items.pop(key, None)
+        else:
+            table.items[key] = item
+        if table.name in self.streams and (old or item):
+            self._changes.records.setdefault(table.name, []).append(
+                _stream_record(table, old, item)
+            )
+
+    @staticmethod
+    def _check(request: dict, item: dict):
+        if "ConditionExpression" not in request:
+            return
+        predicate = expressions.condition(
+            request["ConditionExpression"],
+            request.get("ExpressionAttributeNames"),
+            request.get("ExpressionAttributeValues")
+        )
+        if not predicate(item or {}):
+            raise DynamoDBError(
+                "ConditionalCheckFailedException",
+                "The conditional request failed"
+            )
+
+    @staticmethod
+    def _project(request: dict, item: dict) -> dict:
+        if "ProjectionExpression" not in request:
+            return item
+        return expressions.project(item, expressions.projection(
+            request["ProjectionExpression"],
+            request.get("ExpressionAttributeNames")
+        ))
+
+    @staticmethod
+    def _filter(request: dict, items: list) -> list:
+        if "FilterExpression" not in request:
+            return items
+        predicate = expressions.condition(
+            request["FilterExpression"],
+            request.get("ExpressionAttributeNames"),
+            request.get("ExpressionAttributeValues")
+        )
+        return [item for item in items if predicate(item)]
+
+    def _unprocessed(self) -> bool:
+        return self.unprocessed_rate > 0 \
+            and random.random() < self.unprocessed_rate
+
+    @staticmethod
+    def _page(request: dict, table: Table, items: list, index: str = None):
+        """Apply ExclusiveStartKey and Limit to ordered items
+
+        :return: items of the page and LastEvaluatedKey or None
+        """
+        start = request.get("ExclusiveStartKey")
+        if start:
+            start_key = table.key(start)
+            positions = [table.key(item) for item in items]
+            if start_key in positions:
+                items = items[positions.index(start_key) + 1:]
+        limit = request.get("Limit")
+        if limit is not None and int(limit) < 1:
+            raise DynamoDBError("ValidationException",
+                                "Limit must be greater than or equal to 1")
+        if limit is not None and len(items) >= int(limit):
+            items = items[:int(limit)]
+            return items, table.key_attributes(items[-1], index)
+        return items, None
+
+    # actions
+
+    def _GetItem(self, request: dict) -> dict:
+        table = self.table(request["TableName"])
+        item = table.items.get(table.key(request["Key"]))
+        if item is None:
+            return {}
+        return {"Item": self._project(request, item)}
+
+    def _PutItem(self, request: dict) -> dict:
+        table = self.table(request["TableName"])
+        key = table.key(request["Item"])
+        old = table.items.get(key)
+        self._check(request, old)
+        self._store(table, key, request["Item"])
+        if request.get("ReturnValues") == "ALL_OLD" and old:
+            return {"Attributes": old}
+        return {}
+
+    def _UpdateItem(self, request: dict) -> dict:
+        table = self.table(request["TableName"])
+        key = table.key(request["Key"])
+        old = table.items.get(key)
+        self._check(request, old)
+        item, updated = expressions.update(
+            old or dict(request["Key"]),
+            request.get("UpdateExpression", ""),
+            request.get("ExpressionAttributeNames"),
+            request.get("ExpressionAttributeValues")
+        )
+        self._store(table, key, item)
+        return_values = request.get("ReturnValues", "NONE")
+        if return_values == "ALL_NEW":
+            return {"Attributes": item}
+        if return_values == "ALL_OLD":
+            return {"Attributes": old} if old else {}
+        if return_values == "UPDATED_NEW":
+            return {"Attributes": expressions.project(item, updated)}
+        if return_values == "UPDATED_OLD":
+            return {"Attributes": expressions.project(old or {}, updated)}
+        return {}
+
+    def _DeleteItem(self, request: dict) -> dict:
+        table = self.table(request["TableName"])
+        key = table.key(request["Key"])
+        old = table.items.get(key)
+        self._check(request, old)
+        self._store(table, key)
+        if request.get("ReturnValues") == "ALL_OLD" and old:
+            return {"Attributes": old}
+        return {}
+
+    def _Query(self, request: dict) -> dict:
+        table = self.table(request["TableName"])
+        index = request.get("IndexName")
+        keys = table.indexes[index]["keys"] if index else table.key_schema
+        predicates = expressions.key_condition(
+            request["KeyConditionExpression"],
+            request.get("ExpressionAttributeNames"),
+            request.get("ExpressionAttributeValues")
+        )
+        if keys[0] not in predicates:
+            raise DynamoDBError(
+                "ValidationException",
+                "Query condition missed key schema element"
+            )
+
+        items = [
+            item for item in table.items.values()
+            if all(name in item for name in filter(None, keys))
+            and all(predicate(item) for predicate in predicates.values())
+        ]
+        if keys[1]:
+            items.sort(key=cmp_to_key(
+                lambda a, b: expressions.compare(a[keys[1]], b[keys[1]])
+            ))
+        if request.get("ScanIndexForward") is False:
+            items.reverse()
+
+        items, last_key = self._page(request, table, items, index)
+        items = self._filter(request, items)
+        if index:
+            items = [table.project_index(item, index) for item in items]
+        response = {"Count": len(items), "ScannedCount": len(items)}
+        if request.get("Select") != "COUNT":
+            response["Items"] = [self._project(request, i) for i in items]
+        if last_key:
+            response["LastEvaluatedKey"] = last_key
+        return response
+
+    def _Scan(self, request: dict) -> dict:
+        table = self.table(request["TableName"])
+        items = list(table.items.values())
+        if "TotalSegments" in request:
+            total, segment = request["TotalSegments"], request["Segment"]
+            items = [
+                item for item in items
+                if zlib.crc32(table.key(item).encode()) % total == segment
+            ]
+        items, last_key = self._page(request, table, items)
+        items = self._filter(request, items)
+        response = {"Count": len(items), "ScannedCount": len(items),
+                    "Items": [self._project(request, i) for i in items]}
+        if last_key:
+            response["LastEvaluatedKey"] = last_key
+        return response
+
+    def _BatchGetItem(self, request: dict) -> dict:
+        responses, unprocessed = {}, {}
+        for name, read in request["RequestItems"].items():
+            table = self.table(name)
+            keys = [table.key(key) for key in read["Keys"]]
+            if len(set(keys)) != len(keys):
+                raise DynamoDBError(
+                    "ValidationException",
+                    "Provided list of item keys contains duplicates"
+                )
+            responses[name] = []
+            for key in read["Keys"]:
+                if self._unprocessed():
+                    unprocessed.setdefault(name, {
+                        k: v for k, v in read.items() if k != "Keys"
+                    }).setdefault("Keys", []).append(key)
+                    continue
+                item = table.items.get(table.key(key))
+                if item is not None:
+                    responses[name].append(self._project(read, item))
+        return {"Responses": responses, "UnprocessedKeys": unprocessed}
+
+    def _BatchWriteItem(self, request: dict) -> dict:
+        unprocessed = {}
+        for name, writes in request["RequestItems"].items():
+            table = self.table(name)
+            if len(writes) > 25:
+                raise DynamoDBError(
+                    "ValidationException",
+                    "Too many items requested for the BatchWriteItem call"
+                )
+            for write in writes:
+                if self._unprocessed():
+                    unprocessed.setdefault(name, []).append(write)
+                elif "PutRequest" in write:
+                    item = write["PutRequest"]["Item"]
+                    self._store(table, table.key(item), item)
+                else:
+                    key = write["DeleteRequest"]["Key"]
+                    self._store(table, table.key(key))
+        return {"UnprocessedItems": unprocessed}
+
+    def _TransactWriteItems(self, request: dict) -> dict:
+        actions = request["TransactItems"]
+        reasons, failed = [], False
+        for action in actions:
+            (kind, operation), = action.items()
+            table = self.table(operation["TableName"])
+            key = operation.get("Key") or operation.get("Item")
+            try:
+                self._check(operation, table.items.get(table.key(key)))
+                reasons.append({"Code": "None"})
+            except DynamoDBError as error:
+                failed = True
+                reasons.append({"Code": "ConditionalCheckFailed",
+                                "Message": error.message})
+        if failed:
+            raise DynamoDBError(
+                "TransactionCanceledException",
+                "Transaction cancelled, please refer cancellation reasons "
+                "for specific reasons [%s]" % ", ".join(
+                    reason["Code"] for reason in reasons
+                ),
+                CancellationReasons=reasons
+            )
+        for action in actions:
+            (kind, operation), = action.items()
+            operation = {k: v for k, v in operation.items()
+                         if k != "ConditionExpression"}
+            if kind == "Put":
+                self._PutItem(operation)
+            elif kind == "Update":
+                self._UpdateItem(operation)
+            elif kind == "Delete":
+                self._DeleteItem(operation)
+        return {}
+
+
+def _stream_record(table: Table, old: dict, new: dict) -> dict:
+    """DynamoDB stream record of a change, as delivered by EventBridge Pipes"""
+    image = new if new is not None else old
+    record = {
+        "eventID": uuid.uuid4().hex,
+        "eventName": "INSERT" if old is None
+        else "REMOVE" if new is None else "MODIFY",
+        "eventVersion": "1.1",
+        "eventSource": "aws:dynamodb",
+        "dynamodb": {
+            "ApproximateCreationDateTime": int(time.time()),
+            "Keys": copy.deepcopy(table.key_attributes(image)),
+            "StreamViewType": "NEW_AND_OLD_IMAGES"
+        }
+    }
+    if new is not None:
+        record["dynamodb"]["NewImage"] = copy.deepcopy(new)
+    if old is not None:
+        record["dynamodb"]["OldImage"] = copy.deepcopy(old)
+    return record
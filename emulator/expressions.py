@@ -0,0 +1,414 @@
+"""DynamoDB expressions (condition, key condition, filter, update and
+projection expressions) on items in DynamoDB JSON"""
+import copy
+import re
+from decimal import Decimal
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<op><>|<=|>=|=|<|>|\(|\)|,|\+|-|\.|\[|\])
+     |(?P<value>:[A-Za-z0-9_]+)
+     |(?P<name>\#[A-Za-z0-9_]+)
+     |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+     |(?P<number>\d+)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {"AND", "OR", "NOT", "BETWEEN", "IN", "SET", "REMOVE", "ADD",
+             "DELETE"}
+
+
+class ValidationError(Exception):
+    """Invalid expression, reported as ValidationException"""
+
+
+def _tokenize(expression: str) -> list:
+    tokens, pos = [], 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise ValidationError(f"Invalid expression: {expression}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "word" and text.upper() in _KEYWORDS:
+            kind, text = "keyword", text.upper()
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+def compare(left: dict, right: dict) -> int:
+    """Compare two attribute values of the same scalar type
+
+    :return: -1, 0 or 1
+    """
+    (left_type, left_value), = left.items()
+    (right_type, right_value), = right.items()
+    if left_type != right_type:
+        raise TypeError("different types")
+    if left_type == "N":
+        left_value, right_value = Decimal(left_value), Decimal(right_value)
+    return (left_value > right_value) - (left_value < right_value)
+
+
+def _equals(left, right) -> bool:
+    if left is None or right is None:
+        return False
+    try:
+        return compare(left, right) == 0
+    except (TypeError, ValueError):
+        return left == right
+
+
+class _Parser:
+    def __init__(self, expression: str, names: dict, values: dict):
+        self.tokens = _tokenize(expression or "")
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    # token helpers
+
+    def peek(self, offset: int = 0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, text: str = None):
+        kind, value = self.peek()
+        if kind is None or (text is not None and value != text):
+            raise ValidationError(f"Expected {text}, got {value}")
+        self.pos += 1
+        return kind, value
+
+    def accept(self, text: str) -> bool:
+        if self.peek()[1] == text:
+            self.pos += 1
+            return True
+        return False
+
+    def done(self) -> bool:
+        return self.pos >= len(self.tokens)
+
+    # paths and operands, evaluated lazily against an item
+
+    def path(self) -> list:
+        segments = [self.attribute_name()]
+        while True:
+            if self.accept("."):
+                segments.append(self.attribute_name())
+            elif self.accept("["):
+                segments.append(int(self.take()[1]))
+                self.take("]")
+            else:
+                return segments
+
+    def attribute_name(self) -> str:
+        kind, text = self.take()
+        if kind == "name":
+            if text not in self.names:
+                raise ValidationError(f"Undefined attribute name {text}")
+            return self.names[text]
+        if kind in ("word", "keyword"):
+            return text
+        raise ValidationError(f"Invalid attribute name {text}")
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == "value":
+            self.pos += 1
+            if text not in self.values:
+                raise ValidationError(f"Undefined attribute value {text}")
+            value = self.values[text]
+            return lambda item: value
+        if kind == "word" and text == "size" and self.peek(1)[1] == "(":
+            self.pos += 2
+            path = self.path()
+            self.take(")")
+            return lambda item: _size(resolve(item, path))
+        if kind == "word" and text in ("if_not_exists", "list_append") \
+                and self.peek(1)[1] == "(":
+            self.pos += 2
+            first = self.path() if text == "if_not_exists" else None
+            if text == "if_not_exists":
+                self.take(",")
+                fallback = self.operand()
+                self.take(")")
+                return lambda item: resolve(item, first) or fallback(item)
+            left = self.operand()
+            self.take(",")
+            right = self.operand()
+            self.take(")")
+            return lambda item: {"L": left(item)["L"] + right(item)["L"]}
+        path = self.path()
+        return lambda item: resolve(item, path)
+
+    # conditions
+
+    def condition(self):
+        left = self.conjunction()
+        while self.accept("OR"):
+            right = self.conjunction()
+            left = (lambda a, b: lambda item: a(item) or b(item))(left, right)
+        return left
+
+    def conjunction(self):
+        left = self.negation()
+        while self.accept("AND"):
+            right = self.negation()
+            left = (lambda a, b: lambda item: a(item) and b(item))(left, right)
+        return left
+
+    def negation(self):
+        if self.accept("NOT"):
+            inner = self.negation()
+            return lambda item: not inner(item)
+        return self.predicate()
+
+    def predicate(self):
+        kind, text = self.peek()
+        if text == "(":
+            self.pos += 1
+            inner = self.condition()
+            self.take(")")
+            return inner
+        if kind == "word" and self.peek(1)[1] == "(" and text != "size":
+            return self.function()
+
+        left = self.operand()
+        kind, text = self.peek()
+        if text == "BETWEEN":
+            self.pos += 1
+            low = self.operand()
+            self.take("AND")
+            high = self.operand()
+            return lambda item: _between(left(item), low(item), high(item))
+        if text == "IN":
+            self.pos += 1
+            self.take("(")
+            candidates = [self.operand()]
+            while self.accept(","):
+                candidates.append(self.operand())
+            self.take(")")
+            return lambda item: any(
+                _equals(left(item), candidate(item))
+                for candidate in candidates
+            )
+        if text in ("=", "<>", "<", "<=", ">", ">="):
+            self.pos += 1
+            right = self.operand()
+            return lambda item: _compare(text, left(item), right(item))
+        raise ValidationError(f"Invalid condition near {text}")
+
+    def function(self):
+        name = self.take()[1]
+        self.take("(")
+        path = self.path()
+        argument = None
+        if self.accept(","):
+            argument = self.operand()
+        self.take(")")
+        if name == "attribute_exists":
+            return lambda item: resolve(item, path) is not None
+        if name == "attribute_not_exists":
+            return lambda item: resolve(item, path) is None
+        if name == "begins_with":
+            return lambda item: _begins_with(resolve(item, path), argument(item))
+        if name == "contains":
+            return lambda item: _contains(resolve(item, path), argument(item))
+        if name == "attribute_type":
+            return lambda item: (resolve(item, path) or {}).keys() \
+                == {argument(item)["S"]}
+        raise ValidationError(f"Unsupported function {name}")
+
+
+def resolve(item: dict, path: list):
+    """Attribute value of a path like ["a", 0, "b"] or None"""
+    value = {"M": item}
+    for segment in path:
+        if isinstance(segment, int):
+            values = value.get("L") if value else None
+            value = values[segment] if values and segment < len(values) \
+                else None
+        else:
+            value = (value.get("M") or {}).get(segment) if value else None
+        if value is None:
+            return None
+    return value
+
+
+def _size(value):
+    if value is None:
+        return None
+    (kind, content), = value.items()
+    return {"N": str(len(content))}
+
+
+def _compare(operator: str, left, right) -> bool:
+    if operator == "=":
+        return _equals(left, right)
+    if operator == "<>":
+        return not _equals(left, right)
+    if left is None or right is None:
+        return False
+    try:
+        result = compare(left, right)
+    except (TypeError, ValueError):
+        return False
+    return {
+        "<": result < 0,
+        "<=": result <= 0,
+        ">": result > 0,
+        ">=": result >= 0
+    }[operator]
+
+
+def _between(value, low, high) -> bool:
+    return _compare(">=", value, low) and _compare("<=", value, high)
+
+
+def _begins_with(value, prefix) -> bool:
+    if value is None or "S" not in value or "S" not in prefix:
+        return False
+    return value["S"].startswith(prefix["S"])
+
+
+def _contains(value, operand) -> bool:
+    if value is None:
+        return False
+    if "S" in value and "S" in operand:
+        return operand["S"] in value["S"]
+    for kind in ("SS", "NS"):
+        if kind in value:
+            return list(operand.values())[0] in value[kind]
+    if "L" in value:
+        return any(_equals(element, operand) for element in value["L"])
+    return False
+
+
+def condition(expression: str, names: dict = None, values: dict = None):
+    """Parse a condition, key condition or filter expression
+
+    :return: predicate on items
+    """
+    parser = _Parser(expression, names, values)
+    predicate = parser.condition()
+    if not parser.done():
+        raise ValidationError(f"Invalid expression: {expression}")
+    return predicate
+
+
+def key_condition(expression: str, names: dict = None,
+                  values: dict = None) -> dict:
+    """Parse a key condition expression
+
+    :return: predicate on items per key attribute name
+    """
+    parser = _Parser(expression, names, values)
+    predicates = {}
+    while True:
+        start = parser.pos
+        if parser.peek()[0] == "word" and parser.peek(1)[1] == "(":
+            # begins_with(sort_key, :value)
+            parser.pos += 2
+        attribute = parser.path()[0]
+        parser.pos = start
+        predicates[attribute] = parser.predicate()
+        if not parser.accept("AND"):
+            break
+    if not parser.done():
+        raise ValidationError(f"Invalid key condition: {expression}")
+    return predicates
+
+
+def projection(expression: str, names: dict = None) -> list:
+    """Parse a projection expression
+
+    :return: list of top level attribute names
+    """
+    parser = _Parser(expression, names, {})
+    attributes = [parser.path()[0]]
+    while parser.accept(","):
+        attributes.append(parser.path()[0])
+    if not parser.done():
+        raise ValidationError(f"Invalid projection: {expression}")
+    return attributes
+
+
+def project(item: dict, attributes: list) -> dict:
+    """Item restricted to the given top level attributes"""
+    return {name: value for name, value in item.items() if name in attributes}
+
+
+def update(item: dict, expression: str, names: dict = None,
+           values: dict = None) -> tuple:
+    """Apply an update expression to an item
+
+    :return: updated copy of the item and the names of the updated attributes
+    """
+    parser = _Parser(expression, names, values)
+    item = copy.deepcopy(item)
+    updated = []
+    actions = []
+
+    while not parser.done():
+        clause = parser.take()[1]
+        if clause not in ("SET", "REMOVE", "ADD", "DELETE"):
+            raise ValidationError(f"Invalid update expression: {expression}")
+        while True:
+            path = parser.path()
+            if clause == "SET":
+                parser.take("=")
+                value = parser.operand()
+                if parser.peek()[1] in ("+", "-"):
+                    sign = parser.take()[1]
+                    right = parser.operand()
+                    value = (lambda a, b, s: lambda i: _arithmetic(a(i), b(i), s))(
+                        value, right, sign
+                    )
+                actions.append((clause, path, value))
+            elif clause == "REMOVE":
+                actions.append((clause, path, None))
+            else:
+                actions.append((clause, path, parser.operand()))
+            if not parser.accept(","):
+                break
+
+    # all operands are evaluated against the item before the update
+    original = copy.deepcopy(item)
+    for clause, path, operand in actions:
+        name = path[0]
+        if len(path) > 1:
+            raise ValidationError("Nested update paths are not supported")
+        if clause == "SET":
+            item[name] = operand(original)
+        elif clause == "REMOVE":
+            item.pop(name, None)
+        elif clause == "ADD":
+            value = operand(original)
+            current = item.get(name)
+            if "N" in value:
+                item[name] = value if current is None \
+                    else _arithmetic(current, value, "+")
+            else:
+                (kind, elements), = value.items()
+                existing = current[kind] if current else []
+                item[name] = {kind: existing + [e for e in elements
+                                                if e not in existing]}
+        elif clause == "DELETE":
+            value = operand(original)
+            (kind, elements), = value.items()
+            if name in item:
+                remaining = [e for e in item[name][kind] if e not in elements]
+                if remaining:
+                    item[name] = {kind: remaining}
+                else:
+                    item.pop(name)
+        updated.append(name)
+    return item, updated
+
+
+def _arithmetic(left: dict, right: dict, sign: str) -> dict:
+    if left is None or right is None or "N" not in left or "N" not in right:
+        raise ValidationError("Incorrect operand type for operator")
+    result = Decimal(left["N"]) + Decimal(right["N"]) * (1 if sign == "+" else -1)
+    return {"N": str(result.normalize()) if result % 1 else str(int(result))}
@@ -0,0 +1,79 @@
+"""Minimal JSONPath as used by the API Gateway mapping templates
+($input.path) and the Step Functions paths (InputPath, ResultPath, ...)"""
+import copy
+import re
+
+# path segments: .name, [0] and ['name']
+_SEGMENT = re.compile(r"\.([^.\[]+)|\[(\d+)\]|\['([^']*)'\]")
+
+# returned for paths which do not exist, e.g. for the IsPresent choice rule
+MISSING = object()
+
+
+def _segments(path: str) -> list:
+    """Split a path into its keys and indices
+
+    :param path: path relative to the root, e.g. .items[0].id
+    :return: list of keys (str) and indices (int)
+    """
+    segments, pos = [], 0
+    while pos < len(path):
+        match = _SEGMENT.match(path, pos)
+        if not match:
+            raise ValueError(f"Unsupported JSONPath: {path}")
+        name, index, quoted = match.groups()
+        segments.append(int(index) if index is not None else name or quoted)
+        pos = match.end()
+    return segments
+
+
+def find(document, path: str, context=None, default=None):
+    """Read the value of a path
+
+    :param document: document the path $ refers to
+    :param path: JSONPath, $ or $$ (context object) followed by segments
+    :param context: document the path $$ refers to
+    :param default: returned if the path does not exist
+    :return: value of the path
+    """
+    if path.startswith("$$"):
+        value, rest = context, path[2:]
+    elif path.startswith("$"):
+        value, rest = document, path[1:]
+    else:
+        raise ValueError(f"Unsupported JSONPath: {path}")
+
+    for segment in _segments(rest):
+        if isinstance(segment, int) and isinstance(value, list) \
+                and segment < len(value):
+            value = value[segment]
+        elif isinstance(segment, str) and isinstance(value, dict) \
+                and segment in value:
+            value = value[segment]
+        else:
+            return default
+    return value
+
+
+def update(document, path: str, value):
+    """Write a value to a path, e.g. for the ResultPath of a state
+
+    :param document: document to update, it is not modified
+    :param path: JSONPath starting with $
+    :param value: value to write
+    :return: updated copy of the document
+    """
+    segments = _segments(path[1:])
+    if not segments:
+        return value
+
+    document = copy.deepcopy(document)
+    if not isinstance(document, dict):
+        document = {}
+    parent = document
+    for segment in segments[:-1]:
+        if not isinstance(parent.get(segment), dict):
+            parent[segment] = {}
+        parent = parent[segment]
+    parent[segments[-1]] = value
+    return document
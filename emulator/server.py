@@ -0,0 +1,89 @@
+"""HTTP server in front of the emulated API"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from emulator.api import Api
+from emulator.dynamodb import Database
+
+# X-Amz-Target of the DynamoDB JSON protocol, e.g. DynamoDB_20120810.Scan
+_DYNAMODB_TARGET = "DynamoDB_20120810."
+
+
+def create(api: Api, host: str = "127.0.0.1",
+           port: int = 8000) -> ThreadingHTTPServer:
+    """Create an HTTP server for the emulated API
+
+    :param api: emulated API
+    :param host: interface to listen on
+    :param port: port to listen on, 0 for any free port
+    :return: server, start it with serve_forever()
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, avoid the delayed ACK
+        disable_nagle_algorithm = True
+
+        def _handle(self):
+            url = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode() if length else ""
+            try:
+                status, headers, content = api.handle(
+                    self.command, url.path, dict(self.headers),
+                    dict(parse_qsl(url.query)), body
+                )
+            except Exception as error:
+                status, headers = 500, {"Content-Type": "application/json"}
+                content = json.dumps({"message": str(error)}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = \
+            do_OPTIONS = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def create_dynamodb(database: Database, host: str = "127.0.0.1",
+                    port: int = 8001) -> ThreadingHTTPServer:
+    """Create an HTTP server speaking the DynamoDB JSON protocol in front of
+    the in-memory DynamoDB, usable as endpoint_url of the AWS SDKs
+
+    :param database: in-memory DynamoDB, e.g. the database of the emulated API
+    :param host: interface to listen on
+    :param port: port to listen on, 0 for any free port
+    :return: server, start it with serve_forever()
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b"{}"
+            action = self.headers.get("X-Amz-Target", "")
+            status, response = database.dispatch(
+                action.replace(_DYNAMODB_TARGET, "", 1), json.loads(body)
+            )
+            content = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-amz-json-1.0")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
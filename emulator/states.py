@@ -0,0 +1,333 @@
+"""In-process stand-in for the express state machines of the backend,
+supporting the states and service integrations used by the workflows"""
+import json
+import random
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from emulator import jsonpath
+from emulator.dynamodb import Database, ERROR_PREFIX
+
+# optimized and aws-sdk dynamodb integrations
+_DYNAMODB_RESOURCE = re.compile(
+    r"arn:[^:]+:states:::(?:aws-sdk:)?dynamodb:(?P<action>\w+)"
+)
+
+
+class StateError(Exception):
+    """Error raised by a state, handled by Retry and Catch"""
+
+    def __init__(self, error: str, cause: str = ""):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+
+class StateMachines:
+    def __init__(self, database: Database):
+        """Express state machines running against the in-memory DynamoDB
+
+        :param database: in-memory DynamoDB
+        """
+        self.database = database
+        self.definitions = {}
+
+    def register(self, arn: str, definition: dict):
+        self.definitions[arn] = definition
+
+    def dispatch(self, action: str, request: dict) -> tuple:
+        """Run an action of the Step Functions API
+
+        :param action: StartSyncExecution
+        :param request: {"stateMachineArn", "input"}
+        :return: status code and response
+        """
+        if action != "StartSyncExecution":
+            return 400, {"__type": "UnknownOperationException"}
+        arn = request.get("stateMachineArn")
+        if arn not in self.definitions:
+            return 400, {"__type": "StateMachineDoesNotExist",
+                         "message": f"State Machine Does Not Exist: '{arn}'"}
+
+        name = str(uuid.uuid4())
+        response = {
+            "executionArn": f"{arn.replace(':stateMachine:', ':express:')}:{name}",
+            "stateMachineArn": arn,
+            "name": name,
+            "startDate": datetime.now(timezone.utc).timestamp(),
+            "input": request.get("input", "{}")
+        }
+        try:
+            output = self.execute(
+                self.definitions[arn], json.loads(request.get("input") or "{}")
+            )
+            response.update(status="SUCCEEDED", output=json.dumps(output))
+        except StateError as error:
+            response.update(status="FAILED", error=error.error,
+                            cause=error.cause)
+        response["stopDate"] = datetime.now(timezone.utc).timestamp()
+        return 200, response
+
+    def execute(self, definition: dict, document, context: dict = None):
+        """Run a state machine or Map iterator definition
+
+        :return: output of the last state
+        """
+        context = context or {}
+        name = definition["StartAt"]
+        while True:
+            state = definition["States"][name]
+            document, name = self._run(state, document, context)
+            if name is None:
+                return document
+
+    # states
+
+    def _run(self, state: dict, document, context: dict) -> tuple:
+        kind = state["Type"]
+        if kind == "Choice":
+            value = self._input(state, document, context)
+            for rule in state["Choices"]:
+                if _choice(rule, value):
+                    return document, rule["Next"]
+            if "Default" not in state:
+                raise StateError("States.NoChoiceMatched")
+            return document, state["Default"]
+        if kind == "Succeed":
+            return self._input(state, document, context), None
+        if kind == "Fail":
+            raise StateError(state.get("Error", "States.Fail"),
+                             state.get("Cause", ""))
+
+        attempts = {}
+        while True:
+            try:
+                value = self._input(state, document, context)
+                if kind == "Pass":
+                    result = state["Result"] if "Result" in state else value
+                elif kind == "Wait":
+                    result = value
+                elif kind == "Task":
+                    result = self._task(state, value)
+                elif kind == "Map":
+                    result = self._map(state, value, context)
+                else:
+                    raise StateError("States.Runtime",
+                                     f"Unsupported state type {kind}")
+                break
+            except StateError as error:
+                retrier = _matching(state.get("Retry", []), error)
+                if retrier is not None:
+                    count = attempts.get(id(retrier), 0)
+                    if count < retrier.get("MaxAttempts", 3):
+                        attempts[id(retrier)] = count + 1
+                        continue
+                catcher = _matching(state.get("Catch", []), error)
+                if catcher is None:
+                    raise
+                output = _result_path(
+                    document, catcher.get("ResultPath", "$"),
+                    {"Error": error.error, "Cause": error.cause}
+                )
+                return output, catcher["Next"]
+
+        if "ResultSelector" in state:
+            result = _parameters(state["ResultSelector"], result, context)
+        output = _result_path(document, state.get("ResultPath", "$"), result)
+        output = jsonpath.find(output, state.get("OutputPath", "$"))
+        return output, None if state.get("End") else state.get("Next")
+
+    def _input(self, state: dict, document, context: dict):
+        value = document
+        if state.get("InputPath", "$") is not None:
+            value = jsonpath.find(document, state.get("InputPath", "$"),
+                                  context)
+        if "Parameters" in state and state["Type"] != "Map":
+            value = _parameters(state["Parameters"], value, context)
+        return value
+
+    def _task(self, state: dict, parameters):
+        match = _DYNAMODB_RESOURCE.match(state["Resource"])
+        if not match:
+            raise StateError("States.Runtime",
+                             f"Unsupported resource {state['Resource']}")
+        action = match.group("action")
+        sdk = ":aws-sdk:" in state["Resource"]
+        action = action[0].upper() + action[1:]
+        status, response = self.database.dispatch(action, parameters)
+        if status != 200:
+            error = response["__type"].replace(ERROR_PREFIX, "")
+            prefix = "DynamoDb." if sdk else "DynamoDB."
+            raise StateError(prefix + error, json.dumps(response))
+        return response
+
+    def _map(self, state: dict, value, context: dict):
+        items = jsonpath.find(value, state.get("ItemsPath", "$"), context)
+        if not isinstance(items, list):
+            raise StateError("States.Runtime", "ItemsPath is not an array")
+        iterator = state.get("ItemProcessor") or state["Iterator"]
+        selector = state.get("ItemSelector") or state.get("Parameters")
+
+        def run(index: int):
+            item_context = dict(context, Map={
+                "Item": {"Index": index, "Value": items[index]}
+            })
+            item = items[index]
+            if selector is not None:
+                item = _parameters(selector, value, item_context)
+            return self.execute(iterator, item, item_context)
+
+        workers = state.get("MaxConcurrency") or len(items) or 1
+        with ThreadPoolExecutor(max_workers=min(workers, 40)) as executor:
+            return list(executor.map(run, range(len(items))))
+
+
+def _matching(rules: list, error: StateError):
+    for rule in rules:
+        errors = rule["ErrorEquals"]
+        if error.error in errors or "States.ALL" in errors:
+            return rule
+    return None
+
+
+def _matches(value: str, pattern: str) -> bool:
+    """StringMatches with * as wildcard, \\* is a literal asterisk"""
+    parts = re.split(r"(?<!\\)\*", pattern)
+    regex = ".*".join(re.escape(part.replace("\\*", "*")) for part in parts)
+    return re.fullmatch(regex, value, re.S) is not None
+
+
+def _result_path(document, path, result):
+    if path is None:
+        return document
+    return jsonpath.update(document, path, result)
+
+
+def _parameters(template, document, context: dict):
+    """Resolve the paths (keys ending with .$) of Parameters"""
+    if isinstance(template, dict):
+        resolved = {}
+        for key, value in template.items():
+            if key.endswith(".$"):
+                resolved[key[:-2]] = _path_or_function(value, document, context)
+            else:
+                resolved[key] = _parameters(value, document, context)
+        return resolved
+    if isinstance(template, list):
+        return [_parameters(value, document, context) for value in template]
+    return template
+
+
+def _path_or_function(expression: str, document, context: dict):
+    if expression.startswith("$"):
+        return jsonpath.find(document, expression, context)
+    return _intrinsic(expression, document, context)
+
+
+_FUNCTION = re.compile(r"(States\.\w+)\((.*)\)$", re.S)
+
+
+def _intrinsic(expression: str, document, context: dict):
+    """Evaluate the intrinsic functions used by the workflows"""
+    match = _FUNCTION.match(expression.strip())
+    if not match:
+        raise StateError("States.Runtime", f"Invalid path {expression}")
+    name, arguments = match.groups()
+    values = [_argument(argument, document, context)
+              for argument in _split_arguments(arguments)]
+    if name == "States.Format":
+        template, *rest = values
+        for value in rest:
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            template = template.replace("{}", value, 1)
+        return template
+    if name == "States.StringToJson":
+        return json.loads(values[0])
+    if name == "States.JsonToString":
+        return json.dumps(values[0], separators=(",", ":"))
+    if name == "States.Array":
+        return values
+    if name == "States.ArrayLength":
+        return len(values[0])
+    if name == "States.ArrayGetItem":
+        return values[0][values[1]]
+    if name == "States.ArrayRange":
+        start, end, step = values
+        return list(range(start, end + (1 if step > 0 else -1), step))
+    if name == "States.MathAdd":
+        return values[0] + values[1]
+    if name == "States.MathRandom":
+        return random.randint(values[0], values[1] - 1)
+    if name == "States.UUID":
+        return str(uuid.uuid4())
+    raise StateError("States.Runtime", f"Unsupported function {name}")
+
+
+def _split_arguments(arguments: str) -> list:
+    parts, depth, quoted, current = [], 0, False, ""
+    for index, char in enumerate(arguments):
+        if char == "'" and (index == 0 or arguments[index - 1] != "\\"):
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _argument(argument: str, document, context: dict):
+    if argument.startswith("'"):
+        return argument[1:-1].replace("\\'", "'")
+    if argument.startswith("$"):
+        return jsonpath.find(document, argument, context)
+    if argument.startswith("States."):
+        return _intrinsic(argument, document, context)
+    return json.loads(argument)
+
+
+def _choice(rule: dict, value) -> bool:
+    """Evaluate a choice rule"""
+    if "And" in rule:
+        return all(_choice(inner, value) for inner in rule["And"])
+    if "Or" in rule:
+        return any(_choice(inner, value) for inner in rule["Or"])
+    if "Not" in rule:
+        return not _choice(rule["Not"], value)
+
+    variable = jsonpath.find(value, rule["Variable"], default=jsonpath.MISSING)
+    if "IsPresent" in rule:
+        return (variable is not jsonpath.MISSING) == rule["IsPresent"]
+    if variable is jsonpath.MISSING:
+        raise StateError("States.Runtime",
+                         f"Invalid path {rule['Variable']}")
+    for operator, check in _COMPARISONS.items():
+        if operator in rule:
+            return check(variable, rule[operator])
+        if operator + "Path" in rule:
+            return check(variable, jsonpath.find(value, rule[operator + "Path"]))
+    if "IsNull" in rule:
+        return (variable is None) == rule["IsNull"]
+    raise StateError("States.Runtime", "Unsupported choice rule")
+
+
+_COMPARISONS = {
+    "StringEquals": lambda a, b: a == b,
+    "StringMatches": _matches,
+    "NumericEquals": lambda a, b: a == b,
+    "NumericGreaterThan": lambda a, b: a > b,
+    "NumericGreaterThanEquals": lambda a, b: a >= b,
+    "NumericLessThan": lambda a, b: a < b,
+    "NumericLessThanEquals": lambda a, b: a <= b,
+    "BooleanEquals": lambda a, b: a == b,
+}
+
@@ -0,0 +1,190 @@
+"""API Gateway mapping templates rendered with airspeed, a Python
+implementation of the Velocity template language"""
+import base64
+import json
+import re
+from functools import lru_cache
+from urllib.parse import quote, unquote
+
+import airspeed
+
+from emulator import jsonpath
+
+
+def _java_hash_code(value: str) -> int:
+    result = 0
+    for char in value:
+        result = (31 * result + ord(char)) & 0xFFFFFFFF
+    return result - (1 << 32) if result & 0x80000000 else result
+
+
+def _java_replacement(replacement: str) -> str:
+    # $1 in Java is \1 in Python
+    return re.sub(r"\$(\d)", r"\\\1", replacement.replace("\\", "\\\\"))
+
+
+# Java methods used by the templates which do not exist in Python,
+# see airspeed.__additional_methods__
+_JAVA_METHODS = {
+    str: {
+        "charAt": lambda self, index: self[index],
+        "contains": lambda self, value: str(value) in self,
+        "endsWith": lambda self, suffix: self.endswith(suffix),
+        "equals": lambda self, other: self == other,
+        "hashCode": _java_hash_code,
+        "indexOf": lambda self, value: self.find(value),
+        "isEmpty": lambda self: len(self) == 0,
+        "length": lambda self: len(self),
+        "matches": lambda self, pattern: re.fullmatch(pattern, self) is not None,
+        "replaceAll": lambda self, pattern, replacement: re.sub(
+            pattern, _java_replacement(replacement), self
+        ),
+        "split": lambda self, pattern: re.split(pattern, self),
+        "startsWith": lambda self, prefix: self.startswith(prefix),
+        "substring": lambda self, start, end=None: self[start:end],
+        "toLowerCase": lambda self: self.lower(),
+        "toString": lambda self: self,
+        "toUpperCase": lambda self: self.upper(),
+        "trim": lambda self: self.strip(),
+    },
+    int: {
+        "intValue": lambda self: self,
+        "longValue": lambda self: self,
+        "parseInt": lambda self, value: int(value),
+        "parseLong": lambda self, value: int(value),
+        "toString": lambda self: str(self),
+    },
+    list: {
+        "isEmpty": lambda self: len(self) == 0,
+        "toString": lambda self: "[" + ", ".join(map(str, self)) + "]",
+    },
+    dict: {
+        "containsKey": lambda self, key: key in self,
+        "get": lambda self, key: self.get(key),
+        "size": lambda self: len(self),
+    },
+}
+
+for _type, _methods in _JAVA_METHODS.items():
+    airspeed.__additional_methods__.setdefault(_type, {}).update(_methods)
+
+
+def escape_javascript(value) -> str:
+    """$util.escapeJavaScript, escapes quotes, backslashes, slashes and
+    control characters like Apache Commons StringEscapeUtils"""
+    escaped = []
+    for char in str(value):
+        if char in "\"'\\/":
+            escaped.append("\\" + char)
+        elif char == "\n":
+            escaped.append("\\n")
+        elif char == "\r":
+            escaped.append("\\r")
+        elif char == "\t":
+            escaped.append("\\t")
+        elif char == "\b":
+            escaped.append("\\b")
+        elif char == "\f":
+            escaped.append("\\f")
+        elif ord(char) < 32 or ord(char) > 127:
+            escaped.append("\\u%04X" % ord(char))
+        else:
+            escaped.append(char)
+    return "".join(escaped)
+
+
+class Util:
+    """$util of the mapping templates"""
+
+    @staticmethod
+    def escapeJavaScript(value) -> str:
+        return escape_javascript(value)
+
+    @staticmethod
+    def parseJson(value: str):
+        return json.loads(value)
+
+    @staticmethod
+    def toJson(value) -> str:
+        return json.dumps(value)
+
+    @staticmethod
+    def base64Encode(value: str) -> str:
+        return base64.b64encode(str(value).encode()).decode()
+
+    @staticmethod
+    def base64Decode(value: str) -> str:
+        # invalid UTF-8 is replaced like by the Java String of API Gateway
+        return base64.b64decode(str(value)).decode(errors="replace")
+
+    @staticmethod
+    def urlEncode(value: str) -> str:
+        return quote(str(value), safe="")
+
+    @staticmethod
+    def urlDecode(value: str) -> str:
+        return unquote(str(value))
+
+
+class Input:
+    """$input of the mapping templates"""
+
+    def __init__(self, body: str, params: dict):
+        """
+        :param body: raw body of the request or the integration response
+        :param params: {"path": {}, "querystring": {}, "header": {}}
+        """
+        self.body = body
+        self._params = params
+        try:
+            self._document = json.loads(body) if body else {}
+        except ValueError:
+            self._document = body
+
+    def path(self, expression: str):
+        return jsonpath.find(self._document, expression)
+
+    def json(self, expression: str) -> str:
+        return json.dumps(jsonpath.find(self._document, expression))
+
+    def params(self, name: str = None):
+        if name is None:
+            return self._params
+        for location in ("path", "querystring", "header"):
+            values = self._params.get(location, {})
+            if name in values:
+                return values[name]
+        return ""
+
+
+# Velocity 1.7 allows hyphens in identifiers ($context.responseOverride.header.Cache-Control),
+# airspeed does not, they are replaced with HYPHEN in the template
+HYPHEN = "__"
+_OVERRIDE_HEADER = re.compile(r"(\$context\.responseOverride\.header\.)([A-Za-z0-9_-]+)")
+
+
+@lru_cache(maxsize=None)
+def _parse(template: str) -> airspeed.Template:
+    return airspeed.Template(_OVERRIDE_HEADER.sub(
+        lambda match: match.group(1) + match.group(2).replace("-", HYPHEN),
+        template
+    ))
+
+
+def render(template: str, body: str, params: dict, context: dict,
+           variables: dict = None) -> str:
+    """Render a mapping template
+
+    :param template: Velocity template
+    :param body: raw body, available as $input
+    :param params: request parameters, available as $input.params()
+    :param context: $context, responseOverride is updated in place
+    :param variables: stage variables, available as $stageVariables
+    :return: rendered template
+    """
+    return _parse(template).merge({
+        "input": Input(body, params),
+        "util": Util(),
+        "context": context,
+        "stageVariables": variables or {}
+    })
@@ -0,0 +1,2 @@
+"""Integration tests of a deployed stage or the emulator, run concurrently
+within the throttle of the usage plan"""
@@ -0,0 +1,76 @@
+"""Run the integration tests against a stage or the emulator
+
+    API_BASE_URL=https://...amazonaws.com/prod API_KEY=... python -m integration
+    python -m integration --url https://...amazonaws.com/prod --api-key KEY
+    python -m integration --local
+"""
+import argparse
+import os
+import sys
+import time
+
+from loguru import logger
+
+from integration import cases
+from integration.client import Client
+
+# default usage plan: 10 requests/s with a burst of 2, see usage_plans
+DEFAULT_RATE = 8
+DEFAULT_BURST = 2
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m integration",
+                                     description=__doc__.split("\n")[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default=os.getenv("API_BASE_URL"),
+                        help="stage URL of the API (API_BASE_URL)")
+    target.add_argument("--local", action="store_true",
+                        help="test the emulated API with throttling")
+    parser.add_argument("--api-key", default=os.getenv("API_KEY"),
+                        help="value of the x-api-key header (API_KEY)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="requests per second of all cases")
+    parser.add_argument("--burst", type=float, default=DEFAULT_BURST,
+                        help="requests which may be sent at once")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="cases run at the same time")
+    parser.add_argument("-k", dest="names", action="append",
+                        help="run only cases containing this name")
+    args = parser.parse_args()
+
+    if args.local:
+        from benchmark.__main__ import LOCAL_API_KEY, start_local
+        url, api_key = start_local(throttling=True), LOCAL_API_KEY
+    else:
+        url, api_key = args.url, args.api_key
+    if not url or not api_key:
+        parser.error("--url and --api-key (or API_BASE_URL and API_KEY) "
+                     "are required without --local")
+
+    selected = [function for function in cases.CASES
+                if not args.names or any(name in function.__name__
+                                         for name in args.names)]
+    client = Client(url, api_key, args.rate, args.burst,
+                    pool_size=args.workers)
+    logger.info(f"Running {len(selected)} cases against {url}")
+    start = time.perf_counter()
+    results = cases.run(client, selected, args.workers)
+    client.close()
+
+    for result in results:
+        if result.passed:
+            logger.info(f"PASSED {result.name} ({result.seconds:.2f}s)")
+        else:
+            logger.error(f"FAILED {result.name} ({result.seconds:.2f}s)\n"
+                         f"{result.error}")
+    failed = sum(not result.passed for result in results)
+    logger.info(f"{len(results) - failed} passed, {failed} failed, "
+                f"{client.retries} throttled requests retried in "
+                f"{time.perf_counter() - start:.1f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Independent test cases of the API, every case creates its own short ids
+and deletes them again, so the cases can run concurrently against a shared
+deployment"""
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, TypeVar
+
+from integration.client import Client
+
+# pages of GET /shortened-urls searched for just created short urls
+MAX_LIST_PAGES = 20
+
+# seconds until a write has to be visible to the eventually consistent reads
+# of the table and the owner index
+CONSISTENCY_TIMEOUT = 10
+POLL_INTERVAL = 0.5
+
+T = TypeVar("T")
+
+CASES = []
+
+
+def case(function: Callable) -> Callable:
+    """Register a test case"""
+    CASES.append(function)
+    return function
+
+
+def eventually(read: Callable[[], T], accept: Callable[[T], bool],
+               timeout: float = CONSISTENCY_TIMEOUT) -> T:
+    """Repeat a read until its result is accepted or the timeout passed
+
+    :param read: function sending the requests, e.g. a GET
+    :param accept: check of the result
+    :return: accepted result or the last one
+    """
+    deadline = time.monotonic() + timeout
+    result = read()
+    while not accept(result) and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        result = read()
+    return result
+
+
+@dataclass
+class Result:
+    name: str
+    passed: bool
+    seconds: float
+    error: str = ""
+
+
+class Context:
+    def __init__(self, client: Client, prefix: str):
+        """Client and short ids of a single case
+
+        :param client: shared API client
+        :param prefix: prefix of the short ids of the run
+        """
+        self.client = client
+        self.prefix = prefix
+        self.short_ids = []
+
+    def short_id(self) -> str:
+        """New short id, deleted after the case"""
+        short_id = f"{self.prefix}-{uuid.uuid4().hex[:8]}"
+        self.short_ids.append(short_id)
+        return short_id
+
+    def create(self, url: str = "https://example.org", **attributes) -> str:
+        """Create a short URL with a new short id
+
+        :return: short id
+        """
+        short_id = self.short_id()
+        response = self.client.post("/shortened-urls", {
+            "shortId": short_id, "url": url, **attributes
+        })
+        assert response.status_code == 200, response.text
+        assert response.json()["id"] == short_id, response.text
+        return short_id
+
+    def cleanup(self):
+        for short_id in self.short_ids:
+            self.client.delete(f"/{short_id}")
+
+
+@case
+def create_redirect_delete(ctx: Context):
+    short_id = ctx.create("https://github.com/hdm-reibe/ws23-0-backend")
+
+    response = eventually(lambda: ctx.client.get(f"/{short_id}"),
+                          lambda response: response.status_code != 404)
+    assert response.status_code == 301, response.status_code
+    assert response.headers["Location"] == \
+        "https://github.com/hdm-reibe/ws23-0-backend"
+    assert ctx.client.head(f"/{short_id}").status_code == 200
+
+    response = ctx.client.delete(f"/{short_id}")
+    assert response.status_code == 200, response.text
+    # HEAD bypasses the stage cache, a cached GET may still redirect
+    response = eventually(lambda: ctx.client.head(f"/{short_id}"),
+                          lambda response: response.status_code == 404)
+    assert response.status_code == 404, response.status_code
+
+
+@case
+def create_existing_short_id(ctx: Context):
+    short_id = ctx.create()
+
+    response = ctx.client.post("/shortened-urls", {
+        "shortId": short_id, "url": "https://example.com"
+    })
+    assert response.json()["message"] == "URL link already exists", \
+        response.text
+    response = eventually(lambda: ctx.client.get(f"/{short_id}"),
+                          lambda response: response.status_code != 404)
+    assert response.headers["Location"] == "https://example.org"
+
+
+@case
+def delete_unknown_short_id(ctx: Context):
+    response = ctx.client.delete(f"/{ctx.short_id()}")
+    assert response.json()["message"] == "URL link does not exist", \
+        response.text
+
+
+@case
+def requires_api_key(ctx: Context):
+    response = ctx.client.get("/shortened-urls", headers={"x-api-key": None})
+    assert response.status_code == 403, response.status_code
+
+    # a valid body, so only the missing key can reject it (the short id is
+    # deleted after the case should it be created anyway)
+    response = ctx.client.post("/shortened-urls", {
+        "shortId": ctx.short_id(), "url": "https://example.org"
+    }, headers={"x-api-key": None})
+    assert response.status_code == 403, response.status_code
+
+
+@case
+def rejects_invalid_body(ctx: Context):
+    response = ctx.client.post("/shortened-urls", {"url": "https://example.org"})
+    assert response.status_code == 400, response.status_code
+
+
+@case
+def list_created_short_urls(ctx: Context):
+    created = {ctx.create(), ctx.create()}
+
+    def list_ids() -> set:
+        listed, cursor = set(), None
+        for _ in range(MAX_LIST_PAGES):
+            params = {"limit": "100", **({"cursor": cursor} if cursor else {})}
+            response = ctx.client.get("/shortened-urls", params=params)
+            assert response.status_code == 200, response.text
+            body = response.json()
+            listed.update(item["id"] for item in body["items"])
+            cursor = body["nextCursor"]
+            if created <= listed or not cursor:
+                break
+        return listed
+
+    # the owner index is eventually consistent
+    listed = eventually(list_ids, lambda listed: created <= listed)
+    assert created <= listed, created - listed
+
+
+@case
+def redirect_type_and_cache_ttl(ctx: Context):
+    short_id = ctx.create(redirectType=307, cacheTtl=60)
+
+    response = eventually(lambda: ctx.client.get(f"/{short_id}"),
+                          lambda response: response.status_code != 404)
+    assert response.status_code == 307, response.status_code
+    assert response.headers["Cache-Control"] == "max-age=60"
+
+
+@case
+def expiring_short_url(ctx: Context):
+    short_id = ctx.short_id()
+    response = ctx.client.post("/shortened-urls", {
+        "shortId": short_id, "url": "https://example.org", "expiresAt": 1
+    })
+    assert response.json()["expiresAt"] == 1, response.text
+
+    assert ctx.client.get(f"/{short_id}").status_code == 404
+    assert ctx.client.head(f"/{short_id}").status_code == 404
+
+
+@case
+def batch_create_resolve_delete(ctx: Context):
+    taken = ctx.create()
+    new = ctx.short_id()
+
+    response = ctx.client.post("/shortened-urls/batch", {"items": [
+        {"shortId": new, "url": "https://example.org/new"},
+        {"shortId": taken, "url": "https://example.org"}
+    ]})
+    assert response.status_code == 200, response.text
+    assert response.json()["items"] == [
+        {"shortId": new, "status": "created"},
+        {"shortId": taken, "status": "exists"}
+    ]
+
+    unknown = ctx.short_id()
+    response = eventually(
+        lambda: ctx.client.post("/shortened-urls/resolve",
+                                {"ids": [new, unknown]}),
+        lambda response: new in response.json().get("urls", {})
+    )
+    assert response.json()["urls"] == {new: "https://example.org/new"}, \
+        response.text
+
+    response = ctx.client.post("/shortened-urls/batch-delete",
+                               {"ids": [new, taken]})
+    assert [item["status"] for item in response.json()["items"]] == \
+        ["deleted", "deleted"], response.text
+
+
+@case
+def allocate_short_ids(ctx: Context):
+    response = ctx.client.post("/shortened-urls/ids", {"count": 5})
+    assert response.status_code == 200, response.text
+    ids = response.json()["ids"]
+    assert len(set(ids)) == 5 and all(len(short_id) == 6 for short_id in ids)
+
+    # only created as allocated id, never by hand
+    ctx.short_ids.append(ids[0])
+    body = {"shortId": ids[0], "url": "https://example.org"}
+    assert ctx.client.post("/shortened-urls", body).status_code == 400
+    response = ctx.client.post("/shortened-urls", {**body, "allocated": True})
+    assert response.json()["id"] == ids[0], response.text
+
+
+def run(client: Client, cases: List[Callable] = None, workers: int = 4,
+        prefix: str = None) -> List[Result]:
+    """Run the cases concurrently, each case deletes its short ids even if
+    it fails
+
+    :param client: API client shared by the cases
+    :param cases: cases to run, all registered cases if not given
+    :param workers: cases run at the same time
+    :param prefix: prefix of the short ids, unique per run if not given
+    :return: results in the order of the cases
+    """
+    prefix = prefix or f"it-{uuid.uuid4().hex[:6]}"
+
+    def run_case(function: Callable) -> Result:
+        ctx = Context(client, prefix)
+        start = time.perf_counter()
+        try:
+            function(ctx)
+            error = ""
+        except Exception:
+            error = traceback.format_exc(limit=-1).strip()
+        finally:
+            ctx.cleanup()
+        return Result(function.__name__, not error,
+                      time.perf_counter() - start, error)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_case, cases or CASES))
@@ -0,0 +1,75 @@
+"""HTTP client of the integration tests: one session shared by the cases,
+a client side token bucket below the throttle of the usage plan and retries
+of throttled requests"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ratelimit.token_bucket import RateLimiter
+
+
+class Client:
+    def __init__(self, base_url: str, api_key: str, rate: float = None,
+                 burst: float = None, max_attempts: int = 6,
+                 base_delay: float = 0.1, pool_size: int = 8):
+        """API client on a shared connection pool
+
+        :param base_url: stage URL, e.g. https://...amazonaws.com/prod
+        :param api_key: value of the x-api-key header
+        :param rate: requests per second of all cases, unlimited if not given
+        :param burst: requests which may be sent at once
+        :param max_attempts: attempts of a request answered with 429
+        :param base_delay: first backoff in seconds, doubled per attempt
+        :param pool_size: connections kept open to the API
+        """
+        self.base_url = base_url.rstrip("/")
+        self.limiter = RateLimiter(rate, burst)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.session = requests.Session()
+        self.session.headers["x-api-key"] = api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request, throttled requests are retried with exponential
+        backoff and full jitter (or the Retry-After of the response)
+
+        :param method: HTTP method
+        :param path: path below the stage URL, e.g. /shortened-urls
+        :return: response of the last attempt
+        """
+        kwargs.setdefault("allow_redirects", False)
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            response = self.session.request(method, f"{self.base_url}{path}",
+                                            **kwargs)
+            if response.status_code != 429 or attempt == self.max_attempts - 1:
+                return response
+            with self._lock:
+                self.retries += 1
+            retry_after = response.headers.get("Retry-After", "")
+            time.sleep(float(retry_after) if retry_after.isdigit() else
+                       random.uniform(0, self.base_delay * 2 ** attempt))
+        return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def head(self, path: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", path, **kwargs)
+
+    def post(self, path: str, body: dict, **kwargs) -> requests.Response:
+        return self.request("POST", path, json=body, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
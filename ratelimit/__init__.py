@@ -0,0 +1,2 @@
+"""Client side rate limit of the tools sending requests to AWS, shared by
+the bulk transfer and the integration tests"""
@@ -0,0 +1,32 @@
+"""Token bucket blocking the calling thread until a request may be sent"""
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate: float = None, burst: float = None):
+        """Token bucket shared by the workers
+
+        :param rate: requests (or written items) per second, unlimited if
+            not given
+        :param burst: requests which may be sent at once, one second of
+            requests if not given
+        """
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        """Block until count requests may be sent"""
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= count
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1 @@
+from . import redirect_distribution
\ No newline at end of file
@@ -0,0 +1,80 @@
+import aws_cdk as cdk
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_cloudfront as cloudfront
+from aws_cdk import aws_cloudfront_origins as origins
+from constructs import Construct
+
+from resources.methods import redirect
+
+
+def create(
+        construct: Construct,
+        restapi: apigateway.RestApi,
+        max_ttl: cdk.Duration = cdk.Duration.days(1)
+) -> cloudfront.Distribution:
+    """This function creates a CloudFront distribution in front of the API.
+    Only the redirects GET /{shortId} are cached, the authenticated routes
+    are forwarded uncached.
+
+    :param restapi: API Gateway used as origin
+    :param max_ttl: upper bound for the Cache-Control max-age of the API
+    :return: CloudFront distribution
+    """
+    origin = origins.RestApiOrigin(restapi)
+
+    # the api key has to reach the api for DELETE /{shortId} and
+    # /shortened-urls, but it is never part of the cache key
+    forward_api_key = cloudfront.OriginRequestPolicy(
+        construct,
+        id="forward_api_key_policy",
+        header_behavior=cloudfront.OriginRequestHeaderBehavior.allow_list(
+            "x-api-key"
+        ),
+        query_string_behavior=cloudfront.OriginRequestQueryStringBehavior.all()
+    )
+
+    # redirects are cached by path only, the ttl is taken from the
+    # Cache-Control header of the api
+    redirect_cache = cloudfront.CachePolicy(
+        construct,
+        id="redirect_cache_policy",
+        header_behavior=cloudfront.CacheHeaderBehavior.none(),
+        query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+        cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+        min_ttl=cdk.Duration.seconds(0),
+        default_ttl=cdk.Duration.seconds(0),
+        max_ttl=max_ttl,
+        enable_accept_encoding_gzip=True,
+        enable_accept_encoding_brotli=True
+    )
+
+    return cloudfront.Distribution(
+        construct,
+        id="redirect_distribution",
+        comment="Backend API redirects",
+        default_behavior=cloudfront.BehaviorOptions(
+            origin=origin,
+            viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+            allowed_methods=cloudfront.AllowedMethods.ALLOW_ALL,
+            cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD,
+            cache_policy=redirect_cache,
+            origin_request_policy=forward_api_key
+        ),
+        additional_behaviors={
+            "/shortened-urls*": cloudfront.BehaviorOptions(
+                origin=origin,
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_ALL,
+                cache_policy=cloudfront.CachePolicy.CACHING_DISABLED,
+                origin_request_policy=forward_api_key
+            )
+        },
+        # unknown short ids are cached as well, scanners and typos do not
+        # reach the api again until the ttl expires
+        error_responses=[
+            cloudfront.ErrorResponse(
+                http_status=404,
+                ttl=cdk.Duration.seconds(redirect.NOT_FOUND_CACHE_TTL)
+            )
+        ]
+    )
@@ -0,0 +1 @@
+from . import latency_domain
@@ -0,0 +1,62 @@
+import aws_cdk as cdk
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_certificatemanager as acm
+from aws_cdk import aws_route53 as route53
+from constructs import Construct
+
+
+def create(
+        construct: Construct,
+        restapi: apigateway.RestApi,
+        domain_name: str,
+        hosted_zone_id: str,
+        certificate_arn: str
+) -> apigateway.DomainName:
+    """This function maps the api to a regional custom domain and adds a
+    latency record for the region of the stack. Every region serving the
+    domain adds its own record, Route 53 answers with the region closest
+    to the client.
+
+    :param restapi: API Gateway served on the domain
+    :param domain_name: custom domain, e.g. go.example.com
+    :param hosted_zone_id: id of the hosted zone of the domain
+    :param certificate_arn: ACM certificate of the domain in the region
+    :return: API Gateway domain name
+    """
+    region = cdk.Stack.of(construct).region
+    if not certificate_arn:
+        raise ValueError(
+            f"No certificate for the redirect domain {domain_name} in {region}"
+        )
+
+    domain = apigateway.DomainName(
+        construct,
+        id="redirect_domain",
+        domain_name=domain_name,
+        certificate=acm.Certificate.from_certificate_arn(
+            construct,
+            id="redirect_domain_certificate",
+            certificate_arn=certificate_arn
+        ),
+        endpoint_type=apigateway.EndpointType.REGIONAL,
+        security_policy=apigateway.SecurityPolicy.TLS_1_2
+    )
+    domain.add_base_path_mapping(restapi)
+
+    # latency based alias record, one per region
+    route53.CfnRecordSet(
+        construct,
+        id="redirect_latency_record",
+        hosted_zone_id=hosted_zone_id,
+        name=domain_name,
+        type="A",
+        region=region,
+        set_identifier=f"redirect-{region}",
+        alias_target=route53.CfnRecordSet.AliasTargetProperty(
+            dns_name=domain.domain_name_alias_domain_name,
+            hosted_zone_id=domain.domain_name_alias_hosted_zone_id,
+            evaluate_target_health=True
+        )
+    )
+
+    return domain
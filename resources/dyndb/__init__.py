@@ -1 +1 @@
-from . import shortened_urls
\ No newline at end of file
+from . import counters, shortened_urls
\ No newline at end of file
@@ -0,0 +1,43 @@
+import aws_cdk as cdk
+from aws_cdk import aws_dynamodb as dynamodb
+from constructs import Construct
+
+TABLE_NAME = "shortened_urls_counters"
+
+# counter item of the server generated short ids
+SHORT_ID_COUNTER = "shortId"
+
+# counter items of the short urls of an owner, owner:<api key id> with the
+# number of short urls in links
+OWNER_COUNTER_PREFIX = "owner:"
+OWNER_LINKS = "links"
+
+# marker items of the stream records already counted, event:<eventID>, which
+# expire after the records left the stream (24 hours)
+EVENT_MARKER_PREFIX = "event:"
+EXPIRES_AT = "expiresAt"
+EVENT_MARKER_TTL = cdk.Duration.days(2)
+
+
+def create(construct: Construct) -> dynamodb.Table:
+    """This function creates a DynamoDB table for the atomic counters of the
+    backend, e.g. the counter of the server generated short ids and the
+    number of short urls of every owner. Expired marker items of the
+    counted stream records are deleted by the time to live.
+
+    :return: DynamoDB table
+    """
+
+    return dynamodb.Table(
+        construct,
+        id="shortened_urls_counters",
+        table_name=TABLE_NAME,
+        partition_key=dynamodb.Attribute(
+            name="id",
+            type=dynamodb.AttributeType.STRING
+        ),
+        deletion_protection=False,
+        billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        time_to_live_attribute=EXPIRES_AT,
+        removal_policy=cdk.RemovalPolicy.DESTROY
+    )
@@ -1,36 +1,192 @@
+from typing import List
+
 import aws_cdk as cdk
 from aws_cdk import aws_dynamodb as dynamodb
 from constructs import Construct
 
+TABLE_NAME = "shortened_urls"
+
+# ttl attribute, epoch seconds after which the short url is expired, DynamoDB
+# deletes expired items within a few days
+EXPIRES_AT = "expiresAt"
+
+# number of redirects, added up from the access logs by the click aggregator
+CLICKS = "clicks"
+
+# owner index, newest short urls first
+OWNER_INDEX = "owner-created-index"
+
+# unsorted owner index of the first version, kept until createdAt is
+# backfilled (python -m bulk backfill), as CloudFormation adds or removes
+# only one index per update
+LEGACY_OWNER_INDEX = "owner-index"
+
+# write sharded owner index, the owner is split into shards by the id so the
+# short urls of a single owner are spread over several index partitions
+OWNER_SHARD_INDEX = "owner-shard-created-index"
+OWNER_SHARD = "ownerShard"
+MAX_OWNER_SHARDS = 16
+
+# auto scaling of provisioned capacity if not configured
+DEFAULT_SCALING = {
+    "min": 5,
+    "max": 100,
+    "targetUtilization": 70
+}
+
+
+def _auto_scale(scalable: dynamodb.IScalableTableAttribute, settings: dict):
+    scalable.scale_on_utilization(
+        target_utilization_percent=settings.get(
+            "targetUtilization", DEFAULT_SCALING["targetUtilization"]
+        )
+    )
+
+
+def _min(settings: dict) -> int:
+    return settings.get("min", DEFAULT_SCALING["min"])
+
 
-def create(construct: Construct) -> dynamodb.Table:
+def _max(settings: dict) -> int:
+    return settings.get("max", DEFAULT_SCALING["max"])
+
+
+def owner_shard(owner: str, short_id: str, shards: int) -> str:
+    """Sharded owner key of a short url, the same as owner_shard_template
+
+    :return: owner:n with n the Java hashCode of the id modulo shards
+    """
+    hash_code = 0
+    for char in short_id:
+        hash_code = (31 * hash_code + ord(char)) & 0xFFFFFFFF
+    if hash_code & 0x80000000:
+        hash_code -= 1 << 32
+    return f"{owner}:{hash_code % shards}"
+
+
+def owner_shard_template(short_id: str, shards: int) -> str:
+    """VTL which sets $shard to the shard number of a short id
+
+    :param short_id: reference to the id, e.g. $input.path('$.shortId')
+    :param shards: number of shards
+    :return: mapping template snippet
+    """
+    return f"""
+    #set($shard = {short_id}.hashCode() % {shards})
+    #if($shard < 0)
+      #set($shard = $shard + {shards})
+    #end
+    """.strip()
+
+
+def create(
+        construct: Construct,
+        replica_regions: List[str] = None,
+        capacity: dict = None,
+        owner_shards: int = None,
+        legacy_owner_index: bool = False
+) -> dynamodb.Table:
     """This function creates a DynamoDB table for storing shortened URLs.
 
+    :param replica_regions: regions of the replicas, makes the table a
+        global table (the stack needs an explicit region)
+    :param capacity: provisioned capacity with target tracking auto scaling
+        of the table and the owner index, on-demand if not given, e.g.
+        {"read": {"min": 5, "max": 500, "targetUtilization": 70},
+         "write": {...}, "indexRead": {...}, "indexWrite": {...}}
+        the index uses the settings of the table if not given
+    :param owner_shards: number of shards of the owner, replaces the owner
+        index with the sharded owner index if given
+    :param legacy_owner_index: keep the owner-index of the first version,
+        which is not read anymore, next to the owner index
     :return: DynamoDB table
     """
+    if owner_shards is not None and not 1 <= owner_shards <= MAX_OWNER_SHARDS:
+        raise ValueError(
+            f"owner_shards must be between 1 and {MAX_OWNER_SHARDS}"
+        )
+    index_name = OWNER_SHARD_INDEX if owner_shards else OWNER_INDEX
+    provisioned = capacity is not None
+    read = (capacity or {}).get("read", {})
+    write = (capacity or {}).get("write", {})
+    index_read = (capacity or {}).get("indexRead", read)
+    index_write = (capacity or {}).get("indexWrite", write)
 
     table = dynamodb.Table(
         construct,
         id="shortened_urls",
-        table_name="shortened_urls",
+        table_name=TABLE_NAME,
         partition_key=dynamodb.Attribute(
             name="id",
             type=dynamodb.AttributeType.STRING
         ),
         deletion_protection=False,
-        stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
-        billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,  # important!
+        stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,  # required by replicas
+        replication_regions=replica_regions or None,
+        time_to_live_attribute=EXPIRES_AT,
+        # on-demand unless provisioned capacity is configured, the initial
+        # capacity is the minimum of the auto scaling
+        billing_mode=dynamodb.BillingMode.PROVISIONED if provisioned
+        else dynamodb.BillingMode.PAY_PER_REQUEST,
+        read_capacity=_min(read) if provisioned else None,
+        write_capacity=_min(write) if provisioned else None,
         removal_policy=cdk.RemovalPolicy.DESTROY
     )
 
-    # add Index owner-index
+    # add Index owner-created-index (or owner-shard-created-index), sorted
+    # by creation time (epoch millis) and only projecting the attributes
+    # returned by the list
     table.add_global_secondary_index(
-        index_name="owner-index",
+        index_name=index_name,
         partition_key=dynamodb.Attribute(
-            name="owner",
+            name=OWNER_SHARD if owner_shards else "owner",
             type=dynamodb.AttributeType.STRING
         ),
-        projection_type=dynamodb.ProjectionType.ALL
+        sort_key=dynamodb.Attribute(
+            name="createdAt",
+            type=dynamodb.AttributeType.NUMBER
+        ),
+        projection_type=dynamodb.ProjectionType.INCLUDE,
+        non_key_attributes=["url", "timestamp"]
+        + (["owner"] if owner_shards else []),
+        read_capacity=_min(index_read) if provisioned else None,
+        write_capacity=_min(index_write) if provisioned else None
     )
 
+    if legacy_owner_index:
+        table.add_global_secondary_index(
+            index_name=LEGACY_OWNER_INDEX,
+            partition_key=dynamodb.Attribute(
+                name="owner",
+                type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.ALL,
+            read_capacity=_min(index_read) if provisioned else None,
+            write_capacity=_min(index_write) if provisioned else None
+        )
+
+    # target tracking auto scaling of the provisioned capacity
+    if provisioned:
+        _auto_scale(table.auto_scale_read_capacity(
+            min_capacity=_min(read),
+            max_capacity=_max(read)
+        ), read)
+        _auto_scale(table.auto_scale_write_capacity(
+            min_capacity=_min(write),
+            max_capacity=_max(write)
+        ), write)
+        # the legacy index gets every write of the table as well
+        for name in [index_name] + \
+                ([LEGACY_OWNER_INDEX] if legacy_owner_index else []):
+            _auto_scale(table.auto_scale_global_secondary_index_read_capacity(
+                name,
+                min_capacity=_min(index_read),
+                max_capacity=_max(index_read)
+            ), index_read)
+            _auto_scale(table.auto_scale_global_secondary_index_write_capacity(
+                name,
+                min_capacity=_min(index_write),
+                max_capacity=_max(index_write)
+            ), index_write)
+
     return table
@@ -0,0 +1 @@
+from . import list_formats, list_owner_shards, redirect
\ No newline at end of file
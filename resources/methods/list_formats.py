@@ -0,0 +1,104 @@
+from aws_cdk import aws_apigateway as apigateway
+
+# media type of the compact list GET /shortened-urls, selected with the
+# Accept header: one array per attribute and the owner only once
+COLUMNS_MEDIA_TYPE = "application/vnd.shortened-urls.columns+json"
+
+# ?cursor= of both list methods is base64 with padding, it is checked before
+# $util.base64Decode, which fails with a 500 otherwise
+CURSOR_PATTERN = "[A-Za-z0-9+/]+={0,2}"
+
+# decoded position of the last listed item in a cursor: createdAt,id with
+# the id url encoded
+POSITION_PATTERN = "[0-9]{1,13},([A-Za-z0-9._~*+-]|%[0-9A-Fa-f]{2})+"
+
+
+def compact(template: str) -> str:
+    """Join the lines of a template without their indentation and ##
+    comment lines, so the response has no whitespace. Comments at the end
+    of a line are not supported.
+
+    :param template: VTL template
+    :return: VTL template on a single line
+    """
+    return "".join(line.strip() for line in template.splitlines()
+                   if not line.strip().startswith("##"))
+
+
+def cursor_check(pattern: str) -> str:
+    """VTL which sets $validCursor: ?cursor= is not given or base64 of a
+    decoded cursor matching the pattern. The request template skips an
+    invalid cursor, the response templates check it again and answer 400,
+    as a request template cannot answer a request on its own.
+
+    :param pattern: regular expression of the decoded cursor
+    :return: VTL template, ?cursor= is in $requestCursor
+    """
+    return f"""
+        #set($requestCursor = $input.params('cursor'))
+        #set($validCursor = true)
+        #if($requestCursor != "")
+          #set($validCursor = false)
+          #set($padding = $requestCursor.length() % 4)
+          #if($padding == 0 && $requestCursor.matches("{CURSOR_PATTERN}"))
+            #set($validCursor = $util.base64Decode($requestCursor).matches("{pattern}"))
+          #end
+        #end
+    """.strip()
+
+
+# response of a cursor which is not the nextCursor of a previous page
+INVALID_CURSOR_TEMPLATE = """
+#set($context.responseOverride.status = 400)
+{"error": true,"message": "Invalid cursor"}
+""".strip()
+
+
+def service_error_response() -> apigateway.IntegrationResponse:
+    """Integration response of a request rejected by DynamoDB or Step
+    Functions, e.g. throttled reads of a provisioned table (429) or missing
+    permissions (500). The request templates only send valid requests, so
+    a 4xx is never the fault of the caller.
+
+    :return: 500 integration response
+    """
+    return apigateway.IntegrationResponse(
+        status_code="500",
+        selection_pattern="4\\d{2}",
+        response_templates={
+            "application/json": compact("""
+                #set($type = $input.path('$.__type'))
+                #if($type)
+                  #if($type.contains("Throttl") || $type.contains("ThroughputExceeded") || $type.contains("LimitExceeded"))
+                    #set($context.responseOverride.status = 429)
+                  #end
+                #end
+                {"error": true,"message": "List failed"}
+            """)
+        }
+    )
+
+
+def columns_template() -> str:
+    """Response template of the compact list of the items in $items with
+    the next cursor in $cursor (empty on the last page), e.g.
+
+    {"owner":"key","id":["gg"],"url":["https://..."],
+    "timestamp":["01/Jan/2024:12:00:00 +0000"],"createdAt":[1704110400000],
+    "nextCursor":null}
+
+    :return: VTL template without the variables
+    """
+    return compact("""
+        {"owner":"$context.identity.apiKeyId",
+        "id":[#foreach($elem in $items)"$elem.id.S"#if($foreach.hasNext),#end#end],
+        "url":[#foreach($elem in $items)"$elem.url.S"#if($foreach.hasNext),#end#end],
+        "timestamp":[#foreach($elem in $items)"$elem.timestamp.S"#if($foreach.hasNext),#end#end],
+        "createdAt":[#foreach($elem in $items)$elem.createdAt.N#if($foreach.hasNext),#end#end],
+        #if($cursor != "")
+        "nextCursor":"$cursor"
+        #{else}
+        "nextCursor":null
+        #end
+        }
+    """)
@@ -0,0 +1,239 @@
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_stepfunctions as sfn
+
+from resources.methods import list_formats
+
+# page size if ?limit= is not given, every shard reads up to limit items
+DEFAULT_LIMIT = 25
+
+# executions which did not succeed are reported as 500
+_STATUS_TEMPLATE = """
+#set($inputRoot = $input.path('$'))
+#if($inputRoot.status != "SUCCEEDED")
+  #set($context.responseOverride.status = 500)
+  {"error": true,"message": "List $inputRoot.status.toLowerCase()"}
+""".strip()
+
+# merge the shards newest first into $merged, the cursor of the next page
+# (not encoded) is set in $cursor
+_MERGE_TEMPLATE = """
+#set($shards = $util.parseJson($inputRoot.output))
+#set($positions = [])
+#set($merged = [])
+#set($limit = 0)
+#foreach($shard in $shards)
+  #set($ignore = $positions.add(0))
+  #set($limit = $shard.limit)
+#end
+## merge the shards, every shard is sorted newest first
+#if(!$shards.isEmpty())
+  #foreach($n in [1..$limit])
+    #set($best = -1)
+    #set($newest = -1)
+    #foreach($shard in $shards)
+      #set($position = $positions.get($foreach.index))
+      #if($position < $shard.result.Items.size())
+        #set($createdAt = $util.parseJson($shard.result.Items.get($position).createdAt.N))
+        #if($createdAt > $newest)
+          #set($best = $foreach.index)
+          #set($newest = $createdAt)
+        #end
+      #end
+    #end
+    #if($best >= 0)
+      #set($position = $positions.get($best))
+      #set($ignore = $merged.add($shards.get($best).result.Items.get($position)))
+      #set($position = $position + 1)
+      #set($ignore = $positions.set($best, $position))
+    #end
+  #end
+#end
+## shards with unlisted items continue after their last listed item
+#set($cursor = "")
+#set($separator = "")
+#foreach($shard in $shards)
+  #set($position = $positions.get($foreach.index))
+  #set($items = $shard.result.Items)
+  #set($n = $shard.value.n)
+  #if($position < $items.size() || "$!shard.result.LastEvaluatedKey" != "")
+    #if($position > 0)
+      #set($index = $position - 1)
+      #set($last = $items.get($index))
+      #set($cursor = "$cursor$separator$n,$last.createdAt.N,$util.urlEncode($last.id.S)")
+    #elseif("$!shard.value.id" != "")
+      #set($cursor = "$cursor$separator$n,$shard.value.createdAt,$util.urlEncode($shard.value.id)")
+    #else
+      #set($cursor = "$cursor$separator$n")
+    #end
+    #set($separator = ";")
+  #end
+#end
+""".strip()
+
+
+def create(
+        resource: apigateway.Resource,
+        state_machine: sfn.IStateMachine,
+        credentials_role: iam.IRole,
+        shards: int
+) -> apigateway.Method:
+    """This function adds the list GET /shortened-urls of a sharded owner
+    index to a resource. The shards are queried in parallel by the
+    list_owner state machine and merged newest first by the response
+    template, so a page reads up to limit items of every shard.
+
+    The cursor holds the last listed item of every shard which has more
+    items: n,createdAt,id (url encoded) joined with ; and base64 encoded.
+    Any other cursor is answered with 400.
+
+    :param resource: shortened-urls resource
+    :param state_machine: list_owner state machine
+    :param credentials_role: role with states:StartSyncExecution
+    :param shards: number of shards of the owner
+    :return: API Gateway method
+    """
+    shard = f"[0-9]{{1,2}}(,{list_formats.POSITION_PATTERN})?"
+    # an invalid cursor is answered with 400 by the response templates
+    cursor_check = list_formats.cursor_check(f"{shard}(;{shard})*")
+    return resource.add_method(
+        "GET",
+        api_key_required=True,
+        request_parameters={
+            "method.request.querystring.limit": False,
+            "method.request.querystring.cursor": False,
+            "method.request.querystring.since": False,
+            "method.request.querystring.until": False
+        },
+        integration=apigateway.AwsIntegration(
+            service="states",
+            subdomain="sync",
+            action="StartSyncExecution",
+            integration_http_method="POST",
+            options=apigateway.IntegrationOptions(
+                passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                credentials_role=credentials_role,
+                request_templates={
+                    "application/json": f"""
+                    #set($limit = $input.params('limit'))
+                    #if(!$limit.matches("[1-9][0-9]?|100"))
+                      #set($limit = "{DEFAULT_LIMIT}")
+                    #end
+                    #set($since = $input.params('since'))
+                    #if(!$since.matches("[0-9]{{1,13}}"))
+                      #set($since = "0")
+                    #end
+                    #set($until = $input.params('until'))
+                    #if(!$until.matches("[0-9]{{1,13}}"))
+                      #set($until = "9999999999999")
+                    #end
+                    #set($owner = $context.identity.apiKeyId)
+                    ## shard numbers with the id and creation time of the
+                    ## last listed item, the owner is always the caller
+                    #set($ns = [])
+                    #set($ids = [])
+                    #set($cs = [])
+                    {cursor_check}
+                    #if(!$validCursor)
+                      ## no shards, answered with 400 by the response template
+                    #elseif($requestCursor == "")
+                      #foreach($n in [0..{shards - 1}])
+                        #set($ignore = $ns.add($n))
+                        #set($ignore = $ids.add(""))
+                        #set($ignore = $cs.add(""))
+                      #end
+                    #else
+                      #foreach($entry in $util.base64Decode($requestCursor).split(";"))
+                        #set($parts = $entry.split(","))
+                        #if($ns.size() < {shards} && $parts.get(0).matches("[0-9]{{1,2}}"))
+                          #set($ignore = $ns.add($parts.get(0)))
+                          #set($id = "")
+                          #set($c = "")
+                          #if($parts.size() == 3)
+                            #if($parts.get(1).matches("[0-9]{{1,13}}"))
+                              ## the id is a string in the input string
+                              #set($id = $util.escapeJavaScript($util.urlDecode($parts.get(2))).replaceAll("\\\\'", "'"))
+                              #set($id = $util.escapeJavaScript($id).replaceAll("\\\\'", "'"))
+                              #set($c = $parts.get(1))
+                            #end
+                          #end
+                          #set($ignore = $ids.add($id))
+                          #set($ignore = $cs.add($c))
+                        #end
+                      #end
+                    #end
+                    {{
+                      "stateMachineArn": "{state_machine.state_machine_arn}",
+                      "input": "{{\\"limit\\": $limit, \\"since\\": \\"$since\\", \\"until\\": \\"$until\\", \\"shards\\": [#foreach($n in $ns)#set($i = $foreach.index){{\\"shard\\": \\"$owner:$n\\", \\"n\\": $n#if($cs.get($i) != ""), \\"id\\": \\"$ids.get($i)\\", \\"createdAt\\": \\"$cs.get($i)\\"#end}}#if($foreach.hasNext), #end#end]}}"
+                    }}
+                    """.strip()
+                },
+                integration_responses=[
+                    apigateway.IntegrationResponse(
+                        status_code="200",
+                        response_templates={
+                            "application/json": f"""
+                            {cursor_check}
+                            #if(!$validCursor)
+                              {list_formats.INVALID_CURSOR_TEMPLATE}
+                            #else
+                            {_STATUS_TEMPLATE}
+                            #else
+                              {_MERGE_TEMPLATE}
+                              {{
+                                "items": [
+                                  #foreach($elem in $merged) {{
+                                    "id": "$elem.id.S",
+                                    "url": "$elem.url.S",
+                                    "timestamp": "$elem.timestamp.S",
+                                    "createdAt": $elem.createdAt.N,
+                                    "owner": "$elem.owner.S"
+                                  }}#if ($foreach.hasNext),#end
+                                  #end
+                                ],
+                                #if($cursor != "")
+                                "nextCursor": "$util.base64Encode($cursor)"
+                                #else
+                                "nextCursor": null
+                                #end
+                              }}
+                            #end
+                            #end
+                            """.strip(),
+                            list_formats.COLUMNS_MEDIA_TYPE: list_formats.compact(f"""
+                            {cursor_check}
+                            #if(!$validCursor)
+                              {list_formats.INVALID_CURSOR_TEMPLATE}
+                            #{{else}}
+                            {_STATUS_TEMPLATE}
+                            #{{else}}
+                              {_MERGE_TEMPLATE}
+                              #if($cursor != "")
+                                #set($cursor = $util.base64Encode($cursor))
+                              #end
+                              #set($items = $merged)
+                              {list_formats.columns_template()}
+                            #end
+                            #end
+                            """)
+                        }
+                    ),
+                    list_formats.service_error_response()
+                ]
+            ),
+        ),
+        method_responses=[
+            apigateway.MethodResponse(
+                status_code="200"
+            ),
+            apigateway.MethodResponse(
+                status_code="400"
+            ),
+            apigateway.MethodResponse(
+                status_code="429"
+            ),
+            apigateway.MethodResponse(
+                status_code="500"
+            )
+        ]
+    )
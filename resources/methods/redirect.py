@@ -0,0 +1,210 @@
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_iam as iam
+
+from resources.dyndb import shortened_urls
+
+# redirect status codes of the short urls, 301 if not set
+REDIRECT_TYPES = [301, 302, 307, 308]
+
+# cache ttl of a short url in seconds (Cache-Control max-age), 300 if not set
+DEFAULT_CACHE_TTL = 300
+MAX_CACHE_TTL = 365 * 24 * 60 * 60
+
+# cache ttl of unknown short ids in seconds, short so new short urls with
+# the id become reachable soon
+NOT_FOUND_CACHE_TTL = 60
+
+
+def create(
+        resource: apigateway.Resource,
+        table_name: str,
+        credentials_role: iam.IRole,
+        consistent_read: bool = False
+) -> apigateway.Method:
+    """This function adds the redirect GET /{shortId} to a resource. It is
+    shared by the backend api and the regional redirect apis.
+
+    :param resource: {shortId} resource
+    :param table_name: name of the shortened urls table in the region
+    :param credentials_role: role with dynamodb:GetItem on the table
+    :param consistent_read: strongly consistent reads (twice the read
+        capacity), a just created short url may not be found otherwise
+    :return: API Gateway method
+    """
+    return resource.add_method(
+        "GET",
+        # the path parameter is the cache key of the stage cache
+        request_parameters={
+            "method.request.path.shortId": True
+        },
+        integration=apigateway.AwsIntegration(
+            service="dynamodb",
+            action="GetItem",
+            integration_http_method="POST",
+            options=apigateway.IntegrationOptions(
+                passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                credentials_role=credentials_role,
+                cache_key_parameters=["method.request.path.shortId"],
+                # only the attributes of the redirect are read
+                request_templates={
+                    "application/json": f"""
+                    {{
+                      "Key": {{
+                        "id": {{
+                          "S": "$input.params().path.shortId"
+                        }}
+                      }},
+                      "TableName": "{table_name}",
+                      "ProjectionExpression": "#u, #rt, #ct, #e",
+                      "ExpressionAttributeNames": {{
+                        "#u": "url",
+                        "#rt": "redirectType",
+                        "#ct": "cacheTtl",
+                        "#e": "{shortened_urls.EXPIRES_AT}"
+                      }},
+                      "ConsistentRead": {str(consistent_read).lower()}
+                    }}
+                    """.strip()
+                },
+                integration_responses=[
+                    apigateway.IntegrationResponse(
+                        status_code="301",
+                        # a miss is a 200 of GetItem without Item, so the
+                        # stage cache stores it like a hit, expired items
+                        # not deleted by the ttl yet are a miss as well and
+                        # the Cache-Control of a hit ends at its expiry, the
+                        # stage cache keeps the response for the fixed ttl
+                        # of the stage regardless
+                        response_templates={
+                            "application/json": f"""
+                            #set($inputRoot = $input.path('$'))
+                            #set($found = $inputRoot.toString().contains("Item"))
+                            #set($maxAge = {DEFAULT_CACHE_TTL})
+                            #if ($found && "$!inputRoot.Item.cacheTtl.N" != "")
+                              #set($maxAge = $util.parseJson($inputRoot.Item.cacheTtl.N))
+                            #end
+                            #if ($found && "$!inputRoot.Item.expiresAt.N" != "")
+                              #set($remaining = $util.parseJson($inputRoot.Item.expiresAt.N) - $context.requestTimeEpoch / 1000)
+                              #set($found = $remaining > 0)
+                              #if ($remaining < $maxAge)
+                                #set($maxAge = $remaining)
+                              #end
+                            #end
+                            #if ($found)
+                              #set($context.responseOverride.header.Location = $inputRoot.Item.url.S)
+                              #if ("$!inputRoot.Item.redirectType.N" != "")
+                                #set($context.responseOverride.status = $inputRoot.Item.redirectType.N)
+                              #end
+                              #set($context.responseOverride.header.Cache-Control = "max-age=$maxAge")
+                            #else
+                              #set($context.responseOverride.status = 404)
+                              #set($context.responseOverride.header.Cache-Control = "max-age={NOT_FOUND_CACHE_TTL}")
+                              {{"error": true,"message": "URL link does not exist"}}
+                            #end
+                            """.strip()
+                        },
+                        response_parameters={
+                            "method.response.header.Cache-Control": f"'max-age={DEFAULT_CACHE_TTL}'"
+                        }
+                    )
+                ]
+            ),
+        ),
+        # the status code is overridden with the redirect type of the item
+        method_responses=[
+            apigateway.MethodResponse(
+                status_code=str(redirect_type),
+                response_parameters={
+                    "method.response.header.Location": True,
+                    "method.response.header.Cache-Control": True
+                }
+            )
+            for redirect_type in REDIRECT_TYPES
+        ] + [
+            apigateway.MethodResponse(
+                status_code="404",
+                response_parameters={
+                    "method.response.header.Cache-Control": True
+                }
+            )
+        ]
+    )
+
+
+def create_head(
+        resource: apigateway.Resource,
+        table_name: str,
+        credentials_role: iam.IRole,
+        consistent_read: bool = False
+) -> apigateway.Method:
+    """This function adds the existence check HEAD /{shortId} to a
+    resource, 200 if the short id is taken and 404 otherwise. Only the id is
+    read and the response is never cached. Expired short urls are not found.
+
+    :param resource: {shortId} resource
+    :param table_name: name of the shortened urls table
+    :param credentials_role: role with dynamodb:GetItem on the table
+    :param consistent_read: strongly consistent reads
+    :return: API Gateway method
+    """
+    return resource.add_method(
+        "HEAD",
+        request_parameters={
+            "method.request.path.shortId": True
+        },
+        integration=apigateway.AwsIntegration(
+            service="dynamodb",
+            action="GetItem",
+            integration_http_method="POST",
+            options=apigateway.IntegrationOptions(
+                passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                credentials_role=credentials_role,
+                request_templates={
+                    "application/json": f"""
+                    {{
+                      "Key": {{
+                        "id": {{
+                          "S": "$input.params().path.shortId"
+                        }}
+                      }},
+                      "TableName": "{table_name}",
+                      "ProjectionExpression": "id, #e",
+                      "ExpressionAttributeNames": {{
+                        "#e": "{shortened_urls.EXPIRES_AT}"
+                      }},
+                      "ConsistentRead": {str(consistent_read).lower()}
+                    }}
+                    """.strip()
+                },
+                integration_responses=[
+                    apigateway.IntegrationResponse(
+                        status_code="200",
+                        response_templates={
+                            "application/json": """
+                            #set($inputRoot = $input.path('$'))
+                            #set($found = $inputRoot.toString().contains("Item"))
+                            #if ($found && "$!inputRoot.Item.expiresAt.N" != "")
+                              #set($found = $util.parseJson($inputRoot.Item.expiresAt.N) > $context.requestTimeEpoch / 1000)
+                            #end
+                            #if (!$found)
+                              #set($context.responseOverride.status = 404)
+                            #end
+                            """.strip()
+                        },
+                        response_parameters={
+                            "method.response.header.Cache-Control": "'no-cache'"
+                        }
+                    )
+                ]
+            ),
+        ),
+        method_responses=[
+            apigateway.MethodResponse(
+                status_code=status_code,
+                response_parameters={
+                    "method.response.header.Cache-Control": True
+                }
+            )
+            for status_code in ("200", "404")
+        ]
+    )
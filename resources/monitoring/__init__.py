@@ -0,0 +1 @@
+from . import access_logs, alarms, dashboard, profiles
@@ -0,0 +1,60 @@
+import json
+
+import aws_cdk as cdk
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_logs as logs
+from constructs import Construct
+
+NAMESPACE = "Backend"
+
+
+def create(construct: Construct) -> logs.LogGroup:
+    """This function creates the log group for the access logs of the stage
+
+    :return: CloudWatch log group
+    """
+    return logs.LogGroup(
+        construct,
+        id="access_logs",
+        retention=logs.RetentionDays.TWO_WEEKS,
+        removal_policy=cdk.RemovalPolicy.DESTROY
+    )
+
+
+def log_format() -> apigateway.AccessLogFormat:
+    """One JSON line per request with the fields used by the metric filters
+    and the click aggregator"""
+    return apigateway.AccessLogFormat.custom(json.dumps({
+        "requestId": apigateway.AccessLogField.context_request_id(),
+        "resourcePath": apigateway.AccessLogField.context_resource_path(),
+        "path": apigateway.AccessLogField.context_path(),
+        "httpMethod": apigateway.AccessLogField.context_http_method(),
+        "status": apigateway.AccessLogField.context_status(),
+        "responseLatency": apigateway.AccessLogField.context_response_latency(),
+        "integrationLatency": apigateway.AccessLogField.context_integration_latency(),
+        "apiKeyId": apigateway.AccessLogField.context_identity_api_key_id()
+    }))
+
+
+def throttled_requests_metric(
+        construct: Construct,
+        log_group: logs.LogGroup
+) -> cloudwatch.Metric:
+    """This function counts the requests rejected with 429 by the usage
+    plans, API Gateway only reports them as part of 4XXError
+
+    :param log_group: access logs of the stage
+    :return: metric of the throttled requests
+    """
+    metric_filter = logs.MetricFilter(
+        construct,
+        id="throttled_requests_filter",
+        log_group=log_group,
+        metric_namespace=NAMESPACE,
+        metric_name="ThrottledRequests",
+        filter_pattern=logs.FilterPattern.string_value("$.status", "=", "429"),
+        metric_value="1",
+        default_value=0
+    )
+    return metric_filter.metric(statistic=cloudwatch.Stats.SUM)
@@ -0,0 +1,98 @@
+from typing import List
+
+import aws_cdk as cdk
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_cloudwatch_actions as actions
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_sns as sns
+from aws_cdk import aws_sns_subscriptions as subscriptions
+from constructs import Construct
+
+from resources.monitoring.dashboard import (TABLE_OPERATIONS, api_methods,
+                                            method_metric, rate)
+
+
+def create(
+        construct: Construct,
+        restapi: apigateway.RestApi,
+        tables: List[dynamodb.Table],
+        throttled_requests: cloudwatch.IMetric,
+        latency_p99: cdk.Duration = cdk.Duration.seconds(1),
+        error_rate: float = 1.0,
+        throttled_rate: float = 5.0,
+        email: str = None
+) -> List[cloudwatch.Alarm]:
+    """This function creates the alarms of the api and the tables, which
+    notify an SNS topic
+
+    :param restapi: API Gateway
+    :param tables: DynamoDB tables used by the api
+    :param throttled_requests: requests rejected with 429
+    :param latency_p99: p99 latency of a method which raises an alarm
+    :param error_rate: percentage of 5XX responses which raises an alarm
+    :param throttled_rate: percentage of 429 responses which raises an alarm
+    :param email: address subscribed to the alarm topic
+    :return: CloudWatch alarms
+    """
+    period = cdk.Duration.minutes(1)
+    requests = restapi.metric_count(period=period, statistic="Sum")
+
+    topic = sns.Topic(construct, id="alarm_topic")
+    if email:
+        topic.add_subscription(subscriptions.EmailSubscription(email))
+
+    alarms = []
+    for method in api_methods(restapi):
+        alarms.append(cloudwatch.Alarm(
+            construct,
+            id=f"latency_alarm_{method.http_method}_{method.resource.node.id}",
+            alarm_description=f"p99 latency of {method.http_method} "
+                              f"{method.resource.path}",
+            metric=method_metric(restapi, method, "Latency", "p99"),
+            threshold=latency_p99.to_milliseconds(),
+            evaluation_periods=5,
+            datapoints_to_alarm=3,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        ))
+
+    alarms.append(cloudwatch.Alarm(
+        construct,
+        id="server_error_alarm",
+        alarm_description="5XX responses of the api in %",
+        metric=rate(restapi.metric_server_error(period=period, statistic="Sum"),
+                    requests, "5XX"),
+        threshold=error_rate,
+        evaluation_periods=5,
+        datapoints_to_alarm=3,
+        treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+    ))
+    alarms.append(cloudwatch.Alarm(
+        construct,
+        id="throttled_requests_alarm",
+        alarm_description="429 responses of the usage plans in %",
+        metric=rate(throttled_requests, requests, "429"),
+        threshold=throttled_rate,
+        evaluation_periods=5,
+        datapoints_to_alarm=3,
+        treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+    ))
+
+    for table in tables:
+        alarms.append(cloudwatch.Alarm(
+            construct,
+            id=f"{table.node.id}_throttled_alarm",
+            alarm_description=f"throttled requests of {table.node.id}",
+            metric=table.metric_throttled_requests_for_operations(
+                operations=TABLE_OPERATIONS,
+                period=period
+            ),
+            threshold=0,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            evaluation_periods=1,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+        ))
+
+    for alarm in alarms:
+        alarm.add_alarm_action(actions.SnsAction(topic))
+    return alarms
@@ -0,0 +1,190 @@
+import re
+from typing import List
+
+import aws_cdk as cdk
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_cloudwatch as cloudwatch
+from aws_cdk import aws_dynamodb as dynamodb
+from constructs import Construct
+
+PERCENTILES = ("p50", "p95", "p99")
+
+# operations of the api on the tables
+TABLE_OPERATIONS = [
+    dynamodb.Operation.GET_ITEM,
+    dynamodb.Operation.UPDATE_ITEM,
+    dynamodb.Operation.DELETE_ITEM,
+    dynamodb.Operation.QUERY,
+    dynamodb.Operation.BATCH_GET_ITEM,
+    dynamodb.Operation.PUT_ITEM
+]
+
+
+def method_metric(
+        restapi: apigateway.RestApi,
+        method: apigateway.Method,
+        metric_name: str,
+        statistic: str
+) -> cloudwatch.Metric:
+    """Detailed metric of a method, only reported if metrics are enabled
+
+    :param restapi: API Gateway of the method
+    :param method: API Gateway method
+    :param metric_name: e.g. Latency or IntegrationLatency
+    :param statistic: e.g. p99 or Sum
+    :return: CloudWatch metric
+    """
+    return cloudwatch.Metric(
+        namespace="AWS/ApiGateway",
+        metric_name=metric_name,
+        dimensions_map={
+            "ApiName": restapi.rest_api_name,
+            "Stage": restapi.deployment_stage.stage_name,
+            "Resource": method.resource.path,
+            "Method": method.http_method
+        },
+        statistic=statistic,
+        label=f"{method.http_method} {method.resource.path} {statistic}",
+        period=cdk.Duration.minutes(1)
+    )
+
+
+def rate(
+        count: cloudwatch.IMetric,
+        total: cloudwatch.IMetric,
+        label: str
+) -> cloudwatch.MathExpression:
+    """Percentage of count in total
+
+    :param label: label of the rate, also names the metric ids which have to
+        be unique in a graph
+    """
+    prefix = "r" + re.sub(r"\W", "", label).lower()
+    return cloudwatch.MathExpression(
+        expression=f"IF({prefix}_total > 0, "
+                   f"100 * {prefix}_count / {prefix}_total, 0)",
+        using_metrics={f"{prefix}_count": count, f"{prefix}_total": total},
+        label=label,
+        period=cdk.Duration.minutes(1)
+    )
+
+
+def api_methods(restapi: apigateway.RestApi) -> List[apigateway.Method]:
+    """Methods of the api without the CORS preflight methods"""
+    return [
+        method for method in restapi.methods
+        if method.http_method != "OPTIONS"
+    ]
+
+
+def create(
+        construct: Construct,
+        restapi: apigateway.RestApi,
+        tables: List[dynamodb.Table],
+        throttled_requests: cloudwatch.IMetric
+) -> cloudwatch.Dashboard:
+    """This function creates a CloudWatch dashboard with the latency per
+    method, the error, throttling and cache rates of the api and the
+    capacity used by the tables
+
+    :param restapi: API Gateway
+    :param tables: DynamoDB tables used by the api
+    :param throttled_requests: requests rejected with 429
+    :return: CloudWatch dashboard
+    """
+    period = cdk.Duration.minutes(1)
+    methods = api_methods(restapi)
+    requests = restapi.metric_count(period=period, statistic="Sum")
+
+    dashboard = cloudwatch.Dashboard(
+        construct,
+        id="dashboard",
+        dashboard_name=f"backend-{cdk.Aws.REGION}"
+    )
+
+    # latency and integration latency (dynamodb, step functions) per method
+    for method in methods:
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title=f"{method.http_method} {method.resource.path} latency (ms)",
+                left=[
+                    method_metric(restapi, method, "Latency", percentile)
+                    for percentile in PERCENTILES
+                ],
+                width=12
+            ),
+            cloudwatch.GraphWidget(
+                title=f"{method.http_method} {method.resource.path} integration latency (ms)",
+                left=[
+                    method_metric(restapi, method, "IntegrationLatency", percentile)
+                    for percentile in PERCENTILES
+                ],
+                width=12
+            )
+        )
+
+    dashboard.add_widgets(
+        cloudwatch.GraphWidget(
+            title="Requests",
+            left=[requests],
+            width=8
+        ),
+        cloudwatch.GraphWidget(
+            title="Error and throttling rates (%)",
+            left=[
+                rate(restapi.metric_client_error(period=period, statistic="Sum"),
+                     requests, "4XX"),
+                rate(throttled_requests, requests, "429"),
+                rate(restapi.metric_server_error(period=period, statistic="Sum"),
+                     requests, "5XX")
+            ],
+            width=8
+        ),
+        cloudwatch.GraphWidget(
+            title="Cache hit ratio (%)",
+            left=[
+                rate(restapi.metric_cache_hit_count(period=period, statistic="Sum"),
+                     cloudwatch.MathExpression(
+                         expression="hits + misses",
+                         using_metrics={
+                             "hits": restapi.metric_cache_hit_count(
+                                 period=period, statistic="Sum"
+                             ),
+                             "misses": restapi.metric_cache_miss_count(
+                                 period=period, statistic="Sum"
+                             )
+                         }
+                     ),
+                     "GET /{shortId}")
+            ],
+            width=8
+        )
+    )
+
+    for table in tables:
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title=f"{table.node.id} consumed capacity",
+                left=[
+                    table.metric_consumed_read_capacity_units(
+                        period=period, statistic="Sum"
+                    ),
+                    table.metric_consumed_write_capacity_units(
+                        period=period, statistic="Sum"
+                    )
+                ],
+                width=12
+            ),
+            cloudwatch.GraphWidget(
+                title=f"{table.node.id} throttled requests",
+                left=[
+                    table.metric_throttled_requests_for_operations(
+                        operations=TABLE_OPERATIONS,
+                        period=period
+                    )
+                ],
+                width=12
+            )
+        )
+
+    return dashboard
@@ -0,0 +1,92 @@
+import aws_cdk as cdk
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_xray as xray
+from constructs import Construct
+
+# stage settings of the observability profiles:
+#   off     no execution logs, detailed metrics or traces
+#   metrics detailed (per method) metrics and error logs, no request bodies
+#   trace   execution logs with request and response bodies and x-ray traces
+PROFILES = {
+    "off": {
+        "logging_level": apigateway.MethodLoggingLevel.OFF,
+        "data_trace_enabled": False,
+        "metrics_enabled": False,
+        "tracing_enabled": False
+    },
+    "metrics": {
+        "logging_level": apigateway.MethodLoggingLevel.ERROR,
+        "data_trace_enabled": False,
+        "metrics_enabled": True,
+        "tracing_enabled": False
+    },
+    "trace": {
+        "logging_level": apigateway.MethodLoggingLevel.INFO,
+        "data_trace_enabled": True,
+        "metrics_enabled": True,
+        "tracing_enabled": True
+    }
+}
+
+DEFAULT_PROFILE = "trace"
+
+
+def stage_options(profile: str) -> dict:
+    """Logging, metrics and tracing options of the stage
+
+    :param profile: name of the profile
+    :return: keyword arguments of apigateway.StageOptions
+    """
+    if profile not in PROFILES:
+        raise ValueError(
+            f"Unknown observability profile '{profile}', "
+            f"expected one of {', '.join(PROFILES)}"
+        )
+    return dict(PROFILES[profile])
+
+
+def method_options(profile: str) -> dict:
+    """Logging and metrics options of a method, method settings replace the
+    settings of the stage
+
+    :param profile: name of the profile
+    :return: keyword arguments of apigateway.MethodDeploymentOptions
+    """
+    options = stage_options(profile)
+    del options["tracing_enabled"]
+    return options
+
+
+def sampling_rule(
+        construct: Construct,
+        restapi: apigateway.RestApi,
+        rate: float
+) -> xray.CfnSamplingRule:
+    """This function creates an X-Ray sampling rule for the stage, which
+    replaces the default rule (first request each second and 5% of the
+    others)
+
+    :param restapi: traced API Gateway
+    :param rate: share of the requests traced, between 0 and 1
+    :return: X-Ray sampling rule
+    """
+    stage = restapi.deployment_stage
+    return xray.CfnSamplingRule(
+        construct,
+        id="sampling_rule",
+        sampling_rule=xray.CfnSamplingRule.SamplingRuleProperty(
+            rule_name=f"backend-{cdk.Names.unique_id(construct)[-20:]}",
+            priority=100,
+            fixed_rate=rate,
+            reservoir_size=0,
+            service_name="*",
+            service_type="AWS::ApiGateway::Stage",
+            host="*",
+            http_method="*",
+            url_path="*",
+            resource_arn=f"arn:{cdk.Aws.PARTITION}:apigateway:{cdk.Aws.REGION}"
+                         f"::/restapis/{restapi.rest_api_id}"
+                         f"/stages/{stage.stage_name}",
+            version=1
+        )
+    )
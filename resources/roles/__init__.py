@@ -1 +1 @@
-from . import dyndb_crud, dyndb_list
\ No newline at end of file
+from . import dyndb_counters, dyndb_crud, dyndb_list, dyndb_read, lambda_clicks, pipes_stream, states_sync
\ No newline at end of file
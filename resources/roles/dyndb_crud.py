@@ -19,6 +19,7 @@ def create(construct: Construct, table_arn: str) -> iam.Role:
                     iam.PolicyStatement(
                         actions=[
                             "dynamodb:GetItem",
+                            "dynamodb:BatchGetItem",
                             "dynamodb:DeleteItem",
                             "dynamodb:UpdateItem"
                         ],
@@ -0,0 +1,34 @@
+from aws_cdk import aws_iam as iam
+from constructs import Construct
+
+
+def create(construct: Construct, table_arn: str) -> iam.Role:
+    """Click aggregator role for Lambda
+
+    :param table_arn: DynamoDB table ARN
+    :return: IAM role
+    """
+    # create role for the aggregator to add the clicks to the short urls
+    return iam.Role(
+        construct,
+        id="lambda_clicks_role",
+        assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
+        managed_policies=[
+            iam.ManagedPolicy.from_aws_managed_policy_name(
+                "service-role/AWSLambdaBasicExecutionRole"
+            )
+        ],
+        inline_policies={
+            "dynamodb": iam.PolicyDocument(
+                statements=[
+                    iam.PolicyStatement(
+                        actions=[
+                            "dynamodb:UpdateItem"
+                        ],
+                        effect=iam.Effect.ALLOW,
+                        resources=[table_arn]
+                    )
+                ]
+            )
+        }
+    )
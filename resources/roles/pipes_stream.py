@@ -0,0 +1,41 @@
+from aws_cdk import aws_iam as iam
+from constructs import Construct
+
+
+def create(construct: Construct, stream_arn: str,
+           state_machine_arn: str) -> iam.Role:
+    """DynamoDB stream to Step Functions role for EventBridge Pipes
+
+    :param stream_arn: DynamoDB stream ARN
+    :param state_machine_arn: express state machine ARN
+    :return: IAM role
+    """
+    # create role for the pipe to read the stream and run the state machine
+    return iam.Role(
+        construct,
+        id="pipes_stream_role",
+        assumed_by=iam.ServicePrincipal("pipes.amazonaws.com"),
+        inline_policies={
+            "stream": iam.PolicyDocument(
+                statements=[
+                    iam.PolicyStatement(
+                        actions=[
+                            "dynamodb:DescribeStream",
+                            "dynamodb:GetRecords",
+                            "dynamodb:GetShardIterator",
+                            "dynamodb:ListStreams"
+                        ],
+                        effect=iam.Effect.ALLOW,
+                        resources=[stream_arn]
+                    ),
+                    iam.PolicyStatement(
+                        actions=[
+                            "states:StartSyncExecution"
+                        ],
+                        effect=iam.Effect.ALLOW,
+                        resources=[state_machine_arn]
+                    )
+                ]
+            )
+        }
+    )
@@ -0,0 +1,31 @@
+from typing import List
+
+from aws_cdk import aws_iam as iam
+from constructs import Construct
+
+
+def create(construct: Construct, state_machine_arns: List[str]) -> iam.Role:
+    """Step Functions synchronous execution role for API Gateway
+
+    :param state_machine_arns: express state machine ARNs
+    :return: IAM role
+    """
+    # create role for api gateway to run the express state machines
+    return iam.Role(
+        construct,
+        id="api_gateway_states_sync_role",
+        assumed_by=iam.ServicePrincipal("apigateway.amazonaws.com"),
+        inline_policies={
+            "states": iam.PolicyDocument(
+                statements=[
+                    iam.PolicyStatement(
+                        actions=[
+                            "states:StartSyncExecution"
+                        ],
+                        effect=iam.Effect.ALLOW,
+                        resources=state_machine_arns
+                    )
+                ]
+            )
+        }
+    )
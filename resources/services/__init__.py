@@ -1 +1,2 @@
 from .backend_service import BackendService
+from .redirect_service import RedirectService
\ No newline at end of file
@@ -1,20 +1,130 @@
+from typing import Dict, List
+
+import aws_cdk as cdk
 from aws_cdk import aws_apigateway as apigateway
 from constructs import Construct
 
-from resources.dyndb import shortened_urls
-from resources.roles import dyndb_crud, dyndb_list
+from resources.cdn import redirect_distribution
+from resources.dyndb import counters, shortened_urls
+from resources.methods import list_formats, list_owner_shards, redirect
+from resources.monitoring import access_logs, alarms, dashboard, profiles
+from resources.roles import dyndb_counters, dyndb_crud, dyndb_list, states_sync
+from resources.services.redirect_service import RedirectService
+from resources.streams import clicks
+from resources.streams import owner_stats as owner_stats_pipe
+from resources.throttling import stage_throttles, usage_plans
+from resources.workflows import batch_create, batch_delete, list_owner, owner_stats
+
+# server generated short ids are the numbers of the id counter scrambled with
+# a multiplier coprime to 62 and an offset, encoded as fixed length base62 where every digit
+# is the running sum of the lower digits, so consecutive ids look unrelated
+SHORT_ID_ALPHABET = "HwVIbkRtQ2u3dPvOY68hZjNolEny9CscSK5DiLrXfU17meG0pzWAMgJTFq4Bax"
+SHORT_ID_LENGTH = 6
+SHORT_ID_MULTIPLIER = 150000001
+SHORT_ID_OFFSET = 31415926535
+
+# maximum number of short ids per allocation
+MAX_SHORT_IDS = 100
+
+# shape of the generated ids, hand-picked ids must not have it so they never
+# take an id the counter hands out later
+GENERATED_SHORT_ID_PATTERN = f"^[0-9A-Za-z]{{{SHORT_ID_LENGTH}}}$"
+
+
+def _generated_ids_reserved() -> List[apigateway.JsonSchema]:
+    """anyOf of a short url to create: a hand-picked shortId without the
+    shape of a generated id, or an id of POST /shortened-urls/ids created
+    with "allocated": true
+
+    :return: schemas of the anyOf
+    """
+    return [
+        apigateway.JsonSchema(properties={
+            "shortId": apigateway.JsonSchema(
+                not_=apigateway.JsonSchema(pattern=GENERATED_SHORT_ID_PATTERN)
+            )
+        }),
+        apigateway.JsonSchema(required=["allocated"], properties={
+            "allocated": apigateway.JsonSchema(enum=[True])
+        })
+    ]
 
 
 class BackendService(Construct):
     def __init__(
             self,
             scope: Construct,
-            id: str
+            id: str,
+            *,
+            cache_enabled: bool = False,
+            cache_cluster_size: str = "0.5",
+            cache_ttl: cdk.Duration = cdk.Duration.minutes(5),
+            consistent_reads: bool = False,
+            edge_cache_enabled: bool = False,
+            edge_cache_max_ttl: cdk.Duration = cdk.Duration.days(1),
+            usage_plan_tiers: Dict[str, dict] = None,
+            redirect_throttle: dict = None,
+            replica_regions: List[str] = None,
+            table_capacity: dict = None,
+            owner_shards: int = None,
+            legacy_owner_index: bool = False,
+            min_compression_size: int = 1024,
+            domain_name: str = None,
+            hosted_zone_id: str = None,
+            certificate_arn: str = None,
+            observability_profile: str = profiles.DEFAULT_PROFILE,
+            sampling_rate: float = None,
+            alarm_latency_p99: cdk.Duration = cdk.Duration.seconds(1),
+            alarm_email: str = None
     ):
+        """Backend service with the API Gateway and the DynamoDB table
+
+        :param cache_enabled: enable the stage cache cluster for GET /{shortId}
+        :param cache_cluster_size: size of the cache cluster in GB
+        :param cache_ttl: time to live of cached redirects
+        :param consistent_reads: strongly consistent reads of the redirects
+            and existence checks
+        :param edge_cache_enabled: put a CloudFront distribution in front of
+            the api which caches GET /{shortId}
+        :param edge_cache_max_ttl: upper bound for redirects cached at the edge
+        :param usage_plan_tiers: usage plan tiers with per method throttles,
+            see usage_plans.create
+        :param redirect_throttle: stage throttle of GET /{shortId} for all
+            callers, see stage_throttles.method_options
+        :param replica_regions: regions of the replicas of the global table,
+            the table is a single region table if not given
+        :param table_capacity: provisioned capacity and auto scaling of the
+            shortened urls table, on-demand if not given, see
+            shortened_urls.create
+        :param owner_shards: number of shards of the owner index, spreads the
+            short urls of a single api key over several index partitions
+        :param legacy_owner_index: keep the owner-index of the first version
+            until createdAt is backfilled, see shortened_urls.create
+        :param min_compression_size: responses of at least this many bytes
+            are gzip compressed for clients which accept it, disabled if None
+        :param domain_name: custom redirect domain with latency routing,
+            e.g. go.example.com, served by a redirect only api like in the
+            replica regions
+        :param hosted_zone_id: id of the hosted zone of the domain
+        :param certificate_arn: ACM certificate of the domain in the region
+        :param observability_profile: off, metrics or trace, see
+            profiles.PROFILES
+        :param sampling_rate: share of the requests traced by X-Ray, the
+            default sampling rule applies if not given
+        :param alarm_latency_p99: p99 latency of a method which raises an
+            alarm
+        :param alarm_email: address notified of alarms
+        """
         super().__init__(scope, id)
 
         # create dynamodb table
-        db_shortened_urls = shortened_urls.create(self)
+        db_shortened_urls = shortened_urls.create(
+            self,
+            replica_regions=replica_regions,
+            capacity=table_capacity,
+            owner_shards=owner_shards,
+            legacy_owner_index=legacy_owner_index
+        )
 
         # create role for dynamodb crud
         dyndb_crud_role = dyndb_crud.create(
@@ -27,26 +137,110 @@ class BackendService(Construct):
             table_arn=db_shortened_urls.table_arn
         )
 
+        # create dynamodb table for the counters
+        db_counters = counters.create(self)
+
+        dyndb_counters_role = dyndb_counters.create(
+            self,
+            table_arn=db_counters.table_arn
+        )
+
+        # count the short urls of every owner from the table stream, so the
+        # stats of an owner are a single GetItem
+        sm_owner_stats = owner_stats.create(self, counters_table=db_counters)
+        owner_stats_pipe.create(
+            self,
+            table=db_shortened_urls,
+            state_machine=sm_owner_stats
+        )
+
+        # create state machines for the batch requests
+        sm_batch_create = batch_create.create(
+            self,
+            table=db_shortened_urls,
+            sharded=owner_shards is not None
+        )
+        sm_batch_delete = batch_delete.create(self, table=db_shortened_urls)
+        state_machines = [sm_batch_create, sm_batch_delete]
+
+        # the list of a sharded owner index queries the shards in parallel
+        if owner_shards:
+            sm_list_owner = list_owner.create(self, table=db_shortened_urls)
+            state_machines.append(sm_list_owner)
+
+        states_sync_role = states_sync.create(
+            self,
+            state_machine_arns=[
+                state_machine.state_machine_arn
+                for state_machine in state_machines
+            ]
+        )
+
+        # create the log group for the access logs
+        access_log_group = access_logs.create(self)
+
+        # count the redirects from the access logs, off the redirect path
+        clicks.create(
+            self,
+            table=db_shortened_urls,
+            log_group=access_log_group
+        )
+
+        # the cache cluster only serves GET /{shortId}, every other method
+        # (especially DELETE) bypasses it
+        redirect_options = {}
+        if cache_enabled:
+            redirect_options.update(caching_enabled=True, cache_ttl=cache_ttl)
+        # the redirect has no api key, so it is throttled on the stage
+        if redirect_throttle:
+            redirect_options.update(
+                stage_throttles.method_options(redirect_throttle)
+            )
+        method_options = {}
+        if redirect_options:
+            method_options["/{shortId}/GET"] = apigateway.MethodDeploymentOptions(
+                **profiles.method_options(observability_profile),
+                **redirect_options
+            )
+        if cache_enabled:
+            method_options["/{shortId}/DELETE"] = apigateway.MethodDeploymentOptions(
+                **profiles.method_options(observability_profile),
+                caching_enabled=False
+            )
+
         # create the api gateway
         restapi = apigateway.RestApi(
             self,
             id="backend-api",
             rest_api_name="Backend API",
+            min_compression_size=cdk.Size.bytes(min_compression_size)
+            if min_compression_size is not None else None,
             default_cors_preflight_options=apigateway.CorsOptions(
                 allow_origins=apigateway.Cors.ALL_ORIGINS,
                 allow_methods=apigateway.Cors.ALL_METHODS,
                 allow_headers=apigateway.Cors.DEFAULT_HEADERS,
             ),
-            # enable logging, data tracing, metrics, and x-ray tracing
+            # logging, data tracing, metrics, and x-ray tracing of the
+            # observability profile, access logs feed the throttling metric
             deploy_options=apigateway.StageOptions(
-                logging_level=apigateway.MethodLoggingLevel.INFO,
-                data_trace_enabled=True,
-                metrics_enabled=True,
-                tracing_enabled=True,
+                **profiles.stage_options(observability_profile),
+                access_log_destination=apigateway.LogGroupLogDestination(
+                    access_log_group
+                ),
+                access_log_format=access_logs.log_format(),
+                cache_cluster_enabled=cache_enabled,
+                cache_cluster_size=cache_cluster_size if cache_enabled else None,
+                method_options=method_options or None
             ),
             cloud_watch_role=True
         )
 
+        # validates request bodies against the request models
+        body_validator = restapi.add_request_validator(
+            id="body_validator",
+            validate_request_body=True
+        )
+
         # add shortened urls resource
         res_short_id = restapi.root.add_resource(
             "{shortId}",
@@ -57,54 +251,20 @@ class BackendService(Construct):
             )
         )
 
-        res_short_id.add_method(
-            "GET",
-            integration=apigateway.AwsIntegration(
-                service="dynamodb",
-                action="GetItem",
-                integration_http_method="POST",
-                options=apigateway.IntegrationOptions(
-                    passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
-                    credentials_role=dyndb_crud_role,
-                    request_templates={
-                        "application/json": f"""
-                        {{
-                          "Key": {{
-                            "id": {{
-                              "S": "$input.params().path.shortId"
-                            }}
-                          }},
-                          "TableName": "{db_shortened_urls.table_name}"
-                        }}
-                        """.strip()
-                    },
-                    integration_responses=[
-                        apigateway.IntegrationResponse(
-                            status_code="301",
-                            response_templates={
-                                "application/json": """
-                                #set($inputRoot = $input.path('$'))
-                                #if ($inputRoot.toString().contains("Item"))
-                                  #set($context.responseOverride.header.Location = $inputRoot.Item.url.S)
-                                #end
-                                """.strip()
-                            },
-                            response_parameters={
-                                "method.response.header.Cache-Control": "'max-age=300'"
-                            }
-                        )
-                    ]
-                ),
-            ),
-            method_responses=[
-                apigateway.MethodResponse(
-                    status_code="301",
-                    response_parameters={
-                        "method.response.header.Location": True,
-                        "method.response.header.Cache-Control": True
-                    }
-                )
-            ]
+        # add redirect GET /{shortId}
+        redirect.create(
+            res_short_id,
+            table_name=db_shortened_urls.table_name,
+            credentials_role=dyndb_crud_role,
+            consistent_read=consistent_reads
+        )
+
+        # add existence check HEAD /{shortId}, e.g. for vanity ids
+        redirect.create_head(
+            res_short_id,
+            table_name=db_shortened_urls.table_name,
+            credentials_role=dyndb_crud_role,
+            consistent_read=consistent_reads
         )
 
         # add delete shortened url resource DELETE, filter by owner == api key
@@ -177,30 +337,305 @@ class BackendService(Construct):
             )
         )
 
+        # newest first, pages are limited with ?limit=, the next page is
+        # requested with the opaque ?cursor= returned as nextCursor and the
+        # creation time (epoch millis) is filtered with ?since= and ?until=
+        if owner_shards:
+            list_owner_shards.create(
+                res_shortened_urls,
+                state_machine=sm_list_owner,
+                credentials_role=states_sync_role,
+                shards=owner_shards
+            )
+        else:
+            # an invalid cursor is answered with 400 by the response templates
+            cursor_check = list_formats.cursor_check(
+                list_formats.POSITION_PATTERN
+            )
+            res_shortened_urls.add_method(
+                "GET",
+                api_key_required=True,
+                request_parameters={
+                    "method.request.querystring.limit": False,
+                    "method.request.querystring.cursor": False,
+                    "method.request.querystring.since": False,
+                    "method.request.querystring.until": False
+                },
+                integration=apigateway.AwsIntegration(
+                    service="dynamodb",
+                    action="Query",
+                    integration_http_method="POST",
+                    options=apigateway.IntegrationOptions(
+                        passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                        credentials_role=dyndb_list_role,
+                        request_templates={
+                            "application/json": f"""
+                                    #set($limit = $input.params('limit'))
+                                    #set($since = $input.params('since'))
+                                    #set($until = $input.params('until'))
+                                    #set($hasSince = $since.matches("[0-9]{{1,13}}"))
+                                    #set($hasUntil = $until.matches("[0-9]{{1,13}}"))
+                                    ## the cursor is createdAt,id (url encoded) of the
+                                    ## last listed item, base64 encoded
+                                    {cursor_check}
+                                    {{
+                                      "TableName": "{db_shortened_urls.table_name}",
+                                      "IndexName": "{shortened_urls.OWNER_INDEX}",
+                                      "KeyConditionExpression": "#o = :o#if($hasSince && $hasUntil) AND #c BETWEEN :since AND :until#elseif($hasSince) AND #c >= :since#elseif($hasUntil) AND #c <= :until#end",
+                                      "ScanIndexForward": false,
+                                      "ExpressionAttributeNames": {{
+                                        "#o": "owner"
+                                        #if($hasSince || $hasUntil)
+                                        ,"#c": "createdAt"
+                                        #end
+                                      }},
+                                      "ExpressionAttributeValues": {{
+                                        ":o": {{
+                                          "S": "$context.identity.apiKeyId"
+                                        }}
+                                        #if($hasSince)
+                                        ,":since": {{
+                                          "N": "$since"
+                                        }}
+                                        #end
+                                        #if($hasUntil)
+                                        ,":until": {{
+                                          "N": "$until"
+                                        }}
+                                        #end
+                                      }}
+                                      #if(!$validCursor)
+                                      ## answered with 400 by the response template
+                                      ,"Limit": 1
+                                      #elseif($limit.matches("[1-9][0-9]?|100"))
+                                      ,"Limit": $limit
+                                      #end
+                                      #if($validCursor && $requestCursor != "")
+                                      ## only the id and the creation time are taken
+                                      ## from the cursor, the owner is always the caller
+                                      #set($parts = $util.base64Decode($requestCursor).split(","))
+                                      #set($id = $util.escapeJavaScript($util.urlDecode($parts.get(1))).replaceAll("\\\\'", "'"))
+                                      ,"ExclusiveStartKey": {{
+                                        "id": {{
+                                          "S": "$id"
+                                        }},
+                                        "createdAt": {{
+                                          "N": "$parts.get(0)"
+                                        }},
+                                        "owner": {{
+                                          "S": "$context.identity.apiKeyId"
+                                        }}
+                                      }}
+                                      #end
+                                    }}
+                                    """.strip()
+                        },
+                        integration_responses=[
+                            apigateway.IntegrationResponse(
+                                status_code="200",
+                                response_templates={
+                                    "application/json": f"""
+                                            {cursor_check}
+                                            #if(!$validCursor)
+                                            {list_formats.INVALID_CURSOR_TEMPLATE}
+                                            #else
+                                            #set($inputRoot = $input.path('$'))
+                                            {{
+                                              "items": [
+                                                #foreach($elem in $inputRoot.Items) {{
+                                                  "id": "$elem.id.S",
+                                                  "url": "$elem.url.S",
+                                                  "timestamp": "$elem.timestamp.S",
+                                                  "createdAt": $elem.createdAt.N,
+                                                  "owner": "$elem.owner.S"
+                                                }}#if ($foreach.hasNext),#end
+                                                #end
+                                              ],
+                                              #if($inputRoot.LastEvaluatedKey)
+                                              #set($key = $inputRoot.LastEvaluatedKey)
+                                              #set($cursor = "$key.createdAt.N,$util.urlEncode($key.id.S)")
+                                              "nextCursor": "$util.base64Encode($cursor)"
+                                              #else
+                                              "nextCursor": null
+                                              #end
+                                            }}
+                                            #end
+                                            """.strip(),
+                                    list_formats.COLUMNS_MEDIA_TYPE: list_formats.compact(f"""
+                                            {cursor_check}
+                                            #if(!$validCursor)
+                                            {list_formats.INVALID_CURSOR_TEMPLATE}
+                                            #{{else}}
+                                            #set($inputRoot = $input.path('$'))
+                                            #set($items = $inputRoot.Items)
+                                            #set($cursor = "")
+                                            #if($inputRoot.LastEvaluatedKey)
+                                              #set($key = $inputRoot.LastEvaluatedKey)
+                                              #set($cursor = "$key.createdAt.N,$util.urlEncode($key.id.S)")
+                                              #set($cursor = $util.base64Encode($cursor))
+                                            #end
+                                            {list_formats.columns_template()}
+                                            #end
+                                            """)
+                                }
+                            ),
+                            list_formats.service_error_response()
+                        ]
+                    ),
+                ),
+                method_responses=[
+                    apigateway.MethodResponse(
+                        status_code="200"
+                    ),
+                    apigateway.MethodResponse(
+                        status_code="400"
+                    ),
+                    apigateway.MethodResponse(
+                        status_code="429"
+                    ),
+                    apigateway.MethodResponse(
+                        status_code="500"
+                    )
+                ]
+            )
+
+        # the sharded owner key owner:n of the owner index is written with the
+        # owner, n is derived from the short id ($shard is not set otherwise)
+        create_shard_template = shortened_urls.owner_shard_template(
+            "$input.path('$.shortId')", owner_shards
+        ) if owner_shards else ""
+        batch_shard_template = f"""
+                                #foreach($item in $input.path('$.items'))
+                                  {shortened_urls.owner_shard_template("$item.shortId", owner_shards)}
+                                  #set($ignore = $shards.add($shard))
+                                #end
+                                """.strip() if owner_shards else ""
+
+        # add create shortened url resource POST, cacheTtl and redirectType
+        # are optional and change the Cache-Control and status of the redirect,
+        # expired short urls which are not deleted by the ttl yet are replaced
         res_shortened_urls.add_method(
-            "GET",
+            "POST",
             api_key_required=True,
+            request_validator=body_validator,
+            request_models={
+                "application/json": restapi.add_model(
+                    id="create_model",
+                    content_type="application/json",
+                    schema=apigateway.JsonSchema(
+                        schema=apigateway.JsonSchemaVersion.DRAFT4,
+                        type=apigateway.JsonSchemaType.OBJECT,
+                        required=["shortId", "url"],
+                        any_of=_generated_ids_reserved(),
+                        properties={
+                            "shortId": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.STRING,
+                                min_length=1
+                            ),
+                            "allocated": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.BOOLEAN
+                            ),
+                            "url": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.STRING,
+                                min_length=1
+                            ),
+                            "cacheTtl": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.INTEGER,
+                                minimum=0,
+                                maximum=redirect.MAX_CACHE_TTL
+                            ),
+                            "redirectType": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.INTEGER,
+                                enum=redirect.REDIRECT_TYPES
+                            ),
+                            # expiry as epoch seconds or seconds from now,
+                            # expiresAt wins if both are given
+                            "expiresAt": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.INTEGER,
+                                minimum=0
+                            ),
+                            "ttlSeconds": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.INTEGER,
+                                minimum=1
+                            )
+                        }
+                    )
+                )
+            },
             integration=apigateway.AwsIntegration(
                 service="dynamodb",
-                action="Query",
+                action="UpdateItem",
                 integration_http_method="POST",
                 options=apigateway.IntegrationOptions(
                     passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
-                    credentials_role=dyndb_list_role,
+                    credentials_role=dyndb_crud_role,
                     request_templates={
                         "application/json": f"""
+                                #set($cacheTtl = $input.path('$.cacheTtl'))
+                                #set($redirectType = $input.path('$.redirectType'))
+                                #set($now = $context.requestTimeEpoch / 1000)
+                                #set($expiresAt = $input.path('$.expiresAt'))
+                                #set($ttlSeconds = $input.path('$.ttlSeconds'))
+                                #if("$!expiresAt" == "" && "$!ttlSeconds" != "")
+                                  #set($expiresAt = $now + $ttlSeconds)
+                                #end
+                                {create_shard_template}
+                                ## optional attributes left over by an expired short url are removed
+                                #set($remove = [])
+                                #if("$!cacheTtl" == "")#set($ignore = $remove.add('#ct'))#end
+                                #if("$!redirectType" == "")#set($ignore = $remove.add('#rt'))#end
+                                #if("$!expiresAt" == "")#set($ignore = $remove.add('#e'))#end
+                                #set($ignore = $remove.add('#cl'))
                                 {{
                                   "TableName": "{db_shortened_urls.table_name}",
-                                  "IndexName": "owner-index",
-                                  "KeyConditionExpression": "#o = :o",
+                                  "ConditionExpression": "attribute_not_exists(id) OR #e < :now",
+                                  "Key": {{
+                                    "id": {{
+                                      "S": $input.json('$.shortId')
+                                    }}
+                                  }},
                                   "ExpressionAttributeNames": {{
-                                    "#o": "owner"
+                                    "#u": "url",
+                                    "#o": "owner",
+                                    "#ts": "timestamp",
+                                    "#c": "createdAt",
+                                    "#ct": "cacheTtl",
+                                    "#rt": "redirectType",
+                                    "#e": "{shortened_urls.EXPIRES_AT}",
+                                    "#cl": "{shortened_urls.CLICKS}"
+                                    #if("$!shard" != ""),"#os": "{shortened_urls.OWNER_SHARD}"#end
                                   }},
                                   "ExpressionAttributeValues": {{
+                                    ":u": {{
+                                      "S": $input.json('$.url')
+                                    }},
                                     ":o": {{
                                       "S": "$context.identity.apiKeyId"
+                                    }},
+                                    ":ts": {{
+                                      "S": "$context.requestTime"
+                                    }},
+                                    #if("$!cacheTtl" != "")":ct": {{
+                                      "N": "$cacheTtl"
+                                    }},#end
+                                    #if("$!redirectType" != "")":rt": {{
+                                      "N": "$redirectType"
+                                    }},#end
+                                    #if("$!expiresAt" != "")":e": {{
+                                      "N": "$expiresAt"
+                                    }},#end
+                                    #if("$!shard" != "")":os": {{
+                                      "S": "$context.identity.apiKeyId:$shard"
+                                    }},#end
+                                    ":now": {{
+                                      "N": "$now"
+                                    }},
+                                    ":c": {{
+                                      "N": "$context.requestTimeEpoch"
                                     }}
-                                  }}
+                                  }},
+                                  "UpdateExpression": "SET #u = :u, #o = :o, #ts = :ts, #c = :c#if("$!cacheTtl" != ""), #ct = :ct#end#if("$!redirectType" != ""), #rt = :rt#end#if("$!expiresAt" != ""), #e = :e#end#if("$!shard" != ""), #os = :os#end#if(!$remove.isEmpty()) REMOVE #foreach($name in $remove)$name#if($foreach.hasNext), #end#end#end",
+                                  "ReturnValues": "ALL_NEW"
                                 }}
                                 """.strip()
                     },
@@ -210,15 +645,27 @@ class BackendService(Construct):
                             response_templates={
                                 "application/json": """
                                         #set($inputRoot = $input.path('$'))
-                                        [
-                                          #foreach($elem in $inputRoot.Items) {
-                                            "id": "$elem.id.S",
-                                            "url": "$elem.url.S",
-                                            "timestamp": "$elem.timestamp.S",
-                                            "owner": "$elem.owner.S"
-                                          }#if ($foreach.hasNext),#end
-                                          #end
-                                        ]
+                                        {
+                                          "id": "$inputRoot.Attributes.id.S",
+                                          "url": "$inputRoot.Attributes.url.S",
+                                          "timestamp": "$inputRoot.Attributes.timestamp.S",
+                                          "createdAt": $inputRoot.Attributes.createdAt.N,
+                                          #if("$!inputRoot.Attributes.cacheTtl.N" != "")"cacheTtl": $inputRoot.Attributes.cacheTtl.N,#end
+                                          #if("$!inputRoot.Attributes.redirectType.N" != "")"redirectType": $inputRoot.Attributes.redirectType.N,#end
+                                          #if("$!inputRoot.Attributes.expiresAt.N" != "")"expiresAt": $inputRoot.Attributes.expiresAt.N,#end
+                                          "owner": "$inputRoot.Attributes.owner.S"
+                                        }
+                                        """.strip()
+                            }
+                        ), apigateway.IntegrationResponse(
+                            status_code="400",
+                            response_templates={
+                                "application/json": """
+                                        #set($inputRoot = $input.path('$'))
+                                        #if($inputRoot.toString().contains("ConditionalCheckFailedException"))
+                                          #set($context.responseOverride.status = 200)
+                                          {"error": true,"message": "URL link already exists"}
+                                        #end
                                         """.strip()
                             }
                         )
@@ -228,49 +675,162 @@ class BackendService(Construct):
             method_responses=[
                 apigateway.MethodResponse(
                     status_code="200"
+                ),
+                apigateway.MethodResponse(
+                    status_code="400"
                 )
             ]
         )
 
-        # add create shortened url resource POST
-        res_shortened_urls.add_method(
+        # add batch create shortened urls resource POST /shortened-urls/batch
+        res_batch = res_shortened_urls.add_resource("batch")
+
+        res_batch.add_method(
+            "POST",
+            api_key_required=True,
+            request_validator=body_validator,
+            request_models={
+                "application/json": restapi.add_model(
+                    id="batch_create_model",
+                    content_type="application/json",
+                    schema=apigateway.JsonSchema(
+                        schema=apigateway.JsonSchemaVersion.DRAFT4,
+                        type=apigateway.JsonSchemaType.OBJECT,
+                        required=["items"],
+                        properties={
+                            "items": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.ARRAY,
+                                min_items=1,
+                                max_items=batch_create.MAX_ITEMS,
+                                items=apigateway.JsonSchema(
+                                    type=apigateway.JsonSchemaType.OBJECT,
+                                    required=["shortId", "url"],
+                                    any_of=_generated_ids_reserved(),
+                                    properties={
+                                        "shortId": apigateway.JsonSchema(
+                                            type=apigateway.JsonSchemaType.STRING,
+                                            min_length=1
+                                        ),
+                                        "allocated": apigateway.JsonSchema(
+                                            type=apigateway.JsonSchemaType.BOOLEAN
+                                        ),
+                                        "url": apigateway.JsonSchema(
+                                            type=apigateway.JsonSchemaType.STRING,
+                                            min_length=1
+                                        )
+                                    }
+                                )
+                            )
+                        }
+                    )
+                )
+            },
+            integration=apigateway.AwsIntegration(
+                service="states",
+                subdomain="sync",
+                action="StartSyncExecution",
+                integration_http_method="POST",
+                options=apigateway.IntegrationOptions(
+                    passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                    credentials_role=states_sync_role,
+                    request_templates={
+                        "application/json": f"""
+                                #set($items = $util.escapeJavaScript($input.json('$.items')).replaceAll("\\\\'", "'"))
+                                #set($shards = [])
+                                #set($now = $context.requestTimeEpoch / 1000)
+                                {batch_shard_template}
+                                {{
+                                  "stateMachineArn": "{sm_batch_create.state_machine_arn}",
+                                  "input": "{{\\"owner\\": \\"$context.identity.apiKeyId\\", \\"timestamp\\": \\"$context.requestTime\\", \\"createdAt\\": \\"$context.requestTimeEpoch\\", \\"now\\": \\"$now\\", \\"items\\": $items#if(!$shards.isEmpty()), \\"ownerShards\\": [#foreach($n in $shards)\\"$context.identity.apiKeyId:$n\\"#if($foreach.hasNext), #end#end]#end}}"
+                                }}
+                                """.strip()
+                    },
+                    integration_responses=[
+                        apigateway.IntegrationResponse(
+                            status_code="200",
+                            response_templates={
+                                "application/json": """
+                                        #set($inputRoot = $input.path('$'))
+                                        #if($inputRoot.status == "SUCCEEDED")
+                                          {"items": $inputRoot.output}
+                                        #else
+                                          #set($context.responseOverride.status = 500)
+                                          {"error": true,"message": "Batch $inputRoot.status.toLowerCase()"}
+                                        #end
+                                        """.strip()
+                            }
+                        )
+                    ]
+                ),
+            ),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200"
+                ),
+                apigateway.MethodResponse(
+                    status_code="500"
+                )
+            ]
+        )
+
+        # add short id allocation resource POST /shortened-urls/ids, the
+        # ids are unique and hand-picked ids cannot have their shape, so they
+        # are created with "allocated": true without collision retries
+        # (nothing binds an id to the caller which allocated it)
+        res_ids = res_shortened_urls.add_resource("ids")
+
+        res_ids.add_method(
             "POST",
             api_key_required=True,
+            request_validator=body_validator,
+            request_models={
+                "application/json": restapi.add_model(
+                    id="allocate_ids_model",
+                    content_type="application/json",
+                    schema=apigateway.JsonSchema(
+                        schema=apigateway.JsonSchemaVersion.DRAFT4,
+                        type=apigateway.JsonSchemaType.OBJECT,
+                        properties={
+                            "count": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.INTEGER,
+                                minimum=1,
+                                maximum=MAX_SHORT_IDS
+                            )
+                        }
+                    )
+                )
+            },
             integration=apigateway.AwsIntegration(
                 service="dynamodb",
                 action="UpdateItem",
                 integration_http_method="POST",
                 options=apigateway.IntegrationOptions(
                     passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
-                    credentials_role=dyndb_crud_role,
+                    credentials_role=dyndb_counters_role,
                     request_templates={
                         "application/json": f"""
+                                #set($count = $input.path('$.count'))
+                                #if("$!count" == "")
+                                  #set($count = 1)
+                                #end
                                 {{
-                                  "TableName": "{db_shortened_urls.table_name}",
-                                  "ConditionExpression": "attribute_not_exists(id)",
+                                  "TableName": "{db_counters.table_name}",
                                   "Key": {{
                                     "id": {{
-                                      "S": $input.json('$.shortId')
+                                      "S": "{counters.SHORT_ID_COUNTER}"
                                     }}
                                   }},
+                                  "UpdateExpression": "ADD #v :count SET #b = :count",
                                   "ExpressionAttributeNames": {{
-                                    "#u": "url",
-                                    "#o": "owner",
-                                    "#ts": "timestamp"
+                                    "#v": "value",
+                                    "#b": "block"
                                   }},
                                   "ExpressionAttributeValues": {{
-                                    ":u": {{
-                                      "S": $input.json('$.url')
-                                    }},
-                                    ":o": {{
-                                      "S": "$context.identity.apiKeyId"
-                                    }},
-                                    ":ts": {{
-                                      "S": "$context.requestTime"
+                                    ":count": {{
+                                      "N": "$count"
                                     }}
                                   }},
-                                  "UpdateExpression": "SET #u = :u, #o = :o, #ts = :ts",
-                                  "ReturnValues": "ALL_NEW"
+                                  "ReturnValues": "UPDATED_NEW"
                                 }}
                                 """.strip()
                     },
@@ -278,24 +838,329 @@ class BackendService(Construct):
                         apigateway.IntegrationResponse(
                             status_code="200",
                             response_templates={
-                                "application/json": """
-                                        #set($inputRoot = $input.path('$'))
-                                        {
-                                          "id": "$inputRoot.Attributes.id.S",
-                                          "url": "$inputRoot.Attributes.url.S",
-                                          "timestamp": "$inputRoot.Attributes.timestamp.S",
-                                          "owner": "$inputRoot.Attributes.owner.S"
-                                        }
+                                "application/json": f"""
+                                        #set($modulus = {62 ** SHORT_ID_LENGTH})
+                                        #set($alphabet = "{SHORT_ID_ALPHABET}")
+                                        #set($last = $modulus.parseLong($input.path('$.Attributes.value.N')))
+                                        #set($block = $modulus.parseLong($input.path('$.Attributes.block.N')).intValue())
+                                        {{
+                                          "ids": [
+                                            #foreach($i in [1..$block])
+                                              #set($value = (($last - $block + $i) * {SHORT_ID_MULTIPLIER} + {SHORT_ID_OFFSET}) % $modulus)
+                                              #set($sum = 0)
+                                              #set($id = "")
+                                              #foreach($digit in [1..{SHORT_ID_LENGTH}])
+                                                #set($sum = ($sum + $value % 62) % 62)
+                                                #set($value = $value / 62)
+                                                #set($id = "$id$alphabet.charAt($sum.intValue())")
+                                              #end
+                                              "$id"#if($foreach.hasNext),#end
+                                            #end
+                                          ]
+                                        }}
                                         """.strip()
                             }
-                        ), apigateway.IntegrationResponse(
-                            status_code="400",
+                        )
+                    ]
+                ),
+            ),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200"
+                )
+            ]
+        )
+
+        # add owner stats resource GET /shortened-urls/stats, the counter is
+        # maintained from the table stream and eventually consistent
+        res_stats = res_shortened_urls.add_resource("stats")
+
+        res_stats.add_method(
+            "GET",
+            api_key_required=True,
+            integration=apigateway.AwsIntegration(
+                service="dynamodb",
+                action="GetItem",
+                integration_http_method="POST",
+                options=apigateway.IntegrationOptions(
+                    passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                    credentials_role=dyndb_counters_role,
+                    request_templates={
+                        "application/json": f"""
+                                {{
+                                  "TableName": "{db_counters.table_name}",
+                                  "Key": {{
+                                    "id": {{
+                                      "S": "{counters.OWNER_COUNTER_PREFIX}$context.identity.apiKeyId"
+                                    }}
+                                  }},
+                                  "ProjectionExpression": "#l",
+                                  "ExpressionAttributeNames": {{
+                                    "#l": "{counters.OWNER_LINKS}"
+                                  }}
+                                }}
+                                """.strip()
+                    },
+                    integration_responses=[
+                        apigateway.IntegrationResponse(
+                            status_code="200",
+                            response_templates={
+                                "application/json": f"""
+                                        #set($links = $input.path('$.Item.{counters.OWNER_LINKS}.N'))
+                                        ## owners without short urls have no counter
+                                        #if("$!links" == "")
+                                          #set($links = 0)
+                                        #end
+                                        {{
+                                          "owner": "$context.identity.apiKeyId",
+                                          "links": $links
+                                        }}
+                                        """.strip()
+                            }
+                        )
+                    ]
+                ),
+            ),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200"
+                )
+            ]
+        )
+
+        # add click count resource GET /shortened-urls/{shortId}/clicks, the
+        # clicks are added up from the access logs by the click aggregator
+        res_clicks = res_shortened_urls.add_resource("{shortId}") \
+            .add_resource("clicks")
+
+        res_clicks.add_method(
+            "GET",
+            api_key_required=True,
+            integration=apigateway.AwsIntegration(
+                service="dynamodb",
+                action="GetItem",
+                integration_http_method="POST",
+                options=apigateway.IntegrationOptions(
+                    passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                    credentials_role=dyndb_crud_role,
+                    request_templates={
+                        "application/json": f"""
+                                {{
+                                  "TableName": "{db_shortened_urls.table_name}",
+                                  "Key": {{
+                                    "id": {{
+                                      "S": "$input.params().path.shortId"
+                                    }}
+                                  }},
+                                  "ProjectionExpression": "id, #o, #cl",
+                                  "ExpressionAttributeNames": {{
+                                    "#o": "owner",
+                                    "#cl": "{shortened_urls.CLICKS}"
+                                  }}
+                                }}
+                                """.strip()
+                    },
+                    integration_responses=[
+                        apigateway.IntegrationResponse(
+                            status_code="200",
+                            response_templates={
+                                "application/json": f"""
+                                        #set($item = $input.path('$.Item'))
+                                        ## short urls of other owners do not exist for the caller
+                                        #if("$!item.owner.S" != "$context.identity.apiKeyId")
+                                          #set($context.responseOverride.status = 404)
+                                          {{"error": true,"message": "URL link does not exist"}}
+                                        #else
+                                          #set($clicks = $item.{shortened_urls.CLICKS}.N)
+                                          #if("$!clicks" == "")
+                                            #set($clicks = 0)
+                                          #end
+                                          {{
+                                            "shortId": "$item.id.S",
+                                            "clicks": $clicks
+                                          }}
+                                        #end
+                                        """.strip()
+                            }
+                        )
+                    ]
+                ),
+            ),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200"
+                ),
+                apigateway.MethodResponse(
+                    status_code="404"
+                )
+            ]
+        )
+
+        # add batch resolve resource POST /shortened-urls/resolve
+        res_resolve = res_shortened_urls.add_resource("resolve")
+
+        res_resolve.add_method(
+            "POST",
+            api_key_required=True,
+            request_validator=body_validator,
+            request_models={
+                "application/json": restapi.add_model(
+                    id="batch_resolve_model",
+                    content_type="application/json",
+                    schema=apigateway.JsonSchema(
+                        schema=apigateway.JsonSchemaVersion.DRAFT4,
+                        type=apigateway.JsonSchemaType.OBJECT,
+                        required=["ids"],
+                        properties={
+                            # BatchGetItem reads at most 100 unique keys
+                            "ids": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.ARRAY,
+                                min_items=1,
+                                max_items=100,
+                                unique_items=True,
+                                items=apigateway.JsonSchema(
+                                    type=apigateway.JsonSchemaType.STRING,
+                                    min_length=1
+                                )
+                            )
+                        }
+                    )
+                )
+            },
+            integration=apigateway.AwsIntegration(
+                service="dynamodb",
+                action="BatchGetItem",
+                integration_http_method="POST",
+                options=apigateway.IntegrationOptions(
+                    passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                    credentials_role=dyndb_crud_role,
+                    request_templates={
+                        "application/json": f"""
+                                {{
+                                  "RequestItems": {{
+                                    "{db_shortened_urls.table_name}": {{
+                                      "Keys": [
+                                        #foreach($id in $input.path('$.ids'))
+                                        {{
+                                          "id": {{
+                                            "S": "$util.escapeJavaScript($id).replaceAll("\\\\'", "'")"
+                                          }}
+                                        }}#if($foreach.hasNext),#end
+                                        #end
+                                      ],
+                                      "ProjectionExpression": "id, #u, #e",
+                                      "ExpressionAttributeNames": {{
+                                        "#u": "url",
+                                        "#e": "{shortened_urls.EXPIRES_AT}"
+                                      }}
+                                    }}
+                                  }}
+                                }}
+                                """.strip()
+                    },
+                    # ids which are neither in urls nor in unprocessed do not
+                    # exist or are expired, unprocessed ids have to be
+                    # resolved again
+                    integration_responses=[
+                        apigateway.IntegrationResponse(
+                            status_code="200",
+                            response_templates={
+                                "application/json": f"""
+                                        #set($items = $input.path('$.Responses.{db_shortened_urls.table_name}'))
+                                        #set($unprocessed = $input.path('$.UnprocessedKeys.{db_shortened_urls.table_name}.Keys'))
+                                        #set($now = $context.requestTimeEpoch / 1000)
+                                        #set($live = [])
+                                        #foreach($elem in $items)
+                                          #if("$!elem.expiresAt.N" == "")
+                                            #set($ignore = $live.add($elem))
+                                          #elseif($util.parseJson($elem.expiresAt.N) > $now)
+                                            #set($ignore = $live.add($elem))
+                                          #end
+                                        #end
+                                        {{
+                                          "urls": {{
+                                            #foreach($elem in $live)
+                                            "$elem.id.S": "$elem.url.S"#if($foreach.hasNext),#end
+                                            #end
+                                          }},
+                                          "unprocessed": [
+                                            #foreach($elem in $unprocessed)
+                                            "$elem.id.S"#if($foreach.hasNext),#end
+                                            #end
+                                          ]
+                                        }}
+                                        """.strip()
+                            }
+                        )
+                    ]
+                ),
+            ),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200"
+                )
+            ]
+        )
+
+        # add batch delete resource POST /shortened-urls/batch-delete,
+        # filter by owner == api key
+        res_batch_delete = res_shortened_urls.add_resource("batch-delete")
+
+        res_batch_delete.add_method(
+            "POST",
+            api_key_required=True,
+            request_validator=body_validator,
+            request_models={
+                "application/json": restapi.add_model(
+                    id="batch_delete_model",
+                    content_type="application/json",
+                    schema=apigateway.JsonSchema(
+                        schema=apigateway.JsonSchemaVersion.DRAFT4,
+                        type=apigateway.JsonSchemaType.OBJECT,
+                        required=["ids"],
+                        properties={
+                            "ids": apigateway.JsonSchema(
+                                type=apigateway.JsonSchemaType.ARRAY,
+                                min_items=1,
+                                max_items=batch_create.MAX_ITEMS,
+                                unique_items=True,
+                                items=apigateway.JsonSchema(
+                                    type=apigateway.JsonSchemaType.STRING,
+                                    min_length=1
+                                )
+                            )
+                        }
+                    )
+                )
+            },
+            integration=apigateway.AwsIntegration(
+                service="states",
+                subdomain="sync",
+                action="StartSyncExecution",
+                integration_http_method="POST",
+                options=apigateway.IntegrationOptions(
+                    passthrough_behavior=apigateway.PassthroughBehavior.WHEN_NO_TEMPLATES,
+                    credentials_role=states_sync_role,
+                    request_templates={
+                        "application/json": f"""
+                                #set($ids = $util.escapeJavaScript($input.json('$.ids')).replaceAll("\\\\'", "'"))
+                                {{
+                                  "stateMachineArn": "{sm_batch_delete.state_machine_arn}",
+                                  "input": "{{\\"owner\\": \\"$context.identity.apiKeyId\\", \\"ids\\": $ids}}"
+                                }}
+                                """.strip()
+                    },
+                    integration_responses=[
+                        apigateway.IntegrationResponse(
+                            status_code="200",
                             response_templates={
                                 "application/json": """
                                         #set($inputRoot = $input.path('$'))
-                                        #if($inputRoot.toString().contains("ConditionalCheckFailedException"))
-                                          #set($context.responseOverride.status = 200)
-                                          {"error": true,"message": "URL link already exists"}
+                                        #if($inputRoot.status == "SUCCEEDED")
+                                          {"items": $inputRoot.output}
+                                        #else
+                                          #set($context.responseOverride.status = 500)
+                                          {"error": true,"message": "Batch $inputRoot.status.toLowerCase()"}
                                         #end
                                         """.strip()
                             }
@@ -308,20 +1173,67 @@ class BackendService(Construct):
                     status_code="200"
                 ),
                 apigateway.MethodResponse(
-                    status_code="400"
+                    status_code="500"
                 )
             ]
         )
 
-        # add usage plan to api gateway
-        usage_plan = restapi.add_usage_plan(
-            id="usage_plan",
-            name="backend_usage_plan",
-            throttle=apigateway.ThrottleSettings(
-                rate_limit=10,
-                burst_limit=2
+        # usage plans with the throttles of the tiers
+        usage_plans.create(
+            self,
+            restapi=restapi,
+            tiers=usage_plan_tiers
+        )
+
+        # add the home region to the latency routing of the redirect domain,
+        # only GET /{shortId} is served on the domain in every region, the
+        # other methods stay on the url of this api
+        if domain_name:
+            RedirectService(
+                self,
+                id="redirect_service",
+                table_name=db_shortened_urls.table_name,
+                consistent_reads=consistent_reads,
+                domain_name=domain_name,
+                hosted_zone_id=hosted_zone_id,
+                certificate_arn=certificate_arn,
+                observability_profile=observability_profile,
+                redirect_throttle=redirect_throttle
             )
+
+        # x-ray sampling, dashboard and alarms
+        if sampling_rate is not None and \
+                profiles.PROFILES[observability_profile]["tracing_enabled"]:
+            profiles.sampling_rule(self, restapi=restapi, rate=sampling_rate)
+
+        throttled_requests = access_logs.throttled_requests_metric(
+            self,
+            log_group=access_log_group
         )
-        usage_plan.add_api_stage(
-            stage=restapi.deployment_stage
+        dashboard.create(
+            self,
+            restapi=restapi,
+            tables=[db_shortened_urls, db_counters],
+            throttled_requests=throttled_requests
         )
+        alarms.create(
+            self,
+            restapi=restapi,
+            tables=[db_shortened_urls, db_counters],
+            throttled_requests=throttled_requests,
+            latency_p99=alarm_latency_p99,
+            email=alarm_email
+        )
+
+        # add cloudfront distribution for the redirects
+        if edge_cache_enabled:
+            distribution = redirect_distribution.create(
+                self,
+                restapi=restapi,
+                max_ttl=edge_cache_max_ttl
+            )
+            cdk.CfnOutput(
+                self,
+                id="EdgeEndpoint",
+                value=f"https://{distribution.distribution_domain_name}"
+            )
@@ -0,0 +1,114 @@
+from aws_cdk import aws_apigateway as apigateway
+from aws_cdk import aws_dynamodb as dynamodb
+from constructs import Construct
+
+from resources.dns import latency_domain
+from resources.methods import redirect
+from resources.monitoring import access_logs, profiles
+from resources.roles import dyndb_read
+from resources.streams import clicks
+from resources.throttling import stage_throttles
+
+
+class RedirectService(Construct):
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            *,
+            table_name: str,
+            consistent_reads: bool = False,
+            domain_name: str = None,
+            hosted_zone_id: str = None,
+            certificate_arn: str = None,
+            observability_profile: str = profiles.DEFAULT_PROFILE,
+            redirect_throttle: dict = None
+    ):
+        """Regional redirect API serving GET /{shortId} from the replica of
+        the global table in the region of the stack, or from the table of the
+        home region on the redirect domain. Like the backend stage, its
+        access logs count the clicks and the throttled requests.
+
+        :param table_name: name of the global table
+        :param consistent_reads: strongly consistent reads of the replica,
+            replication to the replica stays eventually consistent
+        :param domain_name: custom domain with latency routing, e.g.
+            go.example.com, the api is only reachable by its url if not given
+        :param hosted_zone_id: id of the hosted zone of the domain
+        :param certificate_arn: ACM certificate of the domain in the region
+        :param observability_profile: off, metrics or trace, see
+            profiles.PROFILES
+        :param redirect_throttle: stage throttle of GET /{shortId}, see
+            stage_throttles.method_options
+        """
+        super().__init__(scope, id)
+
+        # the replica is created by the global table of the backend stack
+        db_replica = dynamodb.Table.from_table_name(
+            self,
+            id="shortened_urls_replica",
+            table_name=table_name
+        )
+
+        dyndb_read_role = dyndb_read.create(
+            self,
+            table_arn=db_replica.table_arn
+        )
+
+        # access logs of the stage, the clicks are added to the table (the
+        # replica of the region) like on the backend stage
+        access_log_group = access_logs.create(self)
+        clicks.create(
+            self,
+            table=db_replica,
+            log_group=access_log_group
+        )
+        # same metric as the backend stage in the region
+        access_logs.throttled_requests_metric(
+            self,
+            log_group=access_log_group
+        )
+
+        # create the api gateway
+        self.restapi = apigateway.RestApi(
+            self,
+            id="redirect-api",
+            rest_api_name="Redirect API",
+            endpoint_types=[apigateway.EndpointType.REGIONAL],
+            # logging, data tracing, metrics, and x-ray tracing of the
+            # observability profile, access logs feed the clicks
+            deploy_options=apigateway.StageOptions(
+                **profiles.stage_options(observability_profile),
+                access_log_destination=apigateway.LogGroupLogDestination(
+                    access_log_group
+                ),
+                access_log_format=access_logs.log_format(),
+                method_options={
+                    "/{shortId}/GET": apigateway.MethodDeploymentOptions(
+                        **profiles.method_options(observability_profile),
+                        **stage_throttles.method_options(redirect_throttle)
+                    )
+                } if redirect_throttle else None
+            ),
+            cloud_watch_role=True
+        )
+
+        res_short_id = self.restapi.root.add_resource("{shortId}")
+
+        # add redirect GET /{shortId}
+        redirect.create(
+            res_short_id,
+            table_name=table_name,
+            credentials_role=dyndb_read_role,
+            consistent_read=consistent_reads
+        )
+
+        # add the region to the latency routing of the redirect domain
+        if domain_name:
+            latency_domain.create(
+                self,
+                restapi=self.restapi,
+                domain_name=domain_name,
+                hosted_zone_id=hosted_zone_id,
+                certificate_arn=certificate_arn
+            )
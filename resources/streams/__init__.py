@@ -0,0 +1 @@
+from . import clicks, owner_stats
\ No newline at end of file
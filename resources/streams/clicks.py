@@ -0,0 +1,55 @@
+import os
+
+import aws_cdk as cdk
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_lambda as lambda_
+from aws_cdk import aws_logs as logs
+from aws_cdk import aws_logs_destinations as destinations
+from constructs import Construct
+
+from resources.roles import lambda_clicks
+
+# directory of the aggregator, deployed on its own
+CODE = os.path.join(os.path.dirname(__file__), "..", "..", "clicks")
+
+
+def create(construct: Construct, table: dynamodb.ITable,
+           log_group: logs.ILogGroup) -> lambda_.Function:
+    """This function subscribes the click aggregator to the access logs of
+    the stage. CloudWatch Logs delivers the redirects in batches, the
+    aggregator adds them up per short id and writes one UpdateItem per short
+    id, so the redirect itself does not write.
+
+    :param table: DynamoDB table of the short urls
+    :param log_group: access logs of the stage in access_logs.log_format
+    :return: Lambda function
+    """
+    role = lambda_clicks.create(construct, table_arn=table.table_arn)
+
+    aggregator = lambda_.Function(
+        construct,
+        id="clicks_aggregator",
+        runtime=lambda_.Runtime.PYTHON_3_10,
+        handler="aggregate.handler",
+        code=lambda_.Code.from_asset(CODE, exclude=["__pycache__"]),
+        role=role,
+        memory_size=128,
+        timeout=cdk.Duration.seconds(30),
+        environment={
+            "TABLE_NAME": table.table_name
+        }
+    )
+
+    # only successful redirects are delivered
+    logs.SubscriptionFilter(
+        construct,
+        id="clicks_subscription",
+        log_group=log_group,
+        destination=destinations.LambdaDestination(aggregator),
+        filter_pattern=logs.FilterPattern.all(
+            logs.FilterPattern.string_value("$.resourcePath", "=", "/{shortId}"),
+            logs.FilterPattern.string_value("$.httpMethod", "=", "GET"),
+            logs.FilterPattern.string_value("$.status", "=", "30*")
+        )
+    )
+    return aggregator
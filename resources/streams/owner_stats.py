@@ -0,0 +1,71 @@
+import json
+
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_pipes as pipes
+from aws_cdk import aws_stepfunctions as sfn
+from constructs import Construct
+
+from resources.dyndb.shortened_urls import CLICKS
+from resources.roles import pipes_stream
+from resources.workflows.owner_stats import MAX_RECORDS
+
+# stream records delivered to the state machine, any pattern matches
+FILTER_PATTERNS = [
+    {"eventName": ["INSERT", "REMOVE"]},
+    {"eventName": ["MODIFY"],
+     "dynamodb": {"NewImage": {CLICKS: {"N": [{"exists": False}]}}}}
+]
+
+
+def create(construct: Construct, table: dynamodb.ITable,
+           state_machine: sfn.IStateMachine) -> pipes.CfnPipe:
+    """This function creates an EventBridge pipe which delivers the stream
+    records of the shortened urls table to the owner stats state machine.
+    Failed batches are retried, the state machine skips the records counted
+    by an earlier attempt. The stream keeps the records of 24 hours, older
+    short urls are counted by python -m bulk recount.
+
+    Only records which may change a count start an execution: created and
+    deleted short urls and overwritten ones without clicks. A pattern cannot
+    compare the owners of both images, but an expired short url taken over
+    by a create starts without clicks, while every click update writes
+    them. Backfilled short urls without clicks still pass and are dropped
+    by the state machine.
+
+    :param table: DynamoDB table with a NEW_AND_OLD_IMAGES stream
+    :param state_machine: owner_stats state machine
+    :return: pipe
+    """
+    role = pipes_stream.create(
+        construct,
+        stream_arn=table.table_stream_arn,
+        state_machine_arn=state_machine.state_machine_arn
+    )
+
+    return pipes.CfnPipe(
+        construct,
+        id="owner_stats_pipe",
+        role_arn=role.role_arn,
+        source=table.table_stream_arn,
+        source_parameters=pipes.CfnPipe.PipeSourceParametersProperty(
+            dynamo_db_stream_parameters=pipes.CfnPipe.PipeSourceDynamoDBStreamParametersProperty(
+                starting_position="TRIM_HORIZON",
+                batch_size=MAX_RECORDS,
+                maximum_batching_window_in_seconds=1,
+                maximum_retry_attempts=10
+            ),
+            filter_criteria=pipes.CfnPipe.FilterCriteriaProperty(
+                filters=[
+                    pipes.CfnPipe.FilterProperty(pattern=json.dumps(pattern))
+                    for pattern in FILTER_PATTERNS
+                ]
+            )
+        ),
+        target=state_machine.state_machine_arn,
+        target_parameters=pipes.CfnPipe.PipeTargetParametersProperty(
+            step_function_state_machine_parameters=pipes.CfnPipe.PipeTargetStateMachineParametersProperty(
+                # synchronous, so failed executions are retried by the pipe
+                invocation_type="REQUEST_RESPONSE"
+            )
+        )
+    )
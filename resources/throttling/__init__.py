@@ -0,0 +1 @@
+from . import usage_plans
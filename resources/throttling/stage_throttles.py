@@ -0,0 +1,14 @@
+def method_options(settings: dict) -> dict:
+    """Throttle of a single method on the stage, shared by all callers. The
+    throttles of the usage plans only apply to methods with an api key, so
+    this is the throttle of the redirect, e.g.
+
+        {"rateLimit": 200, "burstLimit": 100}
+
+    :param settings: requests per second and burst of the method
+    :return: keyword arguments of apigateway.MethodDeploymentOptions
+    """
+    return {
+        "throttling_rate_limit": settings.get("rateLimit"),
+        "throttling_burst_limit": settings.get("burstLimit")
+    }
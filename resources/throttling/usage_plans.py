@@ -0,0 +1,95 @@
+from typing import Dict, List
+
+from aws_cdk import aws_apigateway as apigateway
+from constructs import Construct
+
+DEFAULT_TIER = "default"
+
+# throttle of the default tier if no tiers are configured
+DEFAULT_TIERS = {
+    DEFAULT_TIER: {
+        "rateLimit": 10,
+        "burstLimit": 2
+    }
+}
+
+
+def _throttle(settings: dict) -> apigateway.ThrottleSettings:
+    return apigateway.ThrottleSettings(
+        rate_limit=settings.get("rateLimit"),
+        burst_limit=settings.get("burstLimit")
+    )
+
+
+def create(
+        construct: Construct,
+        restapi: apigateway.RestApi,
+        tiers: Dict[str, dict] = None
+) -> List[apigateway.UsagePlan]:
+    """This function creates one usage plan per tier on the deployment stage.
+    A tier has a throttle for all methods and optional throttles per method
+    which replace it, e.g.
+
+        {"default": {"rateLimit": 10, "burstLimit": 2,
+                     "methods": {"GET /shortened-urls": {"rateLimit": 2,
+                                                         "burstLimit": 1}},
+                     "apiKeyIds": ["..."]}}
+
+    Usage plans only throttle methods with an api key, the redirect is
+    throttled on the stage, see stage_throttles.
+
+    :param restapi: API Gateway with the methods
+    :param tiers: usage plan tiers by name, DEFAULT_TIERS if not given
+    :return: usage plans
+    """
+    methods = {
+        f"{method.http_method} {method.resource.path}": method
+        for method in restapi.methods
+    }
+    keyless = {
+        method_name for method_name, method in methods.items()
+        if not method.node.default_child.api_key_required
+    }
+
+    usage_plans = []
+    for name, tier in (tiers or DEFAULT_TIERS).items():
+        throttles = []
+        for method_name, settings in tier.get("methods", {}).items():
+            if method_name not in methods:
+                raise ValueError(
+                    f"Unknown method '{method_name}' in usage plan tier "
+                    f"'{name}', expected one of "
+                    f"{', '.join(sorted(set(methods) - keyless))}"
+                )
+            if method_name in keyless:
+                raise ValueError(
+                    f"Method '{method_name}' in usage plan tier '{name}' "
+                    f"does not require an api key, usage plans do not "
+                    f"throttle it"
+                )
+            throttles.append(apigateway.ThrottlingPerMethod(
+                method=methods[method_name],
+                throttle=_throttle(settings)
+            ))
+
+        # the default tier keeps the ids of the single usage plan
+        suffix = "" if name == DEFAULT_TIER else f"_{name}"
+        usage_plan = restapi.add_usage_plan(
+            id=f"usage_plan{suffix}",
+            name=f"backend_usage_plan{suffix}",
+            throttle=_throttle(tier)
+        )
+        usage_plan.add_api_stage(
+            stage=restapi.deployment_stage,
+            throttle=throttles or None
+        )
+
+        # existing api keys assigned to the tier
+        for api_key_id in tier.get("apiKeyIds", []):
+            usage_plan.add_api_key(apigateway.ApiKey.from_api_key_id(
+                construct,
+                id=f"api_key{suffix}_{api_key_id}",
+                api_key_id=api_key_id
+            ))
+        usage_plans.append(usage_plan)
+    return usage_plans
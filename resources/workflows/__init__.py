@@ -0,0 +1 @@
+from . import batch_create, batch_delete, list_owner, owner_stats
\ No newline at end of file
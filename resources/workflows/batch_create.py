@@ -0,0 +1,126 @@
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_stepfunctions as sfn
+from aws_cdk import aws_stepfunctions_tasks as tasks
+from constructs import Construct
+
+from resources.dyndb import shortened_urls
+
+# maximum number of short urls per batch request
+MAX_ITEMS = 25
+
+# dynamodb errors which are retried instead of reported as failed
+THROTTLING_ERRORS = [
+    "DynamoDB.ProvisionedThroughputExceededException",
+    "DynamoDB.RequestLimitExceeded",
+    "DynamoDB.ThrottlingException"
+]
+
+
+def create(construct: Construct, table: dynamodb.ITable,
+           sharded: bool = False) -> sfn.StateMachine:
+    """This function creates an express state machine which creates a batch
+    of short urls. Every short url is created with the same conditional
+    write as POST /shortened-urls, so the result is reported per item and
+    an expired short url is replaced like by a single create.
+
+    Input: {"owner", "timestamp", "createdAt", "now" (epoch seconds),
+            "items": [{"shortId", "url"}],
+            "ownerShards"?: ["owner:n" of every item]}
+    Output: [{"shortId", "status": "created" | "exists" | "failed"}]
+
+    :param table: DynamoDB table for storing shortened URLs
+    :param sharded: write the sharded owner key of the items
+    :return: state machine
+    """
+    item = {
+        "id": tasks.DynamoAttributeValue.from_string(
+            sfn.JsonPath.string_at("$.shortId")
+        ),
+        "url": tasks.DynamoAttributeValue.from_string(
+            sfn.JsonPath.string_at("$.url")
+        ),
+        "owner": tasks.DynamoAttributeValue.from_string(
+            sfn.JsonPath.string_at("$.owner")
+        ),
+        "timestamp": tasks.DynamoAttributeValue.from_string(
+            sfn.JsonPath.string_at("$.timestamp")
+        ),
+        "createdAt": tasks.DynamoAttributeValue.number_from_string(
+            sfn.JsonPath.string_at("$.createdAt")
+        )
+    }
+    parameters = {
+        "shortId.$": "$$.Map.Item.Value.shortId",
+        "url.$": "$$.Map.Item.Value.url",
+        "owner.$": "$.owner",
+        "timestamp.$": "$.timestamp",
+        "createdAt.$": "$.createdAt",
+        "now.$": "$.now"
+    }
+    if sharded:
+        item[shortened_urls.OWNER_SHARD] = tasks.DynamoAttributeValue.from_string(
+            sfn.JsonPath.string_at("$.ownerShard")
+        )
+        parameters["ownerShard.$"] = \
+            "States.ArrayGetItem($.ownerShards, $$.Map.Item.Index)"
+
+    put_item = tasks.DynamoPutItem(
+        construct,
+        id="batch_create_put_item",
+        table=table,
+        item=item,
+        # expired short urls may be taken again, see POST /shortened-urls
+        condition_expression="attribute_not_exists(id) OR #e < :now",
+        expression_attribute_names={"#e": shortened_urls.EXPIRES_AT},
+        expression_attribute_values={
+            ":now": tasks.DynamoAttributeValue.number_from_string(
+                sfn.JsonPath.string_at("$.now")
+            )
+        },
+        result_path=sfn.JsonPath.DISCARD
+    )
+    put_item.add_retry(errors=THROTTLING_ERRORS)
+    put_item.add_catch(
+        _status(construct, "exists"),
+        errors=["DynamoDB.ConditionalCheckFailedException"],
+        result_path="$.error"
+    )
+    put_item.add_catch(
+        _status(construct, "failed"),
+        errors=[sfn.Errors.ALL],
+        result_path="$.error"
+    )
+
+    # create all items of the batch in parallel
+    create_items = sfn.Map(
+        construct,
+        id="batch_create_items",
+        items_path="$.items",
+        max_concurrency=MAX_ITEMS,
+        parameters=parameters
+    ).iterator(
+        put_item.next(_status(construct, "created"))
+    )
+
+    return sfn.StateMachine(
+        construct,
+        id="batch_create_state_machine",
+        state_machine_type=sfn.StateMachineType.EXPRESS,
+        definition_body=sfn.DefinitionBody.from_chainable(create_items)
+    )
+
+
+def _status(construct: Construct, status: str) -> sfn.Pass:
+    """Result of a single item
+
+    :param status: created, exists or failed
+    :return: pass state
+    """
+    return sfn.Pass(
+        construct,
+        id=f"batch_create_{status}",
+        parameters={
+            "shortId.$": "$.shortId",
+            "status": status
+        }
+    )
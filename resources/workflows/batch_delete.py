@@ -0,0 +1,88 @@
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_stepfunctions as sfn
+from aws_cdk import aws_stepfunctions_tasks as tasks
+from constructs import Construct
+
+from resources.workflows.batch_create import MAX_ITEMS, THROTTLING_ERRORS
+
+
+def create(construct: Construct, table: dynamodb.ITable) -> sfn.StateMachine:
+    """This function creates an express state machine which deletes a batch
+    of short urls. Every short url is deleted with the same owner condition
+    as DELETE /{shortId}, so the result is reported per item.
+
+    Input: {"owner", "ids": ["shortId"]}
+    Output: [{"shortId", "status": "deleted" | "not_found" | "failed"}]
+
+    :param table: DynamoDB table for storing shortened URLs
+    :return: state machine
+    """
+    delete_item = tasks.DynamoDeleteItem(
+        construct,
+        id="batch_delete_delete_item",
+        table=table,
+        key={
+            "id": tasks.DynamoAttributeValue.from_string(
+                sfn.JsonPath.string_at("$.shortId")
+            )
+        },
+        condition_expression="#o = :o",
+        expression_attribute_names={
+            "#o": "owner"
+        },
+        expression_attribute_values={
+            ":o": tasks.DynamoAttributeValue.from_string(
+                sfn.JsonPath.string_at("$.owner")
+            )
+        },
+        result_path=sfn.JsonPath.DISCARD
+    )
+    delete_item.add_retry(errors=THROTTLING_ERRORS)
+    # the short url does not exist or is owned by another api key
+    delete_item.add_catch(
+        _status(construct, "not_found"),
+        errors=["DynamoDB.ConditionalCheckFailedException"],
+        result_path="$.error"
+    )
+    delete_item.add_catch(
+        _status(construct, "failed"),
+        errors=[sfn.Errors.ALL],
+        result_path="$.error"
+    )
+
+    # delete all items of the batch in parallel
+    delete_items = sfn.Map(
+        construct,
+        id="batch_delete_items",
+        items_path="$.ids",
+        max_concurrency=MAX_ITEMS,
+        parameters={
+            "shortId.$": "$$.Map.Item.Value",
+            "owner.$": "$.owner"
+        }
+    ).iterator(
+        delete_item.next(_status(construct, "deleted"))
+    )
+
+    return sfn.StateMachine(
+        construct,
+        id="batch_delete_state_machine",
+        state_machine_type=sfn.StateMachineType.EXPRESS,
+        definition_body=sfn.DefinitionBody.from_chainable(delete_items)
+    )
+
+
+def _status(construct: Construct, status: str) -> sfn.Pass:
+    """Result of a single item
+
+    :param status: deleted, not_found or failed
+    :return: pass state
+    """
+    return sfn.Pass(
+        construct,
+        id=f"batch_delete_{status}",
+        parameters={
+            "shortId.$": "$.shortId",
+            "status": status
+        }
+    )
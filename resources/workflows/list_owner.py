@@ -0,0 +1,93 @@
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_stepfunctions as sfn
+from aws_cdk import aws_stepfunctions_tasks as tasks
+from constructs import Construct
+
+from resources.dyndb import shortened_urls
+
+# dynamodb errors of the sdk integration which are retried
+THROTTLING_ERRORS = [
+    "DynamoDb.ProvisionedThroughputExceededException",
+    "DynamoDb.RequestLimitExceeded",
+    "DynamoDb.ThrottlingException"
+]
+
+
+def create(construct: Construct, table: dynamodb.ITable) -> sfn.StateMachine:
+    """This function creates an express state machine which queries the
+    newest short urls of every shard of an owner in parallel. Every shard
+    returns up to limit items, they are merged by the response template of
+    GET /shortened-urls.
+
+    Input: {"limit", "since", "until",
+            "shards": [{"shard": "owner:n", "n", "id"?, "createdAt"?}]}
+    Output: [{"value": {shard}, ..., "result": {"Items", "LastEvaluatedKey"?}}]
+
+    :param table: DynamoDB table with the sharded owner index
+    :return: state machine
+    """
+    parameters = {
+        "TableName": table.table_name,
+        "IndexName": shortened_urls.OWNER_SHARD_INDEX,
+        "KeyConditionExpression": "#s = :s AND #c BETWEEN :since AND :until",
+        "ScanIndexForward": False,
+        "ExpressionAttributeNames": {
+            "#s": shortened_urls.OWNER_SHARD,
+            "#c": "createdAt"
+        },
+        "ExpressionAttributeValues": {
+            ":s": {"S.$": "$.value.shard"},
+            ":since": {"N.$": "$.since"},
+            ":until": {"N.$": "$.until"}
+        },
+        "Limit.$": "$.limit"
+    }
+
+    def query(id: str, start: bool) -> tasks.CallAwsService:
+        task = tasks.CallAwsService(
+            construct,
+            id=id,
+            service="dynamodb",
+            action="query",
+            iam_resources=[f"{table.table_arn}/index/*"],
+            # the next page of a shard starts after the last listed item
+            parameters=dict(parameters, ExclusiveStartKey={
+                "id": {"S.$": "$.value.id"},
+                "createdAt": {"N.$": "$.value.createdAt"},
+                shortened_urls.OWNER_SHARD: {"S.$": "$.value.shard"}
+            }) if start else parameters,
+            result_path="$.result"
+        )
+        task.add_retry(errors=THROTTLING_ERRORS)
+        return task
+
+    query_shard = sfn.Choice(
+        construct,
+        id="list_owner_start"
+    ).when(
+        sfn.Condition.is_present("$.value.id"),
+        query("list_owner_query_from", True)
+    ).otherwise(
+        query("list_owner_query", False)
+    )
+
+    # query all shards in parallel
+    query_shards = sfn.Map(
+        construct,
+        id="list_owner_shards",
+        items_path="$.shards",
+        max_concurrency=shortened_urls.MAX_OWNER_SHARDS,
+        parameters={
+            "value.$": "$$.Map.Item.Value",
+            "limit.$": "$.limit",
+            "since.$": "$.since",
+            "until.$": "$.until"
+        }
+    ).iterator(query_shard)
+
+    return sfn.StateMachine(
+        construct,
+        id="list_owner_state_machine",
+        state_machine_type=sfn.StateMachineType.EXPRESS,
+        definition_body=sfn.DefinitionBody.from_chainable(query_shards)
+    )
@@ -0,0 +1,169 @@
+from aws_cdk import aws_dynamodb as dynamodb
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_stepfunctions as sfn
+from aws_cdk import aws_stepfunctions_tasks as tasks
+from constructs import Construct
+
+from resources.dyndb import counters
+from resources.workflows.list_owner import THROTTLING_ERRORS
+
+# stream records of a single pipe invocation
+MAX_RECORDS = 25
+
+
+def create(construct: Construct,
+           counters_table: dynamodb.ITable) -> sfn.StateMachine:
+    """This function creates an express state machine which maintains the
+    number of short urls of every owner from the stream records of the
+    shortened urls table. A created short url increments the counter of its
+    owner, a deleted (or expired) one decrements it and a short url taken
+    over by another owner moves it.
+
+    Every record is counted once: the counters are updated in a transaction
+    with a marker item of the eventID of the record, a record of a retried
+    batch finds its marker and is skipped.
+
+    Input: [DynamoDB stream records with NEW_AND_OLD_IMAGES]
+
+    :param counters_table: DynamoDB table of the counters
+    :return: state machine
+    """
+    # the marker exists, the record was counted by an earlier attempt
+    counted = sfn.Choice(
+        construct,
+        id="owner_stats_counted"
+    ).when(
+        sfn.Condition.string_matches("$.error.Cause",
+                                     "*ConditionalCheckFailed*"),
+        sfn.Succeed(construct, id="owner_stats_duplicate")
+    ).otherwise(
+        # e.g. a conflicting transaction, the pipe retries the batch
+        sfn.Fail(construct, id="owner_stats_failed",
+                 error="OwnerStatsFailed",
+                 cause="Counter transaction cancelled")
+    )
+
+    created = _count(construct, counters_table, "created", counted,
+                     NewImage=1)
+    removed = _count(construct, counters_table, "removed", counted,
+                     OldImage=-1)
+    moved = _count(construct, counters_table, "moved", counted,
+                   OldImage=-1, NewImage=1)
+
+    count_record = sfn.Choice(
+        construct,
+        id="owner_stats_event"
+    ).when(
+        sfn.Condition.string_equals("$.eventName", "INSERT"),
+        created
+    ).when(
+        sfn.Condition.string_equals("$.eventName", "REMOVE"),
+        removed
+    ).when(
+        # overwritten short urls only change the count if the owner changed
+        sfn.Condition.and_(
+            sfn.Condition.string_equals("$.eventName", "MODIFY"),
+            sfn.Condition.not_(sfn.Condition.string_equals_json_path(
+                "$.dynamodb.OldImage.owner.S",
+                "$.dynamodb.NewImage.owner.S"
+            ))
+        ),
+        moved
+    ).otherwise(
+        sfn.Succeed(construct, id="owner_stats_unchanged")
+    )
+
+    # one record after the other, concurrent transactions on the counter of
+    # the same owner would be cancelled
+    count_records = sfn.Map(
+        construct,
+        id="owner_stats_records",
+        items_path="$",
+        max_concurrency=1,
+        result_path=sfn.JsonPath.DISCARD
+    ).iterator(count_record)
+
+    return sfn.StateMachine(
+        construct,
+        id="owner_stats_state_machine",
+        state_machine_type=sfn.StateMachineType.EXPRESS,
+        definition_body=sfn.DefinitionBody.from_chainable(count_records)
+    )
+
+
+def _count(construct: Construct, counters_table: dynamodb.ITable, name: str,
+           counted: sfn.IChainable, **deltas: int) -> tasks.CallAwsService:
+    """Add the deltas to the counters of the owners of the stream record
+    images and put the marker of the record in one transaction
+
+    :param name: name of the change, e.g. created
+    :param counted: state of a cancelled transaction
+    :param deltas: 1 or -1 by image, e.g. NewImage=1
+    :return: transact write items task
+    """
+    marker = {
+        "Put": {
+            "TableName": counters_table.table_name,
+            "Item": {
+                "id": {"S": sfn.JsonPath.format(
+                    f"{counters.EVENT_MARKER_PREFIX}{{}}",
+                    sfn.JsonPath.string_at("$.eventID")
+                )},
+                # ApproximateCreationDateTime is in epoch seconds
+                counters.EXPIRES_AT: {"N": sfn.JsonPath.format(
+                    "{}",
+                    sfn.JsonPath.math_add(
+                        sfn.JsonPath.number_at(
+                            "$.dynamodb.ApproximateCreationDateTime"
+                        ),
+                        counters.EVENT_MARKER_TTL.to_seconds()
+                    )
+                )}
+            },
+            "ConditionExpression": "attribute_not_exists(id)"
+        }
+    }
+    updates = [
+        {
+            "Update": {
+                "TableName": counters_table.table_name,
+                "Key": {
+                    "id": {"S": sfn.JsonPath.format(
+                        f"{counters.OWNER_COUNTER_PREFIX}{{}}",
+                        sfn.JsonPath.string_at(f"$.dynamodb.{image}.owner.S")
+                    )}
+                },
+                "UpdateExpression": "ADD #l :d",
+                "ExpressionAttributeNames": {
+                    "#l": counters.OWNER_LINKS
+                },
+                "ExpressionAttributeValues": {
+                    ":d": {"N": str(delta)}
+                }
+            }
+        }
+        for image, delta in deltas.items()
+    ]
+
+    transaction = tasks.CallAwsService(
+        construct,
+        id=f"owner_stats_{name}",
+        service="dynamodb",
+        action="transactWriteItems",
+        # the transaction is authorized by the actions of its items
+        iam_action="dynamodb:PutItem",
+        additional_iam_statements=[iam.PolicyStatement(
+            actions=["dynamodb:UpdateItem"],
+            resources=[counters_table.table_arn]
+        )],
+        iam_resources=[counters_table.table_arn],
+        parameters={"TransactItems": [marker, *updates]},
+        result_path=sfn.JsonPath.DISCARD
+    )
+    transaction.add_retry(errors=THROTTLING_ERRORS)
+    transaction.add_catch(
+        counted,
+        errors=["DynamoDb.TransactionCanceledException"],
+        result_path="$.error"
+    )
+    return transaction
@@ -1,5 +1,8 @@
+import json
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
 
 from backend.backend_stack import BackendStack
 
@@ -14,3 +17,495 @@ def test_sqs_queue_created():
 #     template.has_resource_properties("AWS::SQS::Queue", {
 #         "VisibilityTimeout": 300
 #     })
+
+
+def synth(context: dict = None) -> assertions.Template:
+    app = core.App(context=context)
+    stack = BackendStack(app, "backend")
+    return assertions.Template.from_stack(stack)
+
+
+def test_redirect_cache_disabled_by_default():
+    template = synth()
+
+    template.has_resource_properties("AWS::ApiGateway::Stage", {
+        "CacheClusterEnabled": False
+    })
+
+
+def test_redirect_cache_keyed_on_short_id():
+    template = synth({
+        "redirectCache": {"enabled": True, "size": "1.6", "ttlSeconds": 60}
+    })
+
+    template.has_resource_properties("AWS::ApiGateway::Stage", {
+        "CacheClusterEnabled": True,
+        "CacheClusterSize": "1.6",
+        "MethodSettings": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "CachingEnabled": True,
+                "CacheTtlInSeconds": 60,
+                "HttpMethod": "GET",
+                "ResourcePath": "/~1{shortId}"
+            }),
+            assertions.Match.object_like({
+                "CachingEnabled": False,
+                "HttpMethod": "DELETE",
+                "ResourcePath": "/~1{shortId}"
+            })
+        ])
+    })
+    template.has_resource_properties("AWS::ApiGateway::Method", {
+        "HttpMethod": "GET",
+        "RequestParameters": {"method.request.path.shortId": True},
+        "Integration": assertions.Match.object_like({
+            "CacheKeyParameters": ["method.request.path.shortId"]
+        })
+    })
+
+
+def test_edge_cache_forwards_api_key_uncached():
+    template = synth({"edgeCache": {"enabled": True}})
+
+    template.resource_count_is("AWS::CloudFront::Distribution", 1)
+    template.has_resource_properties("AWS::CloudFront::OriginRequestPolicy", {
+        "OriginRequestPolicyConfig": assertions.Match.object_like({
+            "HeadersConfig": {
+                "HeaderBehavior": "whitelist",
+                "Headers": ["x-api-key"]
+            }
+        })
+    })
+    template.has_resource_properties("AWS::CloudFront::Distribution", {
+        "DistributionConfig": assertions.Match.object_like({
+            "CacheBehaviors": [
+                assertions.Match.object_like({
+                    "PathPattern": "/shortened-urls*",
+                    # managed CachingDisabled policy
+                    "CachePolicyId": "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+                })
+            ],
+            "CustomErrorResponses": [
+                {"ErrorCode": 404, "ErrorCachingMinTTL": 60}
+            ]
+        })
+    })
+
+
+def test_list_is_paginated():
+    template = synth()
+
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {
+            "HttpMethod": "GET",
+            "RequestParameters": {
+                "method.request.querystring.limit": False,
+                "method.request.querystring.cursor": False,
+                "method.request.querystring.since": False,
+                "method.request.querystring.until": False
+            }
+        }
+    })
+    assert len(methods) == 1
+    integration = json.dumps(list(methods.values())[0])
+    assert "ExclusiveStartKey" in integration
+    assert "nextCursor" in integration
+    assert "ScanIndexForward" in integration
+
+
+def test_owner_index_sorted_by_creation_time():
+    # new stacks do not get the owner-index of the first version
+    template = synth()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "GlobalSecondaryIndexes": [{
+            "IndexName": "owner-created-index",
+            "KeySchema": [
+                {"AttributeName": "owner", "KeyType": "HASH"},
+                {"AttributeName": "createdAt", "KeyType": "RANGE"}
+            ],
+            "Projection": {
+                "NonKeyAttributes": ["url", "timestamp"],
+                "ProjectionType": "INCLUDE"
+            }
+        }]
+    })
+
+
+def test_legacy_owner_index_kept_until_dropped():
+    # the unsorted owner-index of the first version stays next to the new
+    # index, so one deployment only adds a single index
+    template = synth({"ownerIndex": {"legacyIndex": True}})
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls",
+        "GlobalSecondaryIndexes": [
+            assertions.Match.object_like({"IndexName": "owner-created-index"}),
+            {
+                "IndexName": "owner-index",
+                "KeySchema": [{"AttributeName": "owner", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"}
+            }
+        ]
+    })
+    # it gets every write of the table, so it is auto scaled as well
+    template = synth({"tableCapacity": {"mode": "provisioned"},
+                      "ownerIndex": {"legacyIndex": True}})
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 6)
+
+
+def test_batch_create_runs_express_state_machine():
+    template = synth()
+
+    template.has_resource_properties("AWS::StepFunctions::StateMachine", {
+        "StateMachineType": "EXPRESS"
+    })
+    template.has_resource_properties("AWS::ApiGateway::Method", {
+        "HttpMethod": "POST",
+        "Integration": assertions.Match.object_like({
+            "Uri": {"Fn::Join": ["", assertions.Match.array_with([
+                ":sync.states:action/StartSyncExecution"
+            ])]}
+        })
+    })
+    template.has_resource_properties("AWS::ApiGateway::Model", {
+        "Schema": assertions.Match.object_like({
+            "properties": {
+                "items": assertions.Match.object_like({"maxItems": 25})
+            }
+        })
+    })
+
+
+def test_batch_resolve_and_delete():
+    template = synth()
+
+    template.resource_count_is("AWS::StepFunctions::StateMachine", 3)
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {
+            "HttpMethod": "POST",
+            "Integration": {
+                "Uri": {"Fn::Join": ["", assertions.Match.array_with([
+                    ":dynamodb:action/BatchGetItem"
+                ])]}
+            }
+        }
+    })
+    assert len(methods) == 1
+    assert "UnprocessedKeys" in json.dumps(methods)
+
+
+def test_short_ids_allocated_from_counter():
+    template = synth()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls_counters"
+    })
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {
+            "HttpMethod": "POST",
+            "Integration": {
+                "RequestTemplates": {
+                    "application/json": {"Fn::Join": ["", assertions.Match.array_with([
+                        assertions.Match.string_like_regexp("ADD #v :count")
+                    ])]}
+                }
+            }
+        }
+    })
+    assert len(methods) == 1
+
+
+def test_usage_plan_tiers_with_method_throttles():
+    template = synth({"usagePlans": {
+        "default": {
+            "rateLimit": 10,
+            "burstLimit": 2,
+            "methods": {
+                "POST /shortened-urls": {"rateLimit": 5, "burstLimit": 5},
+                "GET /shortened-urls": {"rateLimit": 1, "burstLimit": 1}
+            }
+        },
+        "premium": {"rateLimit": 50, "burstLimit": 20, "apiKeyIds": ["abc123"]}
+    }})
+
+    template.resource_count_is("AWS::ApiGateway::UsagePlan", 2)
+    template.has_resource_properties("AWS::ApiGateway::UsagePlan", {
+        "UsagePlanName": "backend_usage_plan",
+        "Throttle": {"RateLimit": 10, "BurstLimit": 2},
+        "ApiStages": [assertions.Match.object_like({
+            "Throttle": {
+                "/shortened-urls/POST": {"RateLimit": 5, "BurstLimit": 5},
+                "/shortened-urls/GET": {"RateLimit": 1, "BurstLimit": 1}
+            }
+        })]
+    })
+    template.has_resource_properties("AWS::ApiGateway::UsagePlanKey", {
+        "KeyId": "abc123"
+    })
+
+
+def test_redirect_throttled_on_stage_not_by_usage_plan():
+    # the redirect has no api key, a usage plan would not throttle it
+    with pytest.raises(ValueError, match="does not require an api key"):
+        synth({"usagePlans": {"default": {
+            "methods": {"GET /{shortId}": {"rateLimit": 500}}
+        }}})
+
+    template = synth({
+        "redirectThrottle": {"rateLimit": 500, "burstLimit": 250},
+        "redirectCache": {"enabled": True}
+    })
+    template.has_resource_properties("AWS::ApiGateway::Stage", {
+        "MethodSettings": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "HttpMethod": "GET",
+                "ResourcePath": "/~1{shortId}",
+                "CachingEnabled": True,
+                "ThrottlingRateLimit": 500,
+                "ThrottlingBurstLimit": 250
+            })
+        ])
+    })
+
+
+def test_global_table_replicas_and_latency_record():
+    app = core.App(context={"globalTable": {
+        "replicaRegions": ["us-east-1"],
+        "redirectDomain": {
+            "domainName": "go.example.com",
+            "hostedZoneId": "Z123",
+            "certificateArns": {"eu-central-1": "arn:aws:acm:eu-central-1:1:certificate/a"}
+        }
+    }})
+    stack = BackendStack(app, "backend", env=core.Environment(
+        account="123456789012", region="eu-central-1"
+    ))
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("Custom::DynamoDBReplica", {
+        "Region": "us-east-1"
+    })
+    template.has_resource_properties("AWS::Route53::RecordSet", {
+        "Name": "go.example.com",
+        "Region": "eu-central-1",
+        "SetIdentifier": "redirect-eu-central-1"
+    })
+    # the domain serves the redirect only api like in the replica regions
+    mapping, = template.find_resources(
+        "AWS::ApiGateway::BasePathMapping").values()
+    redirect_api = mapping["Properties"]["RestApiId"]["Ref"]
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {"RestApiId": {"Ref": redirect_api}}
+    })
+    assert [method["Properties"]["HttpMethod"]
+            for method in methods.values()] == ["GET"]
+    # its redirects are counted from its own access logs
+    stage, = template.find_resources("AWS::ApiGateway::Stage", {
+        "Properties": {"RestApiId": {"Ref": redirect_api}}
+    }).values()
+    log_group = stage["Properties"]["AccessLogSetting"]["DestinationArn"]
+    for resource in ["AWS::Logs::SubscriptionFilter", "AWS::Logs::MetricFilter"]:
+        template.has_resource_properties(resource, {
+            "LogGroupName": {"Ref": log_group["Fn::GetAtt"][0]}
+        })
+
+
+def test_observability_profiles():
+    template = synth({"observability": {"profile": "metrics"}})
+
+    template.has_resource_properties("AWS::ApiGateway::Stage", {
+        "TracingEnabled": False,
+        "MethodSettings": [assertions.Match.object_like({
+            "LoggingLevel": "ERROR",
+            "DataTraceEnabled": False,
+            "MetricsEnabled": True
+        })]
+    })
+    template.resource_count_is("AWS::XRay::SamplingRule", 0)
+
+    template = synth({"observability": {"profile": "trace", "samplingRate": 0.05}})
+
+    template.has_resource_properties("AWS::XRay::SamplingRule", {
+        "SamplingRule": assertions.Match.object_like({"FixedRate": 0.05})
+    })
+
+
+def test_dashboard_and_alarms():
+    template = synth({"observability": {"alarms": {"latencyP99Ms": 250}}})
+
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 1)
+    template.has_resource_properties("AWS::Logs::MetricFilter", {
+        "FilterPattern": '{ $.status = "429" }'
+    })
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "AlarmDescription": "p99 latency of GET /{shortId}",
+        "Threshold": 250
+    })
+
+
+def test_on_demand_by_default():
+    template = synth()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls",
+        "BillingMode": "PAY_PER_REQUEST"
+    })
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 0)
+
+
+def test_expired_short_urls_deleted_by_ttl():
+    template = synth()
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls",
+        "TimeToLiveSpecification": {
+            "AttributeName": "expiresAt",
+            "Enabled": True
+        }
+    })
+
+
+def test_provisioned_capacity_auto_scaled():
+    template = synth({"tableCapacity": {
+        "mode": "provisioned",
+        "read": {"min": 10, "max": 500, "targetUtilization": 60},
+        "write": {"min": 2, "max": 50},
+        "indexRead": {"min": 1, "max": 20}
+    }})
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls",
+        "ProvisionedThroughput": {
+            "ReadCapacityUnits": 10,
+            "WriteCapacityUnits": 2
+        },
+        "GlobalSecondaryIndexes": [assertions.Match.object_like({
+            "ProvisionedThroughput": {
+                "ReadCapacityUnits": 1,
+                "WriteCapacityUnits": 2
+            }
+        })]
+    })
+    # read and write of the table and the owner index
+    template.resource_count_is("AWS::ApplicationAutoScaling::ScalableTarget", 4)
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "MinCapacity": 10,
+        "MaxCapacity": 500,
+        "ScalableDimension": "dynamodb:table:ReadCapacityUnits"
+    })
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like({
+            "TargetValue": 60
+        })
+    })
+
+
+def test_redirect_reads_only_url_attributes():
+    template = synth({"redirectLookup": {"consistentRead": True}})
+
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {"HttpMethod": "GET", "RequestParameters": {
+            "method.request.path.shortId": True
+        }}
+    })
+    (redirect,) = methods.values()
+    request_template = redirect["Properties"]["Integration"]["RequestTemplates"]["application/json"]
+    assert '"ProjectionExpression": "#u, #rt, #ct, #e"' in json.dumps(request_template).replace('\\"', '"')
+    assert '"ConsistentRead": true' in json.dumps(request_template).replace('\\"', '"')
+
+
+def test_sharded_owner_index():
+    template = synth({"ownerIndex": {"shards": 8}})
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls",
+        "GlobalSecondaryIndexes": [assertions.Match.object_like({
+            "IndexName": "owner-shard-created-index",
+            "KeySchema": [
+                {"AttributeName": "ownerShard", "KeyType": "HASH"},
+                {"AttributeName": "createdAt", "KeyType": "RANGE"}
+            ]
+        })]
+    })
+    # the list fans out over the shards with a state machine
+    template.resource_count_is("AWS::StepFunctions::StateMachine", 4)
+    template.has_resource_properties("AWS::ApiGateway::Method", {
+        "HttpMethod": "GET",
+        "Integration": assertions.Match.object_like({
+            "Uri": assertions.Match.object_like({
+                "Fn::Join": ["", assertions.Match.array_with([
+                    assertions.Match.string_like_regexp("states:action/StartSyncExecution")
+                ])]
+            })
+        })
+    })
+
+
+def test_owner_stats_counted_from_table_stream():
+    template = synth()
+
+    template.has_resource_properties("AWS::Pipes::Pipe", {
+        "Source": {"Fn::GetAtt": [assertions.Match.any_value(), "StreamArn"]},
+        "SourceParameters": {
+            "DynamoDBStreamParameters": assertions.Match.object_like({
+                "StartingPosition": "TRIM_HORIZON"
+            })
+        },
+        "TargetParameters": {
+            "StepFunctionStateMachineParameters": {
+                "InvocationType": "REQUEST_RESPONSE"
+            }
+        }
+    })
+    # only records which may change a count start an execution, the click
+    # updates (MODIFY with clicks) are filtered out
+    pipe, = template.find_resources("AWS::Pipes::Pipe").values()
+    patterns = [json.loads(event_filter["Pattern"]) for event_filter in
+                pipe["Properties"]["SourceParameters"]["FilterCriteria"]["Filters"]]
+    assert patterns == [
+        {"eventName": ["INSERT", "REMOVE"]},
+        {"eventName": ["MODIFY"],
+         "dynamodb": {"NewImage": {"clicks": {"N": [{"exists": False}]}}}}
+    ]
+    # markers of the counted stream records expire
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "shortened_urls_counters",
+        "TimeToLiveSpecification": {"AttributeName": "expiresAt",
+                                    "Enabled": True}
+    })
+    methods = template.find_resources("AWS::ApiGateway::Method", {
+        "Properties": {
+            "HttpMethod": "GET",
+            "ApiKeyRequired": True,
+            "Integration": {
+                "Uri": {"Fn::Join": ["", assertions.Match.array_with([
+                    ":dynamodb:action/GetItem"
+                ])]}
+            }
+        }
+    })
+    stats = [method for method in methods.values()
+             if "owner:$context.identity.apiKeyId" in json.dumps(method)]
+    assert len(stats) == 1
+
+
+def test_clicks_aggregated_from_access_logs():
+    template = synth()
+
+    template.has_resource_properties("AWS::Logs::SubscriptionFilter", {
+        "FilterPattern": assertions.Match.string_like_regexp(r"\$\.resourcePath")
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "aggregate.handler"
+    })
+
+
+def test_responses_compressed_from_minimum_size():
+    synth().has_resource_properties("AWS::ApiGateway::RestApi", {
+        "MinimumCompressionSize": 1024
+    })
+    synth({"compression": {"enabled": False}}).has_resource_properties(
+        "AWS::ApiGateway::RestApi", {
+            "MinimumCompressionSize": assertions.Match.absent()
+        })
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from benchmark import load
+from benchmark.__main__ import LOCAL_API_KEY, start_local
+from benchmark.report import Sample, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
+
+
+def test_parse_mix_rejects_unknown_operations():
+    assert load.parse_mix("redirect=80,create=20") == \
+        {"redirect": 80.0, "create": 20.0}
+    with pytest.raises(ValueError):
+        load.parse_mix("redirect=80,update=20")
+
+
+def test_summary_rates():
+    samples = [Sample("redirect", 301, 0.01, 0.01),
+               Sample("redirect", 429, 0.02, 0.02),
+               Sample("create", 500, 0.03, 0.03),
+               Sample("create", 200, 0.04, 0.01)]
+
+    report = summarize(samples, 2.0, {})
+
+    assert report["total"]["throughput"] == 2.0
+    assert report["total"]["errorRate"] == 0.25
+    assert report["total"]["throttledRate"] == 0.25
+    assert report["operations"]["create"]["latencyMs"]["p99"] == 40.0
+
+
+def test_run_against_emulator():
+    client = load.Client(start_local(), LOCAL_API_KEY, 8)
+    workload = load.Workload(client, load.parse_mix(
+        "redirect=60,list=10,create=20,delete=10"
+    ), seed=1)
+    workload.seed(3)
+
+    samples, _ = asyncio.run(load.run(workload, 40, 0.5, 8))
+    listed = client.list().json()["items"]
+    client.close()
+
+    assert len(samples) == 20
+    assert all(sample.status in (200, 301) for sample in samples)
+    # seeded and created short URLs are deleted after the run
+    assert listed == []
@@ -0,0 +1,125 @@
+import io
+import json
+import threading
+
+import pytest
+
+from bulk import transfer
+from bulk.__main__ import client
+from emulator import server
+from emulator.__main__ import synthesize
+from emulator.api import Api
+from emulator.dynamodb import Database
+
+TABLE = "shortened_urls"
+
+
+@pytest.fixture
+def api(monkeypatch) -> Api:
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    # about a third of the items is unprocessed to exercise the retries
+    return Api(synthesize({}), api_keys={"key": "owner"},
+               database=Database(unprocessed_rate=0.3))
+
+
+@pytest.fixture
+def dynamodb(api: Api):
+    httpd = server.create_dynamodb(api.database, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield client("eu-central-1", f"http://127.0.0.1:{httpd.server_port}")
+    httpd.shutdown()
+
+
+def test_read_records_requires_short_id_url_and_owner():
+    lines = ['{"shortId": "a", "url": "https://example.org", "owner": "o"}',
+             "",
+             '{"shortId": "b", "url": "https://example.org"}']
+
+    records = transfer.read_records(lines)
+    assert next(records)["shortId"] == "a"
+    with pytest.raises(transfer.RecordError, match="line 3"):
+        next(records)
+
+
+def test_created_at_of_record_from_timestamp():
+    record = {"shortId": "a", "url": "https://example.org", "owner": "o",
+              "timestamp": "01/Jan/2024:12:00:00 +0000"}
+
+    assert transfer.to_item(record)["createdAt"] == {"N": "1704110400000"}
+    assert transfer.to_item({**record, "createdAt": 1})["createdAt"] == {"N": "1"}
+
+
+def test_import_and_export_round_trip(api, dynamodb):
+    records = [{"shortId": f"id{index}", "url": f"https://example.org/{index}",
+                "owner": "owner"} for index in range(120)]
+    # the later record of a short id wins
+    records.append({"shortId": "id0", "url": "https://example.com",
+                    "owner": "owner", "redirectType": 302})
+
+    stats = transfer.import_records(dynamodb, TABLE, records, workers=4,
+                                    rate=2000, max_attempts=20)
+    assert stats == {"written": 121, "failed": 0}
+
+    # imported short URLs are served by the API
+    status, headers, _ = api.handle("GET", "/prod/id0", {}, {}, "")
+    assert status == 302
+    assert headers["Location"] == "https://example.com"
+
+    output = io.StringIO()
+    count = transfer.export_records(dynamodb, TABLE, output, segments=3,
+                                    page_size=7)
+    exported = {record["shortId"]: record for record in
+                transfer.read_records(output.getvalue().splitlines())}
+    assert count == len(exported) == 120
+    assert exported["id5"]["url"] == "https://example.org/5"
+    assert exported["id0"]["redirectType"] == 302
+    assert exported["id5"]["createdAt"] > 0
+
+
+def test_backfill_lists_short_urls_created_without_created_at(api, dynamodb):
+    # items of the first version, before createdAt and the sorted owner index
+    for index, timestamp in enumerate(["01/Jan/2024:12:00:00 +0000",
+                                       "02/Jan/2024:12:00:00 +0000"]):
+        dynamodb.put_item(TableName=TABLE, Item={
+            "id": {"S": f"old{index}"}, "url": {"S": "https://example.org"},
+            "owner": {"S": "owner"}, "timestamp": {"S": timestamp}
+        })
+    api.handle("POST", "/prod/shortened-urls",
+               {"x-api-key": "key", "content-type": "application/json"}, {},
+               '{"shortId": "new", "url": "https://example.org"}')
+
+    stats = transfer.backfill(dynamodb, TABLE, segments=2)
+    assert stats == {"updated": 2, "skipped": 0}
+    assert transfer.backfill(dynamodb, TABLE)["updated"] == 0
+
+    item = dynamodb.get_item(TableName=TABLE, Key={"id": {"S": "old0"}})
+    assert item["Item"]["createdAt"]["N"] == "1704110400000"
+    status, _, content = api.handle("GET", "/prod/shortened-urls",
+                                    {"x-api-key": "key"}, {}, "")
+    assert [item["id"] for item in json.loads(content)["items"]] == \
+        ["new", "old1", "old0"]
+
+
+def test_recount_sets_owner_stats_to_short_urls(api, dynamodb):
+    for index in range(3):
+        dynamodb.put_item(TableName=TABLE, Item={
+            "id": {"S": f"id{index}"}, "url": {"S": "https://example.org"},
+            "owner": {"S": "owner"}
+        })
+    # counters off by lost or repeated stream records
+    for owner, links in [("owner", "7"), ("gone", "2")]:
+        dynamodb.put_item(TableName="shortened_urls_counters", Item={
+            "id": {"S": f"owner:{owner}"}, "links": {"N": links}
+        })
+
+    stats = transfer.recount(dynamodb, TABLE, "shortened_urls_counters",
+                             segments=2)
+    assert stats == {"owners": 2, "links": 3}
+
+    status, _, content = api.handle("GET", "/prod/shortened-urls/stats",
+                                    {"x-api-key": "key"}, {}, "")
+    assert json.loads(content) == {"owner": "owner", "links": 3}
+    item = dynamodb.get_item(TableName="shortened_urls_counters",
+                             Key={"id": {"S": "owner:gone"}})
+    assert item["Item"]["links"]["N"] == "0"
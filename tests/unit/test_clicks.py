@@ -0,0 +1,74 @@
+import json
+import threading
+
+import pytest
+
+from bulk.__main__ import client
+from clicks import aggregate
+from emulator import server
+from emulator.__main__ import synthesize
+from emulator.api import Api
+
+TABLE = "shortened_urls"
+HEADERS = {"x-api-key": "key", "content-type": "application/json"}
+
+
+@pytest.fixture
+def api(monkeypatch) -> Api:
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "local")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "local")
+    return Api(synthesize({}), api_keys={"key": "owner", "other": "other"})
+
+
+@pytest.fixture
+def dynamodb(api: Api):
+    httpd = server.create_dynamodb(api.database, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield client("eu-central-1", f"http://127.0.0.1:{httpd.server_port}")
+    httpd.shutdown()
+
+
+def test_count_clicks_only_counts_redirects():
+    def line(path: str, status: str, method: str = "GET",
+             resource: str = "/{shortId}") -> str:
+        return json.dumps({"resourcePath": resource, "path": path,
+                           "httpMethod": method, "status": status})
+
+    messages = [line("/prod/a", "301"), line("/a", "302"),
+                line("/prod/a%2Bb", "307"), line("/prod/gone", "404"),
+                line("/prod/a", "200", method="HEAD"),
+                line("/prod/shortened-urls", "200", resource="/shortened-urls"),
+                "not json"]
+
+    event = aggregate.encode(messages)
+    assert aggregate.count_clicks(aggregate.decode(event)) == \
+        {"a": 2, "a+b": 1}
+
+
+def test_clicks_from_access_logs(api, dynamodb):
+    lines = []
+    api.subscribe_access_logs(lines.append)
+    for short_id in ("hot", "cold", "gone"):
+        api.handle("POST", "/prod/shortened-urls", HEADERS, {},
+                   json.dumps({"shortId": short_id, "url": "https://example.org"}))
+    for short_id in ("hot", "hot", "hot", "cold", "gone", "missing"):
+        api.handle("GET", f"/prod/{short_id}", {}, {}, "")
+    api.handle("HEAD", "/prod/hot", {}, {}, "")
+    api.handle("DELETE", "/prod/gone", HEADERS, {}, "")
+
+    # one batch of the log subscription, gone was deleted in the meantime
+    clicks = aggregate.count_clicks(aggregate.decode(aggregate.encode(lines)))
+    assert clicks == {"hot": 3, "cold": 1, "gone": 1}
+    assert aggregate.write_clicks(dynamodb, TABLE, clicks) == 2
+    assert aggregate.write_clicks(dynamodb, TABLE, {"hot": 2}) == 1
+
+    status, _, body = api.handle("GET", "/prod/shortened-urls/hot/clicks",
+                                 HEADERS, {}, "")
+    assert status == 200
+    assert json.loads(body) == {"shortId": "hot", "clicks": 5}
+    # the deleted short url was not written again
+    assert api.handle("HEAD", "/prod/gone", {}, {}, "")[0] == 404
+
+    status, _, _ = api.handle("GET", "/prod/shortened-urls/hot/clicks",
+                              {**HEADERS, "x-api-key": "other"}, {}, "")
+    assert status == 404
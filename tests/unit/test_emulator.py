@@ -0,0 +1,397 @@
+import base64
+import gzip
+import json
+
+import pytest
+
+from emulator.__main__ import synthesize
+from emulator.api import Api
+from emulator.dynamodb import DynamoDBError
+from resources.dyndb import shortened_urls
+from resources.methods import list_formats
+
+HEADERS = {"x-api-key": "key", "content-type": "application/json"}
+
+# cursors which are not the nextCursor of a page: no base64, no padding,
+# no position and invalid UTF-8
+INVALID_CURSORS = ["!!!!", "YWJj", base64.b64encode(b'{"id": 1}').decode(),
+                   base64.b64encode(b"\xff\xfe,%").decode()]
+
+
+@pytest.fixture(scope="module")
+def template() -> dict:
+    return synthesize({})
+
+
+@pytest.fixture
+def api(template) -> Api:
+    return Api(template, api_keys={"key": "owner"})
+
+
+def request(api: Api, method: str, path: str, body: dict = None,
+            query: dict = None, headers: dict = None) -> tuple:
+    status, response_headers, content = api.handle(
+        method, path, HEADERS if headers is None else headers, query,
+        json.dumps(body) if body is not None else ""
+    )
+    return status, response_headers, \
+        json.loads(content) if content.strip() else None
+
+
+def test_create_redirect_delete(api):
+    status, _, body = request(api, "POST", "/prod/shortened-urls",
+                              {"shortId": "abc", "url": "https://example.org/'"})
+    assert status == 200
+    assert body["owner"] == "owner"
+
+    status, _, body = request(api, "POST", "/prod/shortened-urls",
+                              {"shortId": "abc", "url": "https://example.org"})
+    assert body["message"] == "URL link already exists"
+
+    status, headers, _ = request(api, "GET", "/prod/abc")
+    assert status == 301
+    assert headers["Location"] == "https://example.org/'"
+
+    status, _, _ = request(api, "DELETE", "/prod/abc")
+    assert status == 200
+    status, _, body = request(api, "DELETE", "/prod/abc")
+    assert body["message"] == "URL link does not exist"
+
+
+def test_requires_api_key_and_valid_body(api):
+    status, _, _ = request(api, "GET", "/prod/shortened-urls", headers={})
+    assert status == 403
+
+    status, _, _ = request(api, "POST", "/prod/shortened-urls/batch",
+                           {"items": []})
+    assert status == 400
+
+
+def test_list_pages_with_cursor(api, monkeypatch):
+    for short_id in ("a1", "a,2", "a'3"):
+        request(api, "POST", "/prod/shortened-urls",
+                {"shortId": short_id, "url": "https://example.org"})
+
+    ids, cursor = [], None
+    while True:
+        query = {"limit": "2", **({"cursor": cursor} if cursor else {})}
+        status, _, body = request(api, "GET", "/prod/shortened-urls",
+                                  query=query)
+        assert status == 200
+        ids += [item["id"] for item in body["items"]]
+        cursor = body["nextCursor"]
+        if not cursor:
+            break
+    assert sorted(ids) == ["a'3", "a,2", "a1"]
+
+    for cursor in INVALID_CURSORS:
+        status, _, body = request(api, "GET", "/prod/shortened-urls",
+                                  query={"cursor": cursor})
+        assert status == 400
+        assert body["message"] == "Invalid cursor"
+
+    # errors of DynamoDB are not mistaken for an invalid cursor
+    def throttled(request: dict):
+        raise DynamoDBError("ProvisionedThroughputExceededException",
+                            "The level of configured provisioned throughput "
+                            "for the table was exceeded")
+
+    monkeypatch.setattr(api.database, "_Query", throttled)
+    status, _, body = request(api, "GET", "/prod/shortened-urls")
+    assert status == 429
+    assert body["message"] == "List failed"
+
+
+def test_list_columns_format_and_compression(api):
+    for index in range(30):
+        request(api, "POST", "/prod/shortened-urls",
+                {"shortId": f"col{index}", "url": "https://example.org"})
+
+    status, headers, content = api.handle(
+        "GET", "/prod/shortened-urls",
+        {**HEADERS, "accept": list_formats.COLUMNS_MEDIA_TYPE},
+        {"limit": "2"}, ""
+    )
+    assert status == 200
+    assert headers["Content-Type"] == list_formats.COLUMNS_MEDIA_TYPE
+    columns = json.loads(content)
+    assert columns["owner"] == "owner"
+    assert columns["id"] == ["col29", "col28"]
+    assert len(columns["createdAt"]) == 2
+    assert b" " not in content.replace(b" +0000", b"")
+
+    # the next page of the compact format continues with the json format
+    status, _, body = request(api, "GET", "/prod/shortened-urls",
+                              query={"limit": "1",
+                                     "cursor": columns["nextCursor"]})
+    assert [item["id"] for item in body["items"]] == ["col27"]
+
+    status, headers, content = api.handle(
+        "GET", "/prod/shortened-urls",
+        {**HEADERS, "accept-encoding": "gzip"}, {"limit": "30"}, ""
+    )
+    assert headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(content))["items"]) == 30
+
+
+def test_batch_workflows(api):
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "taken", "url": "https://example.org"})
+
+    status, _, body = request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": "new", "url": "https://example.org/new"},
+                  {"shortId": "taken", "url": "https://example.org"}]
+    })
+    assert status == 200
+    assert body["items"] == [{"shortId": "new", "status": "created"},
+                             {"shortId": "taken", "status": "exists"}]
+
+    status, _, body = request(api, "POST", "/prod/shortened-urls/resolve",
+                              {"ids": ["new", "missing"]})
+    assert body["urls"] == {"new": "https://example.org/new"}
+
+    status, _, body = request(api, "POST",
+                              "/prod/shortened-urls/batch-delete",
+                              {"ids": ["new", "missing"]})
+    assert [item["status"] for item in body["items"]] == \
+        ["deleted", "not_found"]
+
+
+def test_generated_ids_are_unique(api):
+    ids = []
+    for _ in range(3):
+        status, _, body = request(api, "POST", "/prod/shortened-urls/ids",
+                                  {"count": 50})
+        assert status == 200
+        ids += body["ids"]
+    assert len(set(ids)) == 150
+    assert all(len(short_id) == 6 for short_id in ids)
+
+    # hand-picked ids cannot take the shape of the generated ids
+    status, _, _ = request(api, "POST", "/prod/shortened-urls",
+                           {"shortId": ids[0], "url": "https://example.org"})
+    assert status == 400
+    status, _, _ = request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": ids[0], "url": "https://example.org"}]
+    })
+    assert status == 400
+
+    status, _, body = request(api, "POST", "/prod/shortened-urls",
+                              {"shortId": ids[0], "allocated": True,
+                               "url": "https://example.org"})
+    assert body["id"] == ids[0]
+    status, _, body = request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": ids[1], "allocated": True,
+                   "url": "https://example.org"}]
+    })
+    assert body["items"] == [{"shortId": ids[1], "status": "created"}]
+
+
+def test_method_throttle_of_usage_plan():
+    api = Api(synthesize({"usagePlans": {"default": {
+        "rateLimit": 10,
+        "burstLimit": 2,
+        "methods": {"GET /shortened-urls": {"rateLimit": 1, "burstLimit": 1}}
+    }}}), api_keys={"key": "owner"}, throttling=True)
+
+    assert request(api, "GET", "/prod/shortened-urls")[0] == 200
+    assert request(api, "GET", "/prod/shortened-urls")[0] == 429
+    # the redirects have no api key, no usage plan throttles them
+    assert request(api, "GET", "/prod/missing")[0] != 429
+
+
+def test_redirect_throttle_of_stage():
+    api = Api(synthesize({
+        "redirectThrottle": {"rateLimit": 1, "burstLimit": 1}
+    }), api_keys={"key": "owner"}, throttling=True)
+
+    assert request(api, "GET", "/prod/missing", headers={})[0] == 404
+    assert request(api, "GET", "/prod/missing", headers={})[0] == 429
+    # the other methods keep the throttle of the usage plan
+    assert request(api, "GET", "/prod/shortened-urls")[0] == 200
+
+
+def test_redirect_type_and_cache_ttl_per_link(api):
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "campaign", "url": "https://example.org",
+             "cacheTtl": 86400})
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "draft", "url": "https://example.org",
+             "redirectType": 307, "cacheTtl": 0})
+
+    status, headers, _ = request(api, "GET", "/prod/campaign")
+    assert status == 301
+    assert headers["Cache-Control"] == "max-age=86400"
+
+    status, headers, _ = request(api, "GET", "/prod/draft")
+    assert status == 307
+    assert headers["Cache-Control"] == "max-age=0"
+
+    status, _, _ = request(api, "POST", "/prod/shortened-urls",
+                           {"shortId": "x", "url": "https://example.org",
+                            "redirectType": 200})
+    assert status == 400
+
+
+def test_unknown_short_id_is_cacheable_not_found(api):
+    status, headers, body = request(api, "GET", "/prod/unknown")
+
+    assert status == 404
+    assert headers["Cache-Control"] == "max-age=60"
+    assert "Location" not in headers
+    assert body["message"] == "URL link does not exist"
+
+
+def test_head_checks_existence(api):
+    # six letters would be the shape of a generated id
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "vanity-id", "url": "https://example.org"})
+
+    status, headers, _ = request(api, "HEAD", "/prod/vanity-id")
+    assert status == 200
+    assert headers["Cache-Control"] == "no-cache"
+
+    status, _, _ = request(api, "HEAD", "/prod/free")
+    assert status == 404
+
+
+def test_expired_short_url_is_not_found_and_reusable(api):
+    status, _, body = request(api, "POST", "/prod/shortened-urls",
+                              {"shortId": "promo", "url": "https://example.org",
+                               "ttlSeconds": 3600, "cacheTtl": 86400})
+    assert status == 200
+    # the Cache-Control of the redirect ends at the expiry
+    status, headers, _ = request(api, "GET", "/prod/promo")
+    assert status == 301
+    assert 3590 <= int(headers["Cache-Control"][len("max-age="):]) <= 3600
+
+    # expired but not deleted by the ttl yet
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "old", "url": "https://example.org", "expiresAt": 1})
+    assert request(api, "GET", "/prod/old")[0] == 404
+    assert request(api, "HEAD", "/prod/old")[0] == 404
+    status, _, body = request(api, "POST", "/prod/shortened-urls/resolve",
+                              {"ids": ["old", "promo"]})
+    assert list(body["urls"]) == ["promo"]
+
+    status, _, body = request(api, "POST", "/prod/shortened-urls",
+                              {"shortId": "old", "url": "https://example.com"})
+    assert status == 200
+    assert "expiresAt" not in body
+    status, headers, _ = request(api, "GET", "/prod/old")
+    assert status == 301
+    assert headers["Location"] == "https://example.com"
+    assert headers["Cache-Control"] == "max-age=300"
+
+    # batch create takes an expired short id like a single create
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "gone", "url": "https://example.org", "expiresAt": 1})
+    status, _, body = request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": "gone", "url": "https://example.com"},
+                  {"shortId": "promo", "url": "https://example.com"}]
+    })
+    assert body["items"] == [{"shortId": "gone", "status": "created"},
+                             {"shortId": "promo", "status": "exists"}]
+    status, headers, _ = request(api, "GET", "/prod/gone")
+    assert status == 301
+    assert headers["Location"] == "https://example.com"
+
+
+def test_sharded_owner_index_merges_shards_newest_first():
+    api = Api(synthesize({"ownerIndex": {"shards": 4}}),
+              api_keys={"key": "owner"})
+    for index in range(6):
+        request(api, "POST", "/prod/shortened-urls",
+                {"shortId": f"s{index}", "url": "https://example.org"})
+    request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": f"b{index}", "url": "https://example.org"}
+                  for index in range(5)]
+    })
+
+    items = api.database.tables["shortened_urls"].items.values()
+    assert all(item["ownerShard"]["S"] ==
+               shortened_urls.owner_shard("owner", item["id"]["S"], 4)
+               for item in items)
+    assert len({item["ownerShard"]["S"] for item in items}) > 1
+
+    listed, cursor = [], None
+    while True:
+        query = {"limit": "3", **({"cursor": cursor} if cursor else {})}
+        status, _, body = request(api, "GET", "/prod/shortened-urls",
+                                  query=query)
+        assert status == 200
+        assert len(body["items"]) <= 3
+        listed += body["items"]
+        cursor = body["nextCursor"]
+        if not cursor:
+            break
+    assert sorted(item["id"] for item in listed) == \
+        sorted(item["id"]["S"] for item in items)
+    created = [item["createdAt"] for item in listed]
+    assert created == sorted(created, reverse=True)
+
+    for cursor in INVALID_CURSORS:
+        status, _, body = request(api, "GET", "/prod/shortened-urls",
+                                  query={"cursor": cursor})
+        assert status == 400
+        assert body["message"] == "Invalid cursor"
+
+
+def test_owner_stats_count_created_and_deleted_short_urls(template):
+    api = Api(template, api_keys={"key": "owner", "other": "other"})
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "c1", "url": "https://example.org"})
+    request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": f"c{index}", "url": "https://example.org"}
+                  for index in range(1, 5)]
+    })
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "o1", "url": "https://example.org"},
+            headers={**HEADERS, "x-api-key": "other"})
+
+    status, _, body = request(api, "GET", "/prod/shortened-urls/stats")
+    assert status == 200
+    assert body == {"owner": "owner", "links": 4}
+
+    request(api, "DELETE", "/prod/c1")
+    request(api, "POST", "/prod/shortened-urls/batch-delete",
+            {"ids": ["c2", "missing"]})
+    _, _, body = request(api, "GET", "/prod/shortened-urls/stats")
+    assert body["links"] == 2
+
+    # an expired short url taken over by another owner moves the count
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "c5", "url": "https://example.org", "expiresAt": 1})
+    request(api, "POST", "/prod/shortened-urls",
+            {"shortId": "c5", "url": "https://example.org"},
+            headers={**HEADERS, "x-api-key": "other"})
+    _, _, body = request(api, "GET", "/prod/shortened-urls/stats")
+    assert body["links"] == 2
+    _, _, body = request(api, "GET", "/prod/shortened-urls/stats",
+                         headers={**HEADERS, "x-api-key": "other"})
+    assert body == {"owner": "other", "links": 2}
+
+    api = Api(template, api_keys={"key": "owner"})
+    _, _, body = request(api, "GET", "/prod/shortened-urls/stats")
+    assert body == {"owner": "owner", "links": 0}
+
+
+def test_owner_stats_count_redelivered_records_once(template):
+    api = Api(template, api_keys={"key": "owner"})
+    records = []
+    api.database.subscribe("shortened_urls", records.extend)
+    request(api, "POST", "/prod/shortened-urls/batch", {
+        "items": [{"shortId": f"r{index}", "url": "https://example.org"}
+                  for index in range(3)]
+    })
+    request(api, "DELETE", "/prod/r0")
+
+    # the pipe retries a whole batch after a partial failure
+    arn, = [arn for arn in api.state_machines.definitions
+            if "ownerstats" in arn]
+    _, execution = api.state_machines.dispatch("StartSyncExecution", {
+        "stateMachineArn": arn, "input": json.dumps(records)
+    })
+    assert execution["status"] == "SUCCEEDED"
+    _, _, body = request(api, "GET", "/prod/shortened-urls/stats")
+    assert body["links"] == 2
@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from emulator import server
+from emulator.__main__ import synthesize
+from emulator.api import Api
+from integration import cases
+from integration.client import Client
+
+
+@pytest.fixture
+def api() -> Api:
+    # default usage plan, 10 requests/s with a burst of 2
+    return Api(synthesize({}), api_keys={"key": "owner"}, throttling=True)
+
+
+@pytest.fixture
+def client(api: Api):
+    httpd = server.create(api, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    # no client side limit, the throttled requests have to be retried
+    client = Client(f"http://127.0.0.1:{httpd.server_port}/prod", "key",
+                    max_attempts=20, base_delay=0.05)
+    yield client
+    client.close()
+    httpd.shutdown()
+
+
+def test_cases_pass_and_clean_up_within_throttle(api, client):
+    results = cases.run(client, workers=4)
+
+    assert [result.error for result in results if not result.passed] == []
+    assert client.retries > 0
+    assert api.database.tables["shortened_urls"].items == {}
+
+
+def test_eventually_repeats_read_until_accepted(monkeypatch):
+    monkeypatch.setattr(cases, "POLL_INTERVAL", 0)
+    reads = iter(range(10))
+
+    assert cases.eventually(lambda: next(reads), lambda n: n == 3) == 3
+    assert cases.eventually(lambda: next(reads), lambda n: False,
+                            timeout=0) == 4
+
+
+def test_failed_case_is_reported_and_cleaned_up(api, client):
+    def failing(ctx: cases.Context):
+        ctx.create()
+        assert False, "expected failure"
+
+    result, = cases.run(client, [failing])
+
+    assert not result.passed
+    assert "expected failure" in result.error
+    assert api.database.tables["shortened_urls"].items == {}
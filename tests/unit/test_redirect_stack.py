@@ -0,0 +1,51 @@
+import aws_cdk as core
+import aws_cdk.assertions as assertions
+
+from backend.redirect_stack import RedirectStack
+
+
+def test_redirect_api_reads_replica():
+    app = core.App(context={"globalTable": {
+        "replicaRegions": ["us-east-1"],
+        "redirectDomain": {
+            "domainName": "go.example.com",
+            "hostedZoneId": "Z123",
+            "certificateArns": {"us-east-1": "arn:aws:acm:us-east-1:1:certificate/b"}
+        }
+    }})
+    stack = RedirectStack(app, "redirect", env=core.Environment(
+        account="123456789012", region="us-east-1"
+    ))
+    template = assertions.Template.from_stack(stack)
+
+    # only the redirect, writes stay in the home region
+    template.resource_count_is("AWS::ApiGateway::Method", 1)
+    template.has_resource_properties("AWS::ApiGateway::Method", {
+        "HttpMethod": "GET",
+        "Integration": assertions.Match.object_like({
+            "RequestTemplates": {
+                "application/json": assertions.Match.string_like_regexp(
+                    '"TableName": "shortened_urls"'
+                )
+            }
+        })
+    })
+    template.has_resource_properties("AWS::IAM::Role", {
+        "Policies": [assertions.Match.object_like({
+            "PolicyDocument": assertions.Match.object_like({
+                "Statement": [assertions.Match.object_like({
+                    "Action": "dynamodb:GetItem",
+                    "Resource": assertions.Match.object_like({
+                        "Fn::Join": assertions.Match.array_with([
+                            assertions.Match.array_with([
+                                ":dynamodb:us-east-1:123456789012:table/shortened_urls"
+                            ])
+                        ])
+                    })
+                })]
+            })
+        })]
+    })
+    template.has_resource_properties("AWS::Route53::RecordSet", {
+        "Region": "us-east-1"
+    })